@@ -4,7 +4,6 @@ import os
 import time
 import uuid
 from flask import Flask, jsonify, g, has_request_context, request
-from flask import send_from_directory
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
@@ -228,6 +227,12 @@ def create_app(config_class=None):
                             "type": "string",
                             "format": "date-time",
                             "description": "The timestamp of the visit."
+                        },
+                        "image_status": {
+                            "type": "string",
+                            "enum": ["pending", "ready", "failed"],
+                            "nullable": True,
+                            "description": "Processing state of the visit photo; image position and distance are filled in once ready."
                         }
                     }
                 }
@@ -253,8 +258,8 @@ def create_app(config_class=None):
              r"/static/images/*": {"origins": app.config['CORS_ORIGINS']}
          },
          supports_credentials=True,
-         expose_headers=["Content-Type", "Authorization"],
-         allow_headers=["Authorization", "Content-Type", "X-Requested-With", "Accept"],
+         expose_headers=["Content-Type", "Authorization", "ETag", "Idempotent-Replayed"],
+         allow_headers=["Authorization", "Content-Type", "X-Requested-With", "Accept", "If-None-Match", "Idempotency-Key"],
          methods=["GET", "HEAD", "POST", "OPTIONS", "PUT", "PATCH", "DELETE"]
          )
 
@@ -282,6 +287,24 @@ def create_app(config_class=None):
     app.register_blueprint(team_bp, url_prefix="/api/team")
     app.register_blueprint(user_bp, url_prefix="/api/user")
 
+    from app.commands import register_commands
+    register_commands(app)
+
+    from app.services.leaderboard_hub import init_leaderboard_hub
+    init_leaderboard_hub(app)
+
+    from app.services.idempotency_service import init_idempotency_cache
+    init_idempotency_cache(app)
+
+    from app.services.image_storage import init_image_storage
+    init_image_storage(app)
+
+    from app.services.image_ingest import init_image_ingest
+    init_image_ingest(app)
+
+    from app.services.catalog_service import init_catalog_cache
+    init_catalog_cache(app)
+
     @app.errorhandler(ValidationError)
     def handle_validation_error(err):
         return jsonify({"errors": err.messages}), 400
@@ -291,12 +314,43 @@ def create_app(config_class=None):
         return jsonify({"message": "Uploaded file too large."}), 413
 
     # Serve static images with CORS support
-    images_folder = app.config['IMAGE_UPLOAD_FOLDER']
-    os.makedirs(images_folder, exist_ok=True)
+    os.makedirs(app.config['IMAGE_UPLOAD_FOLDER'], exist_ok=True)
+    from app.services.image_delivery import send_image
+    from app.services.image_derivatives import DERIVATIVE_SIZES, ensure_derivative, negotiate_format
+    from app.services.image_storage import load_upload_token
+    from app.services.image_store import receive_image_upload
 
-    @app.route('/static/images/<filename>')
+    @app.route('/static/images/<path:filename>')
     def serve_image(filename):
-        """Serve uploaded checkpoint images with CORS headers"""
-        return send_from_directory(images_folder, filename)
+        """Serve uploaded checkpoint images with CORS headers.
+
+        ``?size=thumb|medium`` serves a downscaled derivative, WebP when the
+        ``Accept`` header allows it and JPEG otherwise. Responses are cached
+        as immutable; ``IMAGE_SENDFILE_MODE`` offloads the body to the proxy.
+        """
+        size = request.args.get('size')
+        if size is None:
+            return send_image(filename)
+        if size not in DERIVATIVE_SIZES:
+            return jsonify({"message": f"Unknown image size, use one of: {', '.join(DERIVATIVE_SIZES)}."}), 400
+
+        derivative = ensure_derivative(filename, size, negotiate_format(request.accept_mimetypes))
+        if derivative is None:
+            return jsonify({"message": "Image not found."}), 404
+        response = send_image(derivative)
+        response.vary.add('Accept')
+        return response
+
+    @app.route('/api/image-uploads/<token>', methods=['PUT'])
+    def upload_image_object(token):
+        """Receive a presigned photo upload when photos are stored locally."""
+        claims = load_upload_token(token)
+        if claims is None:
+            return jsonify({"message": "Upload URL is invalid or expired."}), 403
+        if request.mimetype != claims['content_type']:
+            return jsonify({"message": f"Content-Type must be {claims['content_type']}."}), 400
+        if not receive_image_upload(claims['key'], claims['sha256'], claims['content_type'], request.stream):
+            return jsonify({"message": "Uploaded content does not match the announced SHA-256."}), 400
+        return '', 200
 
     return app
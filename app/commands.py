@@ -0,0 +1,234 @@
+"""
+Flask CLI commands for maintenance tasks (run via ``flask <group> <command>``).
+"""
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from PIL import UnidentifiedImageError
+
+from app import db
+from app.models import Image, Race
+from app.services.idempotency_service import purge_expired_idempotency_keys
+from app.services.image_derivatives import generate_derivatives
+from app.services.image_gc import ImageGarbageCollector
+from app.services.image_ingest import IMAGE_STATUS_PENDING, process_image
+from app.services.image_optimize import IngestPolicy, image_savings_by_race, reencode_archive
+from app.services.image_similarity import image_phash
+from app.services.image_storage import STORAGE_BACKEND_LOCAL, get_image_storage
+from app.services.image_store import adopt_legacy_image, remove_image_files, sweep_unreferenced_blobs
+from app.services.scoring_service import recompute_team_scores
+
+scores_cli = AppGroup('scores', help='Maintain the precomputed race scores.')
+idempotency_cli = AppGroup('idempotency', help='Maintain the Idempotency-Key replay store.')
+images_cli = AppGroup('images', help='Maintain uploaded checkpoint and task photos.')
+
+
+@scores_cli.command('rebuild')
+@click.option('--race-id', type=int, default=None, help='Rebuild only this race (default: all races).')
+def rebuild_scores(race_id):
+    """Recompute race scores from checkpoint and task logs to repair drift."""
+    if race_id is not None:
+        race_ids = [race_id] if db.session.get(Race, race_id) else []
+        if not race_ids:
+            raise click.ClickException(f"Race {race_id} not found.")
+    else:
+        race_ids = [row.id for row in db.session.query(Race.id).order_by(Race.id)]
+
+    for current_race_id in race_ids:
+        written = recompute_team_scores(current_race_id)
+        db.session.commit()
+        click.echo(f"Race {current_race_id}: rebuilt {written} team scores")
+
+
+@idempotency_cli.command('purge')
+def purge_idempotency_keys():
+    """Delete stored responses whose Idempotency-Key has expired."""
+    removed = purge_expired_idempotency_keys()
+    db.session.commit()
+    click.echo(f"Removed {removed} expired idempotency keys")
+
+
+@images_cli.command('ingest-pending')
+def ingest_pending_images():
+    """Process photos left pending, e.g. by a worker restarted mid-ingest."""
+    image_ids = [
+        row.id for row in db.session.query(Image.id).filter(Image.status == IMAGE_STATUS_PENDING).order_by(Image.id)
+    ]
+    for image_id in image_ids:
+        status = process_image(image_id)
+        click.echo(f"Image {image_id}: {status}")
+    click.echo(f"Processed {len(image_ids)} pending images")
+
+
+@images_cli.command('sweep')
+@click.option('--grace-seconds', type=int, default=None,
+              help='Keep blobs unreferenced for less than this (default: IMAGE_BLOB_SWEEP_GRACE_SECONDS).')
+def sweep_image_blobs(grace_seconds):
+    """Delete stored photo files that no image references anymore."""
+    removed, freed = sweep_unreferenced_blobs(grace_seconds)
+    click.echo(f"Removed {removed} unreferenced image blobs ({freed} bytes)")
+
+
+@images_cli.command('derivatives')
+@click.option('--overwrite', is_flag=True, help='Re-render derivatives that already exist.')
+def backfill_image_derivatives(overwrite):
+    """Render missing thumbnail and medium derivatives of stored photos."""
+    filenames = [
+        row.filename for row in db.session.query(Image.filename)
+        .filter(Image.status != IMAGE_STATUS_PENDING)
+        .distinct()
+        .order_by(Image.filename)
+    ]
+    written = 0
+    failed = 0
+    for filename in filenames:
+        try:
+            written += generate_derivatives(filename, overwrite=overwrite)
+        except (OSError, UnidentifiedImageError) as err:
+            failed += 1
+            click.echo(f"Image {filename}: {err}", err=True)
+    click.echo(f"Rendered {written} derivatives for {len(filenames)} images ({failed} failed)")
+
+
+@images_cli.command('migrate-legacy')
+def migrate_legacy_images():
+    """Move photos stored before content-addressed storage out of the flat upload folder."""
+    moved = missing = failed = 0
+    last_id = 0
+    while True:
+        image = Image.query.filter(Image.id > last_id, Image.blob_id.is_(None)).order_by(Image.id).first()
+        if image is None:
+            break
+        last_id = image.id
+        try:
+            old_path = adopt_legacy_image(image)
+            db.session.commit()
+        except OSError as err:
+            db.session.rollback()
+            failed += 1
+            click.echo(f"Image {last_id}: {err}", err=True)
+            continue
+        if old_path is None:
+            missing += 1
+            click.echo(f"Image {last_id}: file missing", err=True)
+            continue
+        moved += 1
+        remove_image_files([old_path])
+        try:
+            generate_derivatives(image.filename)
+        except (OSError, UnidentifiedImageError) as err:
+            click.echo(f"Image {last_id} ({image.filename}): {err}", err=True)
+    click.echo(f"Moved {moved} images into blob storage ({missing} missing, {failed} failed)")
+
+
+@images_cli.command('phash')
+@click.option('--batch-size', type=int, default=200, show_default=True, help='Images per commit.')
+def backfill_image_hashes(batch_size):
+    """Compute missing perceptual hashes, e.g. of photos uploaded before hashing existed."""
+    storage = get_image_storage()
+    hashed = failed = 0
+    last_id = 0
+    while True:
+        images = (
+            Image.query.filter(Image.id > last_id, Image.phash.is_(None), Image.status != IMAGE_STATUS_PENDING)
+            .order_by(Image.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not images:
+            break
+        last_id = images[-1].id
+        for image in images:
+            try:
+                with storage.open(image.filename) as source:
+                    image.phash = image_phash(image, source)
+                hashed += 1
+            except (OSError, UnidentifiedImageError) as err:
+                failed += 1
+                click.echo(f"Image {image.id} ({image.filename}): {err}", err=True)
+        db.session.commit()
+    click.echo(f"Hashed {hashed} images ({failed} failed)")
+
+
+@images_cli.command('reencode')
+@click.option('--workers', type=int, default=None, help='Encoder processes (default: number of CPUs).')
+@click.option('--max-long-edge', type=int, default=None, help='Default: IMAGE_MAX_LONG_EDGE.')
+@click.option('--quality', type=int, default=None, help='JPEG quality (default: IMAGE_JPEG_QUALITY).')
+def reencode_image_archive(workers, max_long_edge, quality):
+    """Apply the ingest policy to stored photos uploaded before it was enabled."""
+    config = current_app.config
+    policy = IngestPolicy(
+        max_long_edge=max_long_edge or config['IMAGE_MAX_LONG_EDGE'],
+        jpeg_quality=quality or config['IMAGE_JPEG_QUALITY'],
+        preserve_gps=config['IMAGE_PRESERVE_GPS_EXIF'],
+    )
+    processed, saved, failed = reencode_archive(policy, workers or os.cpu_count() or 1)
+    click.echo(f"Re-encoded {processed} image blobs, saved {saved} bytes ({failed} failed)")
+
+
+@images_cli.command('report')
+def report_image_savings():
+    """Print stored photo bytes and bytes saved by re-encoding, per race."""
+    rows = image_savings_by_race()
+    click.echo(f"{'race':>6} {'photos':>8} {'stored bytes':>14} {'saved bytes':>14}")
+    for row in rows:
+        click.echo(f"{row['race_id']:>6} {row['photos']:>8} {row['stored_bytes']:>14} {row['saved_bytes']:>14}")
+    click.echo(
+        f"{'total':>6} {sum(r['photos'] for r in rows):>8} {sum(r['stored_bytes'] for r in rows):>14} "
+        f"{sum(r['saved_bytes'] for r in rows):>14}"
+    )
+
+
+@images_cli.command('gc')
+@click.option('--dry-run', is_flag=True, help='Only report orphans, delete nothing.')
+@click.option('--grace-seconds', type=int, default=None,
+              help='Ignore files modified more recently than this (default: IMAGE_BLOB_SWEEP_GRACE_SECONDS).')
+@click.option('--batch-size', type=int, default=500, show_default=True, help='Names per database lookup.')
+def collect_image_garbage(dry_run, grace_seconds, batch_size):
+    """Delete photo files without a database row and image rows without a file."""
+    if get_image_storage().name != STORAGE_BACKEND_LOCAL:
+        raise click.ClickException("images gc can only scan the local storage backend")
+    if grace_seconds is None:
+        grace_seconds = current_app.config['IMAGE_BLOB_SWEEP_GRACE_SECONDS']
+    collector = ImageGarbageCollector(current_app.config['IMAGE_UPLOAD_FOLDER'], grace_seconds, batch_size)
+    action = "would delete" if dry_run else "deleted"
+
+    started = time.monotonic()
+    orphan_files = orphan_bytes = 0
+    for relative_path, size in collector.orphan_files():
+        if dry_run or collector.delete_file(relative_path):
+            orphan_files += 1
+            orphan_bytes += size
+            click.echo(f"Orphaned file {relative_path} ({size} bytes): {action}")
+    scan_seconds = time.monotonic() - started
+
+    started = time.monotonic()
+    missing = []
+    for image_id, filename in collector.missing_images():
+        missing.append(image_id)
+        click.echo(f"Image {image_id} without file {filename}: {action}")
+    if not dry_run:
+        for start in range(0, len(missing), batch_size):
+            collector.release_images(missing[start:start + batch_size])
+    rows_seconds = time.monotonic() - started
+
+    click.echo(
+        f"Scanned {collector.files_scanned} files in {scan_seconds:.1f} s "
+        f"({collector.files_scanned / max(scan_seconds, 1e-6):.0f} files/s): "
+        f"{orphan_files} orphaned ({orphan_bytes} bytes) {action}"
+    )
+    click.echo(
+        f"Checked {collector.rows_scanned} images in {rows_seconds:.1f} s "
+        f"({collector.rows_scanned / max(rows_seconds, 1e-6):.0f} rows/s): "
+        f"{len(missing)} without a file {action}"
+    )
+
+
+def register_commands(app):
+    """Register CLI command groups on the application."""
+    app.cli.add_command(scores_cli)
+    app.cli.add_command(idempotency_cli)
+    app.cli.add_command(images_cli)
@@ -26,6 +26,33 @@ CONFIG_DEFAULTS = {
     "LOG_LEVEL": "INFO",
     "LOG_REQUESTS": "true",
     "MAX_CONTENT_LENGTH": str(5 * 1024 * 1024),
+    "LEADERBOARD_STREAM_MAX_CONNECTIONS": "50",
+    "LEADERBOARD_STREAM_HEARTBEAT_SECONDS": "15",
+    "LEADERBOARD_STREAM_MAX_SECONDS": "300",
+    "LEADERBOARD_POLL_SECONDS": "2",
+    "IDEMPOTENCY_KEY_TTL_SECONDS": "86400",
+    "IDEMPOTENCY_CLAIM_LEASE_SECONDS": "120",
+    "IDEMPOTENCY_MEMORY_MAX_ENTRIES": "1024",
+    "SYNC_MAX_BACKDATE_SECONDS": str(6 * 3600),
+    "IMAGE_INGEST_WORKERS": "2",
+    "IMAGE_INGEST_MAX_QUEUE": "32",
+    "IMAGE_BLOB_SWEEP_GRACE_SECONDS": "3600",
+    "IMAGE_CACHE_MAX_AGE_SECONDS": str(365 * 24 * 3600),
+    "IMAGE_SENDFILE_MODE": "",
+    "IMAGE_ACCEL_REDIRECT_PREFIX": "/protected-images",
+    "IMAGE_STORAGE_BACKEND": "local",
+    "IMAGE_S3_BUCKET": "",
+    "IMAGE_S3_PREFIX": "",
+    "IMAGE_S3_ENDPOINT_URL": "",
+    "IMAGE_S3_REGION": "",
+    "IMAGE_UPLOAD_URL_EXPIRES_SECONDS": "900",
+    "IMAGE_OPTIMIZE_ON_INGEST": "true",
+    "IMAGE_MAX_LONG_EDGE": "2560",
+    "IMAGE_JPEG_QUALITY": "82",
+    "IMAGE_WEBP_QUALITY": "80",
+    "IMAGE_PRESERVE_GPS_EXIF": "true",
+    "IMAGE_DUPLICATE_MAX_DISTANCE": "8",
+    "CATALOG_CACHE_MAX_ENTRIES": "256",
 }
 
 class Config:
@@ -86,10 +113,88 @@ class Config:
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', CONFIG_DEFAULTS["MAX_CONTENT_LENGTH"]))
     LOG_LEVEL = os.environ.get('LOG_LEVEL', CONFIG_DEFAULTS["LOG_LEVEL"])
     LOG_REQUESTS = os.environ.get('LOG_REQUESTS', CONFIG_DEFAULTS["LOG_REQUESTS"]).lower() == 'true'
+    # Live results stream (Server-Sent Events); limits apply per worker process
+    LEADERBOARD_STREAM_MAX_CONNECTIONS = int(os.environ.get(
+        'LEADERBOARD_STREAM_MAX_CONNECTIONS', CONFIG_DEFAULTS["LEADERBOARD_STREAM_MAX_CONNECTIONS"]
+    ))
+    LEADERBOARD_STREAM_HEARTBEAT_SECONDS = float(os.environ.get(
+        'LEADERBOARD_STREAM_HEARTBEAT_SECONDS', CONFIG_DEFAULTS["LEADERBOARD_STREAM_HEARTBEAT_SECONDS"]
+    ))
+    LEADERBOARD_STREAM_MAX_SECONDS = float(os.environ.get(
+        'LEADERBOARD_STREAM_MAX_SECONDS', CONFIG_DEFAULTS["LEADERBOARD_STREAM_MAX_SECONDS"]
+    ))
+    LEADERBOARD_POLL_SECONDS = float(os.environ.get(
+        'LEADERBOARD_POLL_SECONDS', CONFIG_DEFAULTS["LEADERBOARD_POLL_SECONDS"]
+    ))
+    # Idempotency-Key replay store for log POSTs; the in-memory tier is per worker
+    IDEMPOTENCY_KEY_TTL_SECONDS = int(os.environ.get(
+        'IDEMPOTENCY_KEY_TTL_SECONDS', CONFIG_DEFAULTS["IDEMPOTENCY_KEY_TTL_SECONDS"]
+    ))
+    # an in-progress claim whose worker died (timeout, OOM, deploy) can be taken over after this long
+    IDEMPOTENCY_CLAIM_LEASE_SECONDS = int(os.environ.get(
+        'IDEMPOTENCY_CLAIM_LEASE_SECONDS', CONFIG_DEFAULTS["IDEMPOTENCY_CLAIM_LEASE_SECONDS"]
+    ))
+    IDEMPOTENCY_MEMORY_MAX_ENTRIES = int(os.environ.get(
+        'IDEMPOTENCY_MEMORY_MAX_ENTRIES', CONFIG_DEFAULTS["IDEMPOTENCY_MEMORY_MAX_ENTRIES"]
+    ))
+    # Offline sync batches may date their logs at most this far back (the results tie-break uses log times)
+    SYNC_MAX_BACKDATE_SECONDS = int(os.environ.get(
+        'SYNC_MAX_BACKDATE_SECONDS', CONFIG_DEFAULTS["SYNC_MAX_BACKDATE_SECONDS"]
+    ))
+    # Background EXIF/GPS processing of uploaded photos, per worker process;
+    # 0 workers processes each image inline after the log is committed
+    IMAGE_INGEST_WORKERS = int(os.environ.get('IMAGE_INGEST_WORKERS', CONFIG_DEFAULTS["IMAGE_INGEST_WORKERS"]))
+    IMAGE_INGEST_MAX_QUEUE = int(os.environ.get('IMAGE_INGEST_MAX_QUEUE', CONFIG_DEFAULTS["IMAGE_INGEST_MAX_QUEUE"]))
+    # Unreferenced image blobs are kept this long before `flask images sweep` deletes them
+    IMAGE_BLOB_SWEEP_GRACE_SECONDS = int(os.environ.get(
+        'IMAGE_BLOB_SWEEP_GRACE_SECONDS', CONFIG_DEFAULTS["IMAGE_BLOB_SWEEP_GRACE_SECONDS"]
+    ))
+    # Stored photo names never change content, so responses are cached as immutable.
+    # IMAGE_SENDFILE_MODE: "" streams from Python, "x-sendfile" (Apache/lighttpd) or
+    # "x-accel" (nginx, internal location at IMAGE_ACCEL_REDIRECT_PREFIX) hands the file to the proxy
+    IMAGE_CACHE_MAX_AGE_SECONDS = int(os.environ.get(
+        'IMAGE_CACHE_MAX_AGE_SECONDS', CONFIG_DEFAULTS["IMAGE_CACHE_MAX_AGE_SECONDS"]
+    ))
+    IMAGE_SENDFILE_MODE = os.environ.get('IMAGE_SENDFILE_MODE', CONFIG_DEFAULTS["IMAGE_SENDFILE_MODE"]).strip().lower()
+    IMAGE_ACCEL_REDIRECT_PREFIX = os.environ.get(
+        'IMAGE_ACCEL_REDIRECT_PREFIX', CONFIG_DEFAULTS["IMAGE_ACCEL_REDIRECT_PREFIX"]
+    )
+    # Where photo bytes live: "local" (IMAGE_UPLOAD_FOLDER) or "s3" (S3-compatible bucket, needs boto3).
+    # Presigned upload and S3 download URLs are valid for IMAGE_UPLOAD_URL_EXPIRES_SECONDS
+    IMAGE_STORAGE_BACKEND = os.environ.get('IMAGE_STORAGE_BACKEND', CONFIG_DEFAULTS["IMAGE_STORAGE_BACKEND"]).strip().lower()
+    IMAGE_S3_BUCKET = os.environ.get('IMAGE_S3_BUCKET', CONFIG_DEFAULTS["IMAGE_S3_BUCKET"])
+    IMAGE_S3_PREFIX = os.environ.get('IMAGE_S3_PREFIX', CONFIG_DEFAULTS["IMAGE_S3_PREFIX"])
+    IMAGE_S3_ENDPOINT_URL = os.environ.get('IMAGE_S3_ENDPOINT_URL', CONFIG_DEFAULTS["IMAGE_S3_ENDPOINT_URL"])
+    IMAGE_S3_REGION = os.environ.get('IMAGE_S3_REGION', CONFIG_DEFAULTS["IMAGE_S3_REGION"])
+    IMAGE_UPLOAD_URL_EXPIRES_SECONDS = int(os.environ.get(
+        'IMAGE_UPLOAD_URL_EXPIRES_SECONDS', CONFIG_DEFAULTS["IMAGE_UPLOAD_URL_EXPIRES_SECONDS"]
+    ))
+    # Ingest policy for uploaded JPEG originals (see app/services/image_optimize.py): downscale to
+    # IMAGE_MAX_LONG_EDGE pixels, re-encode at IMAGE_JPEG_QUALITY and keep only the GPS EXIF block.
+    # The quality settings also apply to the JPEG and WebP derivatives
+    IMAGE_OPTIMIZE_ON_INGEST = os.environ.get(
+        'IMAGE_OPTIMIZE_ON_INGEST', CONFIG_DEFAULTS["IMAGE_OPTIMIZE_ON_INGEST"]
+    ).lower() == 'true'
+    IMAGE_MAX_LONG_EDGE = int(os.environ.get('IMAGE_MAX_LONG_EDGE', CONFIG_DEFAULTS["IMAGE_MAX_LONG_EDGE"]))
+    IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', CONFIG_DEFAULTS["IMAGE_JPEG_QUALITY"]))
+    IMAGE_WEBP_QUALITY = int(os.environ.get('IMAGE_WEBP_QUALITY', CONFIG_DEFAULTS["IMAGE_WEBP_QUALITY"]))
+    IMAGE_PRESERVE_GPS_EXIF = os.environ.get(
+        'IMAGE_PRESERVE_GPS_EXIF', CONFIG_DEFAULTS["IMAGE_PRESERVE_GPS_EXIF"]
+    ).lower() == 'true'
+    # Perceptual-hash bits two checkpoint photos may differ in to be reported as near-duplicates
+    IMAGE_DUPLICATE_MAX_DISTANCE = int(os.environ.get(
+        'IMAGE_DUPLICATE_MAX_DISTANCE', CONFIG_DEFAULTS["IMAGE_DUPLICATE_MAX_DISTANCE"]
+    ))
+    # Serialized checkpoint/task lists kept per worker, one entry per race, list and language; 0 disables
+    CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get(
+        'CATALOG_CACHE_MAX_ENTRIES', CONFIG_DEFAULTS["CATALOG_CACHE_MAX_ENTRIES"]
+    ))
 
 class TestConfig(Config):
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"  # Použití in-memory databáze
     TESTING = True
+    IMAGE_INGEST_WORKERS = 0
+    IMAGE_OPTIMIZE_ON_INGEST = False
 
 class DevelopmentConfig(Config):
     DEBUG = True
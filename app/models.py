@@ -25,6 +25,8 @@ class Race(db.Model):
     checkpoints = db.relationship('Checkpoint', backref='race', cascade="all, delete-orphan", lazy=True)
     tasks = db.relationship('Task', backref='race', cascade="all, delete-orphan", lazy=True)
     registrations = db.relationship('Registration', backref='race', cascade="all, delete-orphan", lazy=True)
+    scores = db.relationship('RaceScore', backref='race', cascade="all, delete-orphan", lazy=True)
+    sync_tombstones = db.relationship('SyncTombstone', backref='race', cascade="all, delete-orphan", lazy=True)
     categories = db.relationship('RaceCategory', secondary=race_categories_in_race, back_populates='races')
     start_showing_checkpoints_at = db.Column(db.DateTime, nullable=False)
     end_showing_checkpoints_at = db.Column(db.DateTime, nullable=False)
@@ -42,6 +44,14 @@ class Race(db.Model):
     registration_individual_amount_cents = db.Column(db.Integer, nullable=False, default=25)
     registration_driver_amount_cents = db.Column(db.Integer, nullable=False, default=25)
     registration_codriver_amount_cents = db.Column(db.Integer, nullable=False, default=15)
+    # Bumped on every change that affects race results; used as the results ETag.
+    score_version = db.Column(db.Integer, nullable=False, default=0)
+    # Bumped whenever the race's checkpoints, tasks or their translations change;
+    # keys the cached checkpoint/task lists and is part of their ETag.
+    catalog_version = db.Column(db.Integer, nullable=False, default=0)
+    # Bumped when maintenance changes what team logs show without a log or unlog
+    # (e.g. photos removed or moved); part of the team status list ETags.
+    status_version = db.Column(db.Integer, nullable=False, default=0)
 
 
 class RaceTranslation(db.Model):
@@ -142,6 +152,12 @@ class Checkpoint(db.Model):
     numOfPoints = db.Column(db.Integer, default=1)
     race_id = db.Column(db.Integer, db.ForeignKey('race.id'), nullable=False)
     translations = db.relationship('CheckpointTranslation', backref='checkpoint', cascade="all, delete-orphan", lazy=True)
+    # read by status delta polls (see app/services/status_delta.py)
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now(), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_checkpoint_race_updated_at', 'race_id', 'updated_at'),
+    )
 
 class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -150,6 +166,11 @@ class Task(db.Model):
     numOfPoints = db.Column(db.Integer, default=1)
     race_id = db.Column(db.Integer, db.ForeignKey('race.id'), nullable=False)
     translations = db.relationship('TaskTranslation', backref='task', cascade="all, delete-orphan", lazy=True)
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now(), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_task_race_updated_at', 'race_id', 'updated_at'),
+    )
 
 
 class CheckpointTranslation(db.Model):
@@ -158,9 +179,11 @@ class CheckpointTranslation(db.Model):
     language = db.Column(db.String(5), nullable=False)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now(), nullable=False)
 
     __table_args__ = (
         db.UniqueConstraint('checkpoint_id', 'language', name='uq_checkpoint_translation_language'),
+        db.Index('ix_checkpoint_translation_language_updated_at', 'language', 'updated_at'),
     )
 
 
@@ -170,9 +193,11 @@ class TaskTranslation(db.Model):
     language = db.Column(db.String(5), nullable=False)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now(), nullable=False)
 
     __table_args__ = (
         db.UniqueConstraint('task_id', 'language', name='uq_task_translation_language'),
+        db.Index('ix_task_translation_language_updated_at', 'language', 'updated_at'),
     )
 
 class CheckpointLog(db.Model):
@@ -188,10 +213,13 @@ class CheckpointLog(db.Model):
     user_longitude = db.Column(db.Float, nullable=True)
     user_distance_km = db.Column(db.Float, nullable=True)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now(), nullable=False)
 
     __table_args__ = (
         db.UniqueConstraint('checkpoint_id', 'team_id', 'race_id', name='uq_checkpoint_team_race'),
         db.Index('ix_checkpoint_log_race_team', 'race_id', 'team_id'),
+        db.Index('ix_checkpoint_log_race_created_at', 'race_id', 'created_at'),
+        db.Index('ix_checkpoint_log_race_team_updated_at', 'race_id', 'team_id', 'updated_at'),
     )
 
 class TaskLog(db.Model):
@@ -201,21 +229,95 @@ class TaskLog(db.Model):
     race_id = db.Column(db.Integer, db.ForeignKey('race.id'), nullable=False)
     image_id = db.Column(db.Integer, db.ForeignKey('image.id'), nullable=True)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now(), nullable=False)
 
     __table_args__ = (
         db.UniqueConstraint('task_id', 'team_id', 'race_id', name='uq_task_team_race'),
         db.Index('ix_task_log_race_team', 'race_id', 'team_id'),
+        db.Index('ix_task_log_race_created_at', 'race_id', 'created_at'),
+        db.Index('ix_task_log_race_team_updated_at', 'race_id', 'team_id', 'updated_at'),
     )
 
+class RaceScore(db.Model):
+    # Running point totals per team, kept in sync with CheckpointLog/TaskLog writes
+    # so that race results are a single indexed read (see app/services/scoring_service.py).
+    id = db.Column(db.Integer, primary_key=True)
+    race_id = db.Column(db.Integer, db.ForeignKey('race.id'), nullable=False)
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=False)
+    points_for_checkpoints = db.Column(db.Integer, nullable=False, default=0)
+    points_for_tasks = db.Column(db.Integer, nullable=False, default=0)
+    # time of the team's latest checkpoint/task log; earlier wins a points tie
+    last_log_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now(), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('race_id', 'team_id', name='uq_race_score_race_team'),
+    )
+
+class SyncTombstone(db.Model):
+    # Deleted checkpoints/tasks (team_id NULL) and removed team logs, reported by
+    # status delta polls (see app/services/status_delta.py); entity_id is the
+    # checkpoint or task id.
+    id = db.Column(db.Integer, primary_key=True)
+    race_id = db.Column(db.Integer, db.ForeignKey('race.id'), nullable=False)
+    entity_type = db.Column(db.String(16), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    team_id = db.Column(db.Integer, nullable=True)
+    deleted_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_sync_tombstone_race_type_deleted_at', 'race_id', 'entity_type', 'deleted_at'),
+    )
+
+class IdempotencyKey(db.Model):
+    # Responses of POSTs sent with an Idempotency-Key header, replayed to retries
+    # (see app/services/idempotency_service.py). status_code is NULL while the
+    # first request is still running.
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    scope = db.Column(db.String(255), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'scope', 'key', name='uq_idempotency_key_user_scope_key'),
+    )
+
+class ImageBlob(db.Model):
+    # One stored photo file per distinct content (see app/services/image_store.py);
+    # ref_count counts the Image rows using it, released_at is when it dropped to 0.
+    # original_size_bytes is the uploaded size once the ingest policy has been applied
+    # (see app/services/image_optimize.py); sha256 always names the uploaded bytes.
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    path = db.Column(db.String(256), nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=True)
+    original_size_bytes = db.Column(db.Integer, nullable=True)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+    released_at = db.Column(db.DateTime, nullable=True)
+
 class Image(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    # path relative to IMAGE_UPLOAD_FOLDER; ab/cd/<sha256>.ext for blob-backed images
     filename = db.Column(db.String(256), nullable=False)
+    blob_id = db.Column(db.Integer, db.ForeignKey('image_blob.id'), nullable=True, index=True)
+    # pending -> ready/failed while EXIF/GPS extraction runs in the background
+    # (see app/services/image_ingest.py)
+    status = db.Column(db.String(16), nullable=False, default='ready', server_default='ready')
+    # 64-bit perceptual hash for near-duplicate detection (see app/services/image_similarity.py)
+    phash = db.Column(db.BigInteger, nullable=True)
 
 class Team(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     members = db.relationship('User', secondary=team_members, back_populates='teams')
     registrations = db.relationship('Registration', backref='team', cascade="all, delete-orphan", lazy=True)
+    scores = db.relationship('RaceScore', backref='team', cascade="all, delete-orphan", lazy=True)
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -226,6 +328,9 @@ class User(db.Model):
     preferred_language = db.Column(db.String(5), nullable=True)
     reset_token = db.Column(db.String(100), nullable=True, unique=True)
     reset_token_expiry = db.Column(db.DateTime, nullable=True)
+    # Bumped when the user's teams or confirmed registrations change; access tokens
+    # carry it so stale membership claims are rejected (see membership_service.py).
+    membership_version = db.Column(db.Integer, nullable=False, default=0)
     teams = db.relationship('Team', secondary=team_members, back_populates='members')
 
     def set_password(self, password):
@@ -9,6 +9,7 @@ from app.models import User, Registration, Team, Race, RaceCategory, team_member
 from app.routes.admin import admin_required
 from app import db
 from app.services.email_service import EmailService, generate_reset_token
+from app.services.membership_service import access_token_claims
 from app.schemas import (
   AuthLoginSchema,
   AuthRegisterSchema,
@@ -271,16 +272,6 @@ def login():
         logger.error("Failed login attempt for email: %s", validated.get('email', 'unknown'))
         return jsonify({"msg": "Invalid credentials"}), 401
 
-    if user.is_administrator:
-        access_token = create_access_token(identity=str(user.id), additional_claims={"is_administrator": True})
-    else:
-        access_token = create_access_token(identity=str(user.id), additional_claims={"is_administrator": False})
-
-    # Issue refresh token with longer lifetime for silent re-auth
-    refresh_token = create_refresh_token(identity=str(user.id))
-
-    logger.info("User logged in: %s (ID: %s, admin: %s)", user.email, user.id, user.is_administrator)
-
     # Fetch teams and races associated with the user
     races_by_user = (
         db.session.query(Registration,
@@ -312,6 +303,19 @@ def login():
               "start_logging": race.start_logging_at,
               "end_logging": race.end_logging_at} for race in races_by_user]
 
+    # confirmed (race, team) pairs and memberships travel in the token, so race
+    # endpoints can authorize without loading team_members
+    race_teams = sorted({(race.race_id, race.team_id) for race in races_by_user})
+    access_token = create_access_token(
+        identity=str(user.id),
+        additional_claims=access_token_claims(user, race_teams),
+    )
+
+    # Issue refresh token with longer lifetime for silent re-auth
+    refresh_token = create_refresh_token(identity=str(user.id))
+
+    logger.info("User logged in: %s (ID: %s, admin: %s)", user.email, user.id, user.is_administrator)
+
     return jsonify({
       "access_token": access_token,
       "refresh_token": refresh_token,
@@ -420,14 +424,13 @@ def refresh():
         logger.warning("Refresh token has invalid subject: %s", user_id)
         return jsonify({"msg": "Invalid refresh token subject"}), 401
 
-    # Look up current admin flag to keep claims in sync and ensure user still exists.
+    # Look up current admin flag and memberships to keep claims in sync and ensure user still exists.
     user = User.query.filter_by(id=user_id_int).first()
     if not user:
         logger.warning("Refresh denied: user %s not found", user_id)
         return jsonify({"msg": "User not found"}), 401
 
-    is_admin = bool(user.is_administrator)
-    new_access = create_access_token(identity=str(user_id), additional_claims={"is_administrator": is_admin})
+    new_access = create_access_token(identity=str(user_id), additional_claims=access_token_claims(user))
     return jsonify({"access_token": new_access}), 200
 
 @auth_bp.route('/request-password-reset/', methods=['POST'])
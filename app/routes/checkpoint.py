@@ -1,12 +1,15 @@
-import os
 import logging
-from flask import Blueprint, jsonify, current_app, request
+from flask import Blueprint, jsonify, request
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 from app import db
 from app.models import Checkpoint, CheckpointLog, Image, CheckpointTranslation
 from app.routes.admin import admin_required
 from app.schemas import CheckpointUpdateSchema, CheckpointTranslationCreateSchema, CheckpointTranslationUpdateSchema
+from app.services.catalog_service import bump_catalog_version
+from app.services.image_store import release_image, remove_image_files
+from app.services.scoring_service import recompute_checkpoint_scores, recompute_team_scores
+from app.services.status_delta import TOMBSTONE_CHECKPOINT, record_tombstone, touch_entity
 from app.utils import find_translation_by_language, is_supported_race_language, resolve_title_description
 
 logger = logging.getLogger(__name__)
@@ -176,8 +179,12 @@ def update_checkpoint(checkpoint_id):
         checkpoint.longitude = validated['longitude']
         updated_fields.append('longitude')
     if 'numOfPoints' in validated:
+        points_changed = checkpoint.numOfPoints != validated['numOfPoints']
         checkpoint.numOfPoints = validated['numOfPoints']
         updated_fields.append('numOfPoints')
+        if points_changed:
+            recompute_checkpoint_scores(checkpoint)
+    bump_catalog_version(checkpoint.race_id)
 
     db.session.commit()
     logger.info("Checkpoint %s updated - fields: %s", checkpoint_id, ', '.join(updated_fields))
@@ -315,6 +322,7 @@ def create_checkpoint_translation(checkpoint_id):
         description=validated.get("description"),
     )
     db.session.add(translation)
+    bump_catalog_version(checkpoint.race_id)
     try:
         db.session.commit()
     except IntegrityError:
@@ -403,6 +411,7 @@ def update_checkpoint_translation(checkpoint_id, language):
         translation.title = validated["title"]
     if "description" in validated:
         translation.description = validated["description"]
+    bump_catalog_version(checkpoint.race_id)
 
     db.session.commit()
     logger.info("Checkpoint translation updated for checkpoint %s language %s", checkpoint_id, language)
@@ -447,6 +456,8 @@ def delete_checkpoint_translation(checkpoint_id, language):
         checkpoint_id=checkpoint_id,
         language=language,
     ).first_or_404()
+    bump_catalog_version(translation.checkpoint.race_id)
+    touch_entity(translation.checkpoint)
     db.session.delete(translation)
     db.session.commit()
     logger.info("Checkpoint translation deleted for checkpoint %s language %s", checkpoint_id, language)
@@ -497,46 +508,29 @@ def delete_checkpoint(checkpoint_id):
         images = Image.query.filter(Image.id.in_(image_ids)).all()
         images_by_id = {image.id: image for image in images}
 
-    image_filenames_to_delete = set()
     for log in logs:
-        if log.image_id:
-            image = images_by_id.get(log.image_id)
-            if image:
-                image_filenames_to_delete.add(image.filename)
-                db.session.delete(image)
-            else:
-                logger.warning(
-                    "Missing image %s referenced by checkpoint log %s during checkpoint delete",
-                    log.image_id,
-                    log.id,
-                )
+        if log.image_id and log.image_id not in images_by_id:
+            logger.warning(
+                "Missing image %s referenced by checkpoint log %s during checkpoint delete",
+                log.image_id,
+                log.id,
+            )
         db.session.delete(log)
 
+    # blob-backed photos only lose a reference; pre-blob files are unlinked after commit
+    legacy_image_paths = [release_image(image) for image in images_by_id.values()]
+
     db.session.delete(checkpoint)
+    bump_catalog_version(checkpoint.race_id)
+    record_tombstone(checkpoint.race_id, TOMBSTONE_CHECKPOINT, checkpoint.id)
     try:
+        recompute_team_scores(checkpoint.race_id, {log.team_id for log in logs})
         db.session.commit()
     except SQLAlchemyError as err:
         db.session.rollback()
         logger.error("Failed to delete checkpoint %s due to DB error: %s", checkpoint_id, err)
         return jsonify({"message": "Failed to delete checkpoint."}), 500
 
-    deleted_images = 0
-    images_folder = current_app.config['IMAGE_UPLOAD_FOLDER']
-    for filename in image_filenames_to_delete:
-        image_path = os.path.join(images_folder, filename)
-        try:
-            if os.path.exists(image_path):
-                os.remove(image_path)
-                deleted_images += 1
-            else:
-                logger.warning("Image file %s missing during checkpoint %s cleanup", filename, checkpoint_id)
-        except OSError as e:
-            logger.error(
-                "Error deleting image file %s for checkpoint %s: %s",
-                filename,
-                checkpoint_id,
-                e
-            )
-
-    logger.info("Checkpoint %s deleted with %s logs and %s images", checkpoint_id, len(logs), deleted_images)
+    remove_image_files(legacy_image_paths)
+    logger.info("Checkpoint %s deleted with %s logs and %s images", checkpoint_id, len(logs), len(images_by_id))
     return jsonify({"message": "Checkpoint and associated logs deleted."}), 200
@@ -11,7 +11,12 @@ from app.routes.race_api.visits import race_visits_bp
 from app.routes.race_api.results import race_results_bp
 from app.routes.race_api.registration import race_registration_bp
 from app.routes.race_api.team_payment import team_payment_bp
+from app.routes.race_api.sync import race_sync_bp
+from app.routes.race_api.images import race_images_bp
+from app.routes.race_api.bootstrap import race_bootstrap_bp, race_details
+from app.routes.race_api.context import reset_race_contexts
 from app.routes.admin import admin_required
+from app.services.translation_service import translate_entities
 from app.utils import (
   parse_datetime,
 )
@@ -29,6 +34,11 @@ race_bp.register_blueprint(race_visits_bp, url_prefix='/<int:race_id>')
 race_bp.register_blueprint(race_results_bp, url_prefix='/<int:race_id>')
 race_bp.register_blueprint(race_registration_bp, url_prefix='/registration')
 race_bp.register_blueprint(team_payment_bp, url_prefix='/<int:race_id>')
+race_bp.register_blueprint(race_sync_bp, url_prefix='/<int:race_id>')
+race_bp.register_blueprint(race_images_bp, url_prefix='/<int:race_id>/images')
+race_bp.register_blueprint(race_bootstrap_bp, url_prefix='/<int:race_id>')
+# g outlives a request when an app context is already pushed (CLI, tests)
+race_bp.before_request(reset_race_contexts)
 
 # tested by test_races.py -> test_get_all_races
 @race_bp.route("/", methods=["GET"])
@@ -58,31 +68,20 @@ def get_all_races():
     races = Race.query.all()
     language = request.args.get("lang")
 
-    result = []
+    translated_races = []
     for race in races:
-        name = race.name
-        description = race.description
-        race_greeting = race.race_greeting
-
-        if language:
-            if language in (race.supported_languages or []):
-                translation = RaceTranslation.query.filter_by(
-                    race_id=race.id,
-                    language=language,
-                ).first()
-                if translation:
-                    name = translation.name
-                    description = translation.description
-                    if translation.race_greeting is not None:
-                        race_greeting = translation.race_greeting
-            else:
-                logger.warning("Race %s requested with unsupported language %s, using default", race.id, language)
+        if language and language in (race.supported_languages or []):
+            translated_races.append(race)
+        elif language:
+            logger.warning("Race %s requested with unsupported language %s, using default", race.id, language)
+    texts = translate_entities(races, None)
+    texts.update(translate_entities(translated_races, language))
 
+    result = []
+    for race in races:
         result.append({
             "id": race.id,
-            "name": name,
-            "description": description,
-            "race_greeting": race_greeting,
+            **texts[race.id],
             "start_showing_checkpoints_at": race.start_showing_checkpoints_at,
             "end_showing_checkpoints_at": race.end_showing_checkpoints_at,
             "start_logging_at": race.start_logging_at,
@@ -138,44 +137,10 @@ def get_single_race(race_id):
     """
     race = Race.query.filter_by(id=race_id).first_or_404()
     language = request.args.get("lang")
-    name = race.name
-    description = race.description
-    race_greeting = race.race_greeting
-    if language:
-        if language not in (race.supported_languages or []):
-            logger.warning("Race %s requested with unsupported language %s, using default", race_id, language)
-        else:
-            translation = RaceTranslation.query.filter_by(
-                race_id=race_id,
-                language=language,
-            ).first()
-            if translation:
-                name = translation.name
-                description = translation.description
-                if translation.race_greeting is not None:
-                    race_greeting = translation.race_greeting
-    return jsonify({"id": race.id,
-                    "name": name,
-                    "description": description,
-                    "race_greeting": race_greeting,
-                    "start_showing_checkpoints_at": race.start_showing_checkpoints_at,
-                    "end_showing_checkpoints_at": race.end_showing_checkpoints_at,
-                    "start_logging_at": race.start_logging_at,
-                    "end_logging_at": race.end_logging_at,
-                    "registration_slug": race.registration_slug,
-                    "registration_enabled": race.registration_enabled,
-                    "min_team_size": race.min_team_size,
-                    "max_team_size": race.max_team_size,
-                    "allow_team_registration": race.allow_team_registration,
-                    "allow_individual_registration": race.allow_individual_registration,
-                    "registration_currency": race.registration_currency,
-                    "registration_pricing_strategy": race.registration_pricing_strategy,
-                    "registration_team_amount_cents": race.registration_team_amount_cents,
-                    "registration_individual_amount_cents": race.registration_individual_amount_cents,
-                    "registration_driver_amount_cents": race.registration_driver_amount_cents,
-                    "registration_codriver_amount_cents": race.registration_codriver_amount_cents,
-                    "supported_languages": race.supported_languages,
-                    "default_language": race.default_language}), 200
+    if language and language not in (race.supported_languages or []):
+        logger.warning("Race %s requested with unsupported language %s, using default", race_id, language)
+        language = None
+    return jsonify(race_details(race, language)), 200
 
 # add race
 # tested by test_races.py -> test_create_race
@@ -0,0 +1,196 @@
+"""
+Everything a team's app needs on open, in one round trip.
+
+The app used to fetch the race, the checkpoint and task status lists and the
+results one after another, repeating the user/race lookups in each request.
+``/bootstrap/`` returns all four sections from a fixed number of queries.
+
+Every section carries its own ETag (``etags``) so the client can keep
+sections it already has: the checkpoint and task sections are versioned by
+``Race.catalog_version``, ``Race.score_version`` (bumped by every log,
+unlog and registration change) and ``Race.status_version`` (photo
+maintenance), the score by ``Race.score_version`` and the
+race metadata by a hash of its content. The response ETag combines them, so
+an unchanged bootstrap is answered with 304 after two queries.
+"""
+import hashlib
+import json
+import logging
+
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
+
+from app.routes.race_api.checkpoints import checkpoints_with_status
+from app.routes.race_api.context import get_race_context
+from app.routes.race_api.tasks import tasks_with_status
+from app.services.catalog_service import CATALOG_CHECKPOINTS, CATALOG_TASKS, catalog_etag
+from app.services.scoring_service import load_team_result
+from app.services.translation_service import translate_entity
+from app.utils import not_modified_response, resolve_language, set_etag
+
+logger = logging.getLogger(__name__)
+
+race_bootstrap_bp = Blueprint('race_bootstrap', __name__)
+
+
+def race_details(race, language):
+    """Race metadata with texts translated to ``language`` (base texts when None)."""
+    return {
+        "id": race.id,
+        **translate_entity(race, language),
+        "start_showing_checkpoints_at": race.start_showing_checkpoints_at,
+        "end_showing_checkpoints_at": race.end_showing_checkpoints_at,
+        "start_logging_at": race.start_logging_at,
+        "end_logging_at": race.end_logging_at,
+        "registration_slug": race.registration_slug,
+        "registration_enabled": race.registration_enabled,
+        "min_team_size": race.min_team_size,
+        "max_team_size": race.max_team_size,
+        "allow_team_registration": race.allow_team_registration,
+        "allow_individual_registration": race.allow_individual_registration,
+        "registration_currency": race.registration_currency,
+        "registration_pricing_strategy": race.registration_pricing_strategy,
+        "registration_team_amount_cents": race.registration_team_amount_cents,
+        "registration_individual_amount_cents": race.registration_individual_amount_cents,
+        "registration_driver_amount_cents": race.registration_driver_amount_cents,
+        "registration_codriver_amount_cents": race.registration_codriver_amount_cents,
+        "supported_languages": race.supported_languages,
+        "default_language": race.default_language,
+    }
+
+
+def _content_hash(payload):
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def _section_etags(race, team_id, language, race_section):
+    scores = f"scores-{race.score_version}-team-{team_id}"
+    statuses = f"{scores}-status-{race.status_version}"
+    return {
+        "race": f"race-{race.id}-{language}-{_content_hash(race_section)}",
+        "checkpoints": f"{catalog_etag(race, CATALOG_CHECKPOINTS, language)}-{statuses}",
+        "tasks": f"{catalog_etag(race, CATALOG_TASKS, language)}-{statuses}",
+        "score": f"race-{race.id}-{scores}",
+    }
+
+
+@race_bootstrap_bp.route('/team/<int:team_id>/bootstrap/', methods=['GET'])
+@jwt_required()
+def get_team_bootstrap(race_id, team_id):
+    """
+    Get the race, checkpoints and tasks with status, and the score of a team in one request.
+    Requires the user to be an admin or a member of the team. Each section has
+    its own ETag in `etags`; the response ETag changes whenever any of them does.
+    ---
+    tags:
+      - Races
+    parameters:
+      - in: path
+        name: race_id
+        schema:
+          type: integer
+        required: true
+        description: ID of the race
+      - in: path
+        name: team_id
+        schema:
+          type: integer
+        required: true
+        description: ID of the team
+      - in: query
+        name: lang
+        schema:
+          type: string
+        required: false
+        description: Optional language code for translated fields
+      - in: header
+        name: If-None-Match
+        schema:
+          type: string
+        required: false
+        description: ETag of a previously fetched bootstrap; returns 304 when unchanged
+    security:
+      - BearerAuth: []
+    responses:
+      200:
+        description: Race data for the team's app
+        headers:
+          ETag:
+            schema:
+              type: string
+            description: Combined version of all sections
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                language:
+                  type: string
+                race:
+                  $ref: '#/components/schemas/RaceObject'
+                checkpoints:
+                  type: array
+                  description: Same items as GET /api/race/{race_id}/checkpoints/{team_id}/status/
+                  items:
+                    type: object
+                tasks:
+                  type: array
+                  description: Same items as GET /api/race/{race_id}/tasks/{team_id}/status/
+                  items:
+                    type: object
+                score:
+                  type: object
+                  nullable: true
+                  description: The team's row of the race results; null when the team is not confirmed for the race
+                etags:
+                  type: object
+                  properties:
+                    race:
+                      type: string
+                    checkpoints:
+                      type: string
+                    tasks:
+                      type: string
+                    score:
+                      type: string
+      304:
+        description: Not modified (If-None-Match matches the current ETag)
+      403:
+        description: Unauthorized (user is not an admin or team member)
+      404:
+        description: Race or user not found
+    """
+    context = get_race_context(race_id)
+    user = context.user
+    if not context.can_access_team(team_id):
+        logger.warning("Unauthorized bootstrap attempt for team %s in race %s by user %s", team_id, race_id, user.id)
+        return jsonify({"msg": "Unauthorized"}), 403
+
+    race = context.race_or_404()
+    requested_language = request.args.get("lang")
+    if requested_language and requested_language not in (race.supported_languages or []):
+        logger.warning(
+            "Unsupported bootstrap language '%s' requested for race %s; using fallback",
+            requested_language,
+            race_id,
+        )
+    language = resolve_language(race, user, requested_language)
+
+    race_section = race_details(race, language)
+    etags = _section_etags(race, team_id, language, race_section)
+    etag = f"race-{race_id}-team-{team_id}-bootstrap-{_content_hash(etags)}"
+    not_modified = not_modified_response(etag)
+    if not_modified is not None:
+        return not_modified
+
+    payload = {
+        "language": language,
+        "race": race_section,
+        "checkpoints": checkpoints_with_status(race_id, team_id, language),
+        "tasks": tasks_with_status(race, team_id, language),
+        "score": load_team_result(race_id, team_id),
+        "etags": etags,
+    }
+    logger.info("Bootstrap of race %s for team %s served to user %s", race_id, team_id, user.id)
+    return set_etag(jsonify(payload), etag), 200
@@ -1,53 +1,35 @@
-import os
-import uuid
 import logging
-from datetime import datetime
 from flask import Blueprint, jsonify, request, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.utils import secure_filename
+from flask_jwt_extended import jwt_required
 from marshmallow import ValidationError
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import selectinload
 
 from app import db
-from app.models import Checkpoint, CheckpointLog, User, Image, Registration, Race, CheckpointTranslation
-from app.utils import resolve_language, allowed_file, validate_uploaded_image
+from app.models import Checkpoint, CheckpointLog, Image, Race
+from app.routes.race_api.context import get_race_context
+from app.utils import resolve_language, allowed_file, inspect_uploaded_image
 from app.routes.admin import admin_required
-from app.schemas import CheckpointCreateSchema, CheckpointLogSchema
-from app.utils import extract_image_coordinates, calculate_distance
+from app.schemas import CheckpointCreateSchema, CheckpointLogSchema, StatusDeltaQuerySchema
+from app.services.catalog_service import CATALOG_CHECKPOINTS, bump_catalog_version, catalog_response
+from app.services.idempotency_service import idempotent_request
+from app.services.image_ingest import IMAGE_STATUS_PENDING, submit_image_ingest
+from app.services.image_store import attach_uploaded_image, release_image, remove_image_files, store_image
+from app.services.scoring_service import insert_team_log, record_team_log, record_team_unlog
+from app.services.status_delta import (
+    SYNC_CURSOR_HEADER,
+    TOMBSTONE_CHECKPOINT,
+    current_cursor,
+    record_tombstone,
+    status_delta,
+    status_etag,
+)
+from app.services.translation_service import translate_entities, translate_entity
+from app.utils import calculate_distance, not_modified_response, set_etag, to_naive_utc
 
 logger = logging.getLogger(__name__)
 
 # Blueprint pro checkpointy
 checkpoints_bp = Blueprint('checkpoints', __name__)
 
-def _apply_checkpoint_translation(checkpoint, language):
-    if not language:
-        return checkpoint.title, checkpoint.description
-    translation = CheckpointTranslation.query.filter_by(
-        checkpoint_id=checkpoint.id,
-        language=language,
-    ).first()
-    if translation:
-        return translation.title, translation.description
-    logger.debug("No translation found for checkpoint %s in language '%s'", checkpoint.id, language)
-    return checkpoint.title, checkpoint.description
-
-
-def _apply_checkpoint_translation_prefetched(checkpoint, language):
-    if not language:
-        return checkpoint.title, checkpoint.description
-
-    translation = next(
-        (item for item in checkpoint.translations if item.language == language),
-        None,
-    )
-    if translation:
-        return translation.title, translation.description
-
-    logger.debug("No translation found for checkpoint %s in language '%s'", checkpoint.id, language)
-    return checkpoint.title, checkpoint.description
-
 @checkpoints_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_checkpoints(race_id):
@@ -93,11 +75,14 @@ def get_checkpoints(race_id):
                     type: string
                   numOfPoints:
                     type: integer
+      304:
+        description: Not modified (If-None-Match matches the ETag of the list)
       404:
         description: Race or user not found
     """
-    race = Race.query.filter_by(id=race_id).first_or_404()
-    user = User.query.filter_by(id=get_jwt_identity()).first_or_404()
+    context = get_race_context(race_id)
+    race = context.race_or_404()
+    user = context.user
     requested_language = request.args.get("lang")
     if requested_language and requested_language not in (race.supported_languages or []):
         logger.warning(
@@ -106,27 +91,23 @@ def get_checkpoints(race_id):
             race_id,
         )
     language = resolve_language(race, user, requested_language)
-    checkpoints = (
-        Checkpoint.query.options(selectinload(Checkpoint.translations))
-        .filter_by(race_id=race_id)
-        .all()
-    )
 
-    response = []
-    for checkpoint in checkpoints:
-        title, description = _apply_checkpoint_translation_prefetched(checkpoint, language)
-        response.append(
+    def build():
+        checkpoints = Checkpoint.query.filter_by(race_id=race_id).all()
+        texts = translate_entities(checkpoints, language)
+        return [
             {
                 "id": checkpoint.id,
-                "title": title,
+                "title": texts[checkpoint.id]["title"],
                 "latitude": checkpoint.latitude,
                 "longitude": checkpoint.longitude,
-                "description": description,
+                "description": texts[checkpoint.id]["description"],
                 "numOfPoints": checkpoint.numOfPoints,
             }
-        )
+            for checkpoint in checkpoints
+        ]
 
-    return jsonify(response)
+    return catalog_response(race, CATALOG_CHECKPOINTS, language, build)
 
 # tested by test_checkpoint.py -> test_delete_checkpoint
 @checkpoints_bp.route('/', methods=['POST'])
@@ -315,6 +296,7 @@ def create_checkpoint(race_id):
         )
         db.session.add(new_checkpoint)
         created.append(new_checkpoint)
+    bump_catalog_version(race_id)
 
     # commit once for all created records
     db.session.commit()
@@ -385,9 +367,10 @@ def get_checkpoint(race_id, checkpoint_id):
       404:
         description: Race, user, or checkpoint not found
     """
-    race = Race.query.filter_by(id=race_id).first_or_404()
+    context = get_race_context(race_id)
+    race = context.race_or_404()
     # FIXME: there is missing if user is registred to the race and his registration is confirmed
-    user = User.query.filter_by(id=get_jwt_identity()).first_or_404()
+    user = context.user
     requested_language = request.args.get("lang")
     if requested_language and requested_language not in (race.supported_languages or []):
         logger.warning(
@@ -397,18 +380,29 @@ def get_checkpoint(race_id, checkpoint_id):
         )
     language = resolve_language(race, user, requested_language)
     checkpoint = Checkpoint.query.filter_by(race_id=race_id, id=checkpoint_id).first_or_404()
-    title, description = _apply_checkpoint_translation(checkpoint, language)
+    texts = translate_entity(checkpoint, language)
     return jsonify({
         "id": checkpoint.id,
-        "title": title,
+        "title": texts["title"],
         "latitude": checkpoint.latitude,
         "longitude": checkpoint.longitude,
-        "description": description,
+        "description": texts["description"],
         "numOfPoints": checkpoint.numOfPoints}), 200
 
+def _duplicate_checkpoint_log(race_id, data):
+    logger.error(
+        "Duplicate checkpoint log attempt - race: %s, team: %s, checkpoint: %s",
+        race_id,
+        data['team_id'],
+        data['checkpoint_id'],
+    )
+    return jsonify({"message": "Checkpoint already logged for this team."}), 409
+
+
 # tested by test_visits.py -> test_log_visit
 @checkpoints_bp.route("/log/", methods=["POST"])
 @jwt_required()
+@idempotent_request
 def log_visit(race_id):
     """
     Log a visit to a checkpoint by a team, optionally with an image.
@@ -423,6 +417,13 @@ def log_visit(race_id):
           type: integer
         required: true
         description: ID of the race
+      - in: header
+        name: Idempotency-Key
+        schema:
+          type: string
+          maxLength: 255
+        required: false
+        description: Client-generated key; retries with the same key and payload replay the original response (header `Idempotent-Replayed`) without logging again
     security:
       - BearerAuth: []
     requestBody:
@@ -442,6 +443,9 @@ def log_visit(race_id):
                 type: string
                 format: binary
                 description: Optional image file to upload
+              image_key:
+                type: string
+                description: Key of a photo already uploaded through `/api/race/{race_id}/images/upload-url/`, instead of `image`
         application/json:
           schema:
             type: object
@@ -452,6 +456,9 @@ def log_visit(race_id):
               team_id:
                 type: integer
                 example: 2
+              image_key:
+                type: string
+                description: Key of a photo already uploaded through `/api/race/{race_id}/images/upload-url/`
     responses:
       201:
         description: Visit logged successfully
@@ -471,6 +478,10 @@ def log_visit(race_id):
                 image_id:
                   type: integer
                   nullable: true
+                image_status:
+                  type: string
+                  enum: [pending, ready, failed]
+                  description: Present with an image; background processing state of the photo
       403:
         description: Unauthorized access or logging window closed for non-admin users
         content:
@@ -482,7 +493,7 @@ def log_visit(race_id):
                   type: string
                   example: You are not authorized to log this visit.
       400:
-        description: Invalid payload or invalid image upload
+        description: Invalid payload, invalid image upload or unknown image_key
         content:
           application/json:
             schema:
@@ -498,6 +509,8 @@ def log_visit(race_id):
         description: Duplicate checkpoint log for the same team and checkpoint
       413:
         description: Uploaded image exceeds configured size limit
+      422:
+        description: Idempotency-Key was already used with a different payload
     """
     # Accept both JSON and multipart/form-data
     if request.content_type and request.content_type.startswith('multipart/form-data'):
@@ -514,24 +527,20 @@ def log_visit(race_id):
         return jsonify({"errors": getattr(err, 'messages', str(err))}), 400
 
     # check if user is admin or member of the team
-    user = User.query.filter_by(id=get_jwt_identity()).first_or_404()
-    is_administrator = user.is_administrator
+    context = get_race_context(race_id, data['team_id'])
+    user = context.user
+    is_administrator = context.is_administrator
 
-    race = Race.query.filter_by(id=race_id).first_or_404()
-    now = datetime.now()
+    context.race_or_404()
     # allow logging only when inside logging period or if admin
-    if not(race.start_logging_at < now and now < race.end_logging_at) and not is_administrator:
+    if not context.logging_open() and not is_administrator:
         logger.error("Attempt to log visit outside logging period for race %s by user %s", race_id, user.id)
         return jsonify({"message": "Logging for this race is not allowed at this time."}), 403
 
-    registration = Registration.query.filter_by(
-        race_id=race_id,
-        team_id=data['team_id'],
-        payment_confirmed=True,
-    ).first_or_404()
-    user_is_in_team = int(data['team_id']) in [team.id for team in user.teams]
-    is_signed_to_race =  user_is_in_team and registration
+    context.registration_or_404()
+    is_signed_to_race = context.is_registered_team(data['team_id'])
 
+    image = None
     image_id = None
     image_latitude = None
     image_longitude = None
@@ -539,7 +548,6 @@ def log_visit(race_id):
     user_latitude = None
     user_longitude = None
     user_distance_km = None
-    saved_image_path = None
 
     # Extract user position from request if provided
     if 'user_latitude' in data and 'user_longitude' in data:
@@ -547,6 +555,18 @@ def log_visit(race_id):
         user_longitude = data.get('user_longitude')
 
     if is_administrator or is_signed_to_race:
+        # reject unknown checkpoints and duplicates before any file I/O
+        checkpoint = Checkpoint.query.filter_by(id=data['checkpoint_id'], race_id=race_id).first_or_404()
+        already_logged = db.session.query(CheckpointLog.id).filter_by(
+            checkpoint_id=checkpoint.id,
+            team_id=data['team_id'],
+            race_id=race_id,
+        ).first() is not None
+        if already_logged:
+            return _duplicate_checkpoint_log(race_id, data)
+
+        if file and data['image_key']:
+            return jsonify({"message": "Send either image or image_key, not both."}), 400
         if file:
             max_content_length = current_app.config.get('MAX_CONTENT_LENGTH')
             if max_content_length and request.content_length and request.content_length > max_content_length:
@@ -557,52 +577,33 @@ def log_visit(race_id):
                 logger.warning("Rejected checkpoint upload with invalid extension: %s", file.filename)
                 return jsonify({"message": "Invalid image file extension."}), 400
 
-            is_valid_image, validation_error = validate_uploaded_image(file)
-            if not is_valid_image:
-                logger.warning("Rejected checkpoint upload for race %s: %s", race_id, validation_error)
-                return jsonify({"message": validation_error}), 400
-
-            # Generate unique filename: timestamp_uuid_original.ext
-            original_filename = secure_filename(file.filename)
-            file_ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else 'jpg'
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            unique_id = uuid.uuid4().hex[:8]
-            filename = f"{timestamp}_{unique_id}.{file_ext}"
-
-            images_folder = current_app.config['IMAGE_UPLOAD_FOLDER']
-            os.makedirs(images_folder, exist_ok=True)
-            filepath = os.path.join(images_folder, filename)
-            saved_image_path = filepath
-            try:
-                file.save(filepath)
-
-                image_latitude, image_longitude = extract_image_coordinates(filepath)
-                if image_latitude is not None and image_longitude is not None:
-                    logger.info("Extracted GPS coordinates from image: (%s, %s)", image_latitude, image_longitude)
-                else:
-                    logger.info("No GPS coordinates found in image EXIF metadata for %s", filename)
+            # one header/EXIF read of the upload validates it and yields its GPS position
+            image_info = inspect_uploaded_image(file)
+            if not image_info.valid:
+                logger.warning("Rejected checkpoint upload for race %s: %s", race_id, image_info.error)
+                return jsonify({"message": image_info.error}), 400
 
-                image = Image(filename=filename)
-                db.session.add(image)
-                db.session.flush()
+            try:
+                # stored once per content; identical uploads share the file
+                image = store_image(file, image_info.format, status=IMAGE_STATUS_PENDING)
                 image_id = image.id
+                image_latitude, image_longitude = image_info.latitude, image_info.longitude
                 logger.info(
                     "Image %s saved for checkpoint visit (race %s, team %s)",
-                    filename,
+                    image.filename,
                     race_id,
                     data['team_id'],
                 )
-            except (OSError, ValueError) as err:
+            except OSError as err:
                 logger.error("Failed to save image for checkpoint visit: %s", err)
-                image_id = None
-                if saved_image_path and os.path.exists(saved_image_path):
-                    try:
-                        os.remove(saved_image_path)
-                    except OSError as cleanup_err:
-                        logger.error("Failed to cleanup image file %s: %s", saved_image_path, cleanup_err)
-
-        # Get checkpoint details for location validation
-        checkpoint = Checkpoint.query.filter_by(id=data['checkpoint_id'], race_id=race_id).first_or_404()
+                image = None
+        elif data['image_key']:
+            # uploaded straight to storage through a presigned URL
+            image = attach_uploaded_image(data['image_key'], status=IMAGE_STATUS_PENDING)
+            if image is None:
+                logger.warning("Checkpoint log for race %s references missing upload %s", race_id, data['image_key'])
+                return jsonify({"message": "Uploaded image not found."}), 400
+            image_id = image.id
 
         # Calculate distance if image coordinates are available
         if image_latitude is not None and image_longitude is not None:
@@ -619,7 +620,8 @@ def log_visit(race_id):
             )
 
         # log visit (always, regardless of user/image coordinates presence)
-        new_log = CheckpointLog(
+        log = insert_team_log(
+            CheckpointLog,
             checkpoint_id=data['checkpoint_id'],
             team_id=data['team_id'],
             race_id=race_id,
@@ -631,23 +633,14 @@ def log_visit(race_id):
             user_longitude=user_longitude,
             user_distance_km=user_distance_km
         )
-        db.session.add(new_log)
-        try:
-            db.session.commit()
-        except IntegrityError:
-            db.session.rollback()
-            if saved_image_path and os.path.exists(saved_image_path):
-                try:
-                    os.remove(saved_image_path)
-                except OSError as cleanup_err:
-                    logger.error("Failed to cleanup image file %s: %s", saved_image_path, cleanup_err)
-            logger.error(
-                "Duplicate checkpoint log attempt - race: %s, team: %s, checkpoint: %s",
-                race_id,
-                data['team_id'],
-                data['checkpoint_id'],
-            )
-            return jsonify({"message": "Checkpoint already logged for this team."}), 409
+        if log is None:
+            # a concurrent request logged the checkpoint after our check
+            if image is not None:
+                release_image(image)
+                db.session.commit()
+            return _duplicate_checkpoint_log(race_id, data)
+        record_team_log(race_id, data['team_id'], log.created_at, checkpoint_points=checkpoint.numOfPoints)
+        db.session.commit()
         logger.info(
             "Checkpoint visit logged: race %s, checkpoint %s, team %s, user %s",
             race_id,
@@ -657,12 +650,14 @@ def log_visit(race_id):
         )
 
         response_data = {
-            "id": new_log.id,
-            "checkpoint_id": new_log.checkpoint_id,
-            "team_id": new_log.team_id,
+            "id": log.id,
+            "checkpoint_id": data['checkpoint_id'],
+            "team_id": data['team_id'],
             "race_id": race_id,
             "image_id": image_id
         }
+        if image_id is not None:
+            response_data["image_status"] = submit_image_ingest(image_id)
 
         # Include proximity information if image coordinates are available
         if image_latitude is not None and image_longitude is not None:
@@ -770,22 +765,17 @@ def unlog_visit(race_id):
         logger.error("Checkpoint unlog validation failed for race %s: %s", race_id, err)
         return jsonify({"errors": getattr(err, 'messages', str(err))}), 400
 
-    user = User.query.filter_by(id=get_jwt_identity()).first_or_404()
-    is_administrator = user.is_administrator
+    context = get_race_context(race_id, data['team_id'])
+    user = context.user
+    is_administrator = context.is_administrator
 
-    race = Race.query.filter_by(id=race_id).first_or_404()
-    now = datetime.now()
-    if not (race.start_logging_at < now < race.end_logging_at) and not is_administrator:
+    context.race_or_404()
+    if not context.logging_open() and not is_administrator:
         logger.error("Unlog attempt outside logging period for race %s by user %s", race_id, user.id)
         return jsonify({"message": "Logging for this race is not allowed at this time."}), 403
 
-    user_is_in_team = int(data['team_id']) in [team.id for team in user.teams]
-    registration = Registration.query.filter_by(
-        race_id=race_id,
-        team_id=data['team_id'],
-        payment_confirmed=True,
-    ).first_or_404()
-    is_signed_to_race = user_is_in_team and registration
+    context.registration_or_404()
+    is_signed_to_race = context.is_registered_team(data['team_id'])
 
     if is_administrator or is_signed_to_race:
         log = CheckpointLog.query.filter_by(
@@ -795,18 +785,16 @@ def unlog_visit(race_id):
         ).first()
 
         if log:
+            checkpoint = db.session.get(Checkpoint, log.checkpoint_id)
+            db.session.delete(log)
+            record_tombstone(race_id, TOMBSTONE_CHECKPOINT, log.checkpoint_id, log.team_id)
+
+            # drop the image reference; shared photo files are reclaimed by the blob sweeper
+            legacy_image_path = None
             if log.image_id:
                 image = Image.query.filter_by(id=log.image_id).first()
                 if image:
-                    images_folder = current_app.config['IMAGE_UPLOAD_FOLDER']
-                    image_path = os.path.join(images_folder, image.filename)
-                    try:
-                        if os.path.exists(image_path):
-                            os.remove(image_path)
-                            logger.info("Deleted image file %s for checkpoint log %s", image.filename, log.id)
-                    except OSError as err:
-                        logger.error("Error deleting image file %s: %s", image.filename, err)
-                    db.session.delete(image)
+                    legacy_image_path = release_image(image)
                 else:
                     logger.warning(
                         "Missing image %s referenced by checkpoint log %s during unlog",
@@ -814,8 +802,9 @@ def unlog_visit(race_id):
                         log.id,
                     )
 
-            db.session.delete(log)
+            record_team_unlog(race_id, log.team_id, checkpoint_points=checkpoint.numOfPoints if checkpoint else 0)
             db.session.commit()
+            remove_image_files([legacy_image_path])
             logger.info(
                 "Checkpoint visit unlogged - race: %s, team: %s, checkpoint: %s, user: %s",
                 race_id,
@@ -866,11 +855,27 @@ def get_checkpoints_with_status(race_id, team_id):
           type: string
         required: false
         description: Optional language code for translated fields
+      - in: query
+        name: since
+        schema:
+          type: string
+        required: false
+        description: >
+          Cursor from the Sync-Cursor header or `cursor` of an earlier response; only
+          checkpoints whose data, translation or visit changed since then are returned
     security:
       - BearerAuth: []
     responses:
       200:
-        description: List of checkpoints with visit status (translated when available)
+        description: >
+          List of checkpoints with visit status (translated when available). With `since`
+          an object with the changed checkpoints in `items`, the ids of deleted checkpoints
+          in `deleted` and the next `cursor`.
+        headers:
+          Sync-Cursor:
+            schema:
+              type: string
+            description: Cursor to pass as `since` in the next poll
         content:
           application/json:
             schema:
@@ -895,6 +900,10 @@ def get_checkpoints_with_status(race_id, team_id):
                   image_filename:
                     type: string
                     nullable: true
+      304:
+        description: Not modified (If-None-Match matches the ETag of the full list)
+      400:
+        description: Invalid since cursor
       403:
         description: Unauthorized
         content:
@@ -910,13 +919,14 @@ def get_checkpoints_with_status(race_id, team_id):
     """
 
     # Check if the user is authorized to view this team's data
-    user = User.query.filter_by(id=get_jwt_identity()).first_or_404()
-    if not user.is_administrator and team_id not in [team.id for team in user.teams]:
+    context = get_race_context(race_id)
+    user = context.user
+    if not context.can_access_team(team_id):
         logger.error("Unauthorized access attempt to team %s checkpoints by user %s", team_id, user.id)
         return jsonify({"msg": "Unauthorized"}), 403
 
     # Get all checkpoints for the race
-    race = Race.query.filter_by(id=race_id).first_or_404()
+    race = context.race_or_404()
     requested_language = request.args.get("lang")
     if requested_language and requested_language not in (race.supported_languages or []):
         logger.warning(
@@ -925,17 +935,61 @@ def get_checkpoints_with_status(race_id, team_id):
             race_id,
         )
     language = resolve_language(race, user, requested_language)
-    checkpoints = (
-        Checkpoint.query.options(selectinload(Checkpoint.translations))
-        .filter_by(race_id=race_id)
-        .all()
+    try:
+        since = to_naive_utc(StatusDeltaQuerySchema().load(request.args.to_dict())['since'])
+    except ValidationError as err:
+        return jsonify({"errors": err.messages}), 400
+
+    etag = None
+    if since is None:
+        etag = status_etag(race, team_id, TOMBSTONE_CHECKPOINT, language)
+        not_modified = not_modified_response(etag)
+        if not_modified is not None:
+            return not_modified
+
+    cursor = current_cursor()
+    if since is None:
+        response = checkpoints_with_status(race_id, team_id, language)
+        body = response
+    else:
+        changed_ids, deleted_ids = status_delta(race_id, team_id, TOMBSTONE_CHECKPOINT, since, language)
+        response = checkpoints_with_status(race_id, team_id, language, changed_ids) if changed_ids else []
+        present_ids = {checkpoint["id"] for checkpoint in response}
+        body = {"items": response, "deleted": sorted(deleted_ids - present_ids), "cursor": cursor}
+
+    logger.info(
+        "Retrieved %s checkpoints with status for race %s, team %s, user %s (since %s)",
+        len(response),
+        race_id,
+        team_id,
+        user.id,
+        since,
     )
+    result = jsonify(body)
+    result.headers[SYNC_CURSOR_HEADER] = cursor
+    if etag is not None:
+        set_etag(result, etag)
+    return result, 200
+
+
+def checkpoints_with_status(race_id, team_id, language, checkpoint_ids=None):
+    """
+    Translated checkpoints of the race with the team's visit status; three queries.
+
+    ``checkpoint_ids`` limits the list to those checkpoints.
+    """
+    checkpoints = Checkpoint.query.filter_by(race_id=race_id)
+    visits = CheckpointLog.query.filter(CheckpointLog.race_id == race_id, CheckpointLog.team_id == team_id)
+    if checkpoint_ids is not None:
+        checkpoints = checkpoints.filter(Checkpoint.id.in_(checkpoint_ids))
+        visits = visits.filter(CheckpointLog.checkpoint_id.in_(checkpoint_ids))
+    checkpoints = checkpoints.all()
+    texts = translate_entities(checkpoints, language)
 
     # Fetch visits with image metadata in one outer-join query.
     visit_rows = (
-        db.session.query(CheckpointLog, Image.filename)
+        visits.with_entities(CheckpointLog, Image.filename)
         .outerjoin(Image, Image.id == CheckpointLog.image_id)
-        .filter(CheckpointLog.race_id == race_id, CheckpointLog.team_id == team_id)
         .all()
     )
     visits_by_checkpoint = {
@@ -943,25 +997,15 @@ def get_checkpoints_with_status(race_id, team_id):
         for visit, image_filename in visit_rows
     }
 
-    logger.info(
-        "Retrieved %s checkpoints with status for race %s, team %s, user %s",
-        len(checkpoints),
-        race_id,
-        team_id,
-        user.id,
-    )
-
-    # Build the response
     response = []
     for checkpoint in checkpoints:
         visit_entry = visits_by_checkpoint.get(checkpoint.id)
         visit = visit_entry[0] if visit_entry else None
         image_filename = visit_entry[1] if visit_entry else None
-        title, description = _apply_checkpoint_translation_prefetched(checkpoint, language)
         checkpoint_data = {
             "id": checkpoint.id,
-            "title": title,
-            "description": description,
+            "title": texts[checkpoint.id]["title"],
+            "description": texts[checkpoint.id]["description"],
             "latitude": checkpoint.latitude,
             "longitude": checkpoint.longitude,
             "numOfPoints": checkpoint.numOfPoints,
@@ -979,5 +1023,4 @@ def get_checkpoints_with_status(race_id, team_id):
                     visit.id,
                 )
         response.append(checkpoint_data)
-
-    return jsonify(response), 200
\ No newline at end of file
+    return response
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Request-scoped identity and race context for race_api handlers.
+
+Handlers used to query the user, the race, the user's teams and the target
+team's confirmed registration separately (3-5 round trips per request).
+``get_race_context`` loads all of them with one outer-joined query and
+memoizes the result on ``flask.g`` for the rest of the request.
+
+Tokens carrying membership claims (see app/services/membership_service.py)
+skip the ``team_members`` join; the same query checks their membership
+version and rejects stale tokens with 401 so the client refreshes them.
+"""
+from datetime import datetime
+
+from flask import abort, g, jsonify, make_response
+from flask_jwt_extended import get_jwt, get_jwt_identity
+
+from app import db
+from app.models import Race, Registration, User, team_members
+from app.services.membership_service import MEMBERSHIP_VERSION_CLAIM, RACE_TEAMS_CLAIM, TEAMS_CLAIM
+
+
+class RaceRequestContext:
+    """Current user, race, team memberships and target-team registration."""
+
+    def __init__(self, user, race, team_ids, registration, registered_team_ids=None):
+        self.user = user
+        self.race = race
+        self.team_ids = team_ids
+        self.registration = registration
+        # user's teams with a confirmed registration in this race, when known from token claims
+        self.registered_team_ids = registered_team_ids
+
+    @property
+    def is_administrator(self):
+        return bool(self.user.is_administrator)
+
+    def race_or_404(self):
+        if self.race is None:
+            abort(404)
+        return self.race
+
+    def registration_or_404(self):
+        if self.registration is None:
+            abort(404)
+        return self.registration
+
+    def is_team_member(self, team_id):
+        return int(team_id) in self.team_ids
+
+    def is_registered_team(self, team_id):
+        """Whether the user is on ``team_id`` and the team is confirmed for this race."""
+        if self.registered_team_ids is not None:
+            return int(team_id) in self.registered_team_ids
+        return (
+            self.is_team_member(team_id)
+            and self.registration is not None
+            and self.registration.team_id == int(team_id)
+        )
+
+    def can_access_team(self, team_id):
+        """Admins can access every team, other users only their own."""
+        return self.is_administrator or self.is_team_member(team_id)
+
+    def logging_open(self, now=None):
+        race = self.race_or_404()
+        now = now or datetime.now()
+        return race.start_logging_at < now < race.end_logging_at
+
+
+def _load_race_context(user_id, race_id, team_id, claims):
+    use_claims = MEMBERSHIP_VERSION_CLAIM in claims
+    query = (
+        db.session.query(User, Race, Registration)
+        .select_from(User)
+        .outerjoin(Race, Race.id == race_id)
+        .outerjoin(
+            Registration,
+            db.and_(
+                Registration.race_id == race_id,
+                Registration.team_id == team_id,
+                Registration.payment_confirmed.is_(True),
+            ),
+        )
+        .filter(User.id == user_id)
+    )
+    if not use_claims:
+        # tokens issued before membership claims: read memberships from the database
+        query = (
+            query.add_columns(team_members.c.team_id)
+            .outerjoin(team_members, team_members.c.user_id == User.id)
+        )
+    rows = query.all()
+    if not rows:
+        return None
+    user, race, registration = rows[0][:3]
+
+    if not use_claims:
+        team_ids = {row[3] for row in rows if row[3] is not None}
+        return RaceRequestContext(user, race, team_ids, registration)
+
+    if (user.membership_version or 0) != claims[MEMBERSHIP_VERSION_CLAIM]:
+        abort(make_response(jsonify({
+            "msg": "Team membership changed, refresh the access token.",
+            "code": "membership_stale",
+        }), 401))
+    team_ids = set(claims.get(TEAMS_CLAIM) or [])
+    registered_team_ids = {
+        pair_team_id for pair_race_id, pair_team_id in claims.get(RACE_TEAMS_CLAIM) or []
+        if pair_race_id == race_id
+    }
+    return RaceRequestContext(user, race, team_ids, registration, registered_team_ids)
+
+
+def reset_race_contexts():
+    """Drop memoized contexts; registered as a before_request hook of the race blueprint."""
+    g.pop('race_contexts', None)
+
+
+def get_race_context(race_id, team_id=None):
+    """
+    Return the memoized context of the JWT user for ``race_id``.
+
+    ``team_id`` selects the team whose confirmed registration is loaded.
+    Aborts with 404 when the user does not exist and with 401 when the
+    token's membership claims are outdated; a missing race or registration
+    is left to the caller (see ``race_or_404``).
+    """
+    cache = g.setdefault('race_contexts', {})
+    key = (race_id, None if team_id is None else int(team_id))
+    context = cache.get(key)
+    if context is None:
+        context = _load_race_context(get_jwt_identity(), race_id, key[1], get_jwt())
+        if context is None:
+            abort(404)
+        cache[key] = context
+    return context
@@ -0,0 +1,289 @@
+import logging
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from flask_jwt_extended import jwt_required
+from marshmallow import ValidationError
+
+from app.models import Race
+from app.routes.admin import admin_required
+from app.routes.race_api.context import get_race_context
+from app.schemas import ImageUploadUrlSchema
+from app.services.image_archive import iter_race_archive, purge_race_images
+from app.services.image_similarity import HASH_HEIGHT, HASH_WIDTH, find_duplicate_photos
+from app.services.image_store import presign_image_upload
+
+race_images_bp = Blueprint('race_images', __name__)
+logger = logging.getLogger(__name__)
+
+
+@race_images_bp.route('/upload-url/', methods=['POST'])
+@jwt_required()
+def create_image_upload_url(race_id):
+    """
+    Get a URL for uploading a checkpoint or task photo directly to storage.
+    The client PUTs the photo to `upload.url` with `upload.headers`, then logs
+    the visit or task with `image_key` instead of a multipart `image`. The key
+    is derived from the SHA-256 of the photo; when the photo is already stored
+    `upload` is null and the upload can be skipped.
+    ---
+    tags:
+      - Races
+    parameters:
+      - in: path
+        name: race_id
+        schema:
+          type: integer
+        required: true
+        description: ID of the race
+    security:
+      - BearerAuth: []
+    requestBody:
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              team_id:
+                type: integer
+                example: 2
+              sha256:
+                type: string
+                description: Lowercase hex SHA-256 of the photo bytes
+              content_type:
+                type: string
+                enum: [image/jpeg, image/png, image/gif]
+    responses:
+      200:
+        description: Object key and upload instructions
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                key:
+                  type: string
+                  example: 03/2c/032cbdc7...e1.jpg
+                upload:
+                  type: object
+                  nullable: true
+                  properties:
+                    url:
+                      type: string
+                    method:
+                      type: string
+                      example: PUT
+                    headers:
+                      type: object
+                    expires_in:
+                      type: integer
+      400:
+        description: Invalid payload
+      403:
+        description: Not a member of the team or logging window closed for non-admin users
+      404:
+        description: Race, user, or confirmed registration not found
+    """
+    try:
+        data = ImageUploadUrlSchema().load(request.get_json(silent=True) or {})
+    except ValidationError as err:
+        logger.warning("Image upload URL request validation failed for race %s: %s", race_id, err)
+        return jsonify({"errors": err.messages}), 400
+
+    team_id = data['team_id']
+    context = get_race_context(race_id, team_id)
+    user = context.user
+    context.race_or_404()
+    if not context.logging_open() and not context.is_administrator:
+        return jsonify({"message": "Logging for this race is not allowed at this time."}), 403
+
+    context.registration_or_404()
+    if not (context.is_administrator or context.is_registered_team(team_id)):
+        logger.warning("Unauthorized image upload URL request by user %s for team %s in race %s", user.id, team_id, race_id)
+        return jsonify({"message": "You are not authorized to log for this team."}), 403
+
+    result = presign_image_upload(data['sha256'], data['content_type'])
+    logger.info(
+        "Image upload URL issued: race %s, team %s, user %s, key %s, upload %s",
+        race_id,
+        team_id,
+        user.id,
+        result['key'],
+        "required" if result['upload'] else "skipped",
+    )
+    return jsonify(result), 200
+
+
+@race_images_bp.route('/duplicates/', methods=['GET'])
+@admin_required()
+def get_duplicate_images(race_id):
+    """
+    Find near-duplicate checkpoint photos logged by different teams (admin only).
+    Photos of the same checkpoint are compared by their perceptual hash; pairs
+    differing in at most `max_distance` bits are returned, closest first per
+    checkpoint. Photos uploaded before hashing existed need `flask images phash`.
+    ---
+    tags:
+      - Races
+    parameters:
+      - in: path
+        name: race_id
+        schema:
+          type: integer
+        required: true
+        description: ID of the race
+      - in: query
+        name: max_distance
+        schema:
+          type: integer
+          minimum: 0
+          maximum: 64
+        required: false
+        description: Maximum Hamming distance of the 64-bit hashes (default IMAGE_DUPLICATE_MAX_DISTANCE)
+    security:
+      - BearerAuth: []
+    responses:
+      200:
+        description: Near-duplicate photo pairs
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                max_distance:
+                  type: integer
+                pairs:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      checkpoint_id:
+                        type: integer
+                      distance:
+                        type: integer
+                      photos:
+                        type: array
+                        items:
+                          type: object
+                          properties:
+                            log_id:
+                              type: integer
+                            team_id:
+                              type: integer
+                            image_id:
+                              type: integer
+                            image_filename:
+                              type: string
+                            created_at:
+                              type: string
+                              format: date-time
+      400:
+        description: Invalid max_distance
+      403:
+        description: Admins only
+      404:
+        description: Race not found
+    """
+    Race.query.filter_by(id=race_id).first_or_404()
+    try:
+        max_distance = int(request.args.get('max_distance', current_app.config['IMAGE_DUPLICATE_MAX_DISTANCE']))
+    except ValueError:
+        max_distance = -1
+    if not 0 <= max_distance <= HASH_WIDTH * HASH_HEIGHT:
+        return jsonify({"message": "max_distance must be an integer between 0 and 64."}), 400
+
+    pairs = find_duplicate_photos(race_id, max_distance)
+    return jsonify({"max_distance": max_distance, "pairs": pairs}), 200
+
+
+@race_images_bp.route('/archive/', methods=['GET'])
+@admin_required()
+def download_race_images(race_id):
+    """
+    Download all checkpoint and task photos of a race as a ZIP (admin only).
+    Entries are named `checkpoints/<checkpoint_id>/team-<team_id>.<ext>` and
+    `tasks/<task_id>/team-<team_id>.<ext>`. The archive is streamed while it
+    is written, without a Content-Length.
+    ---
+    tags:
+      - Races
+    parameters:
+      - in: path
+        name: race_id
+        schema:
+          type: integer
+        required: true
+        description: ID of the race
+    security:
+      - BearerAuth: []
+    responses:
+      200:
+        description: ZIP archive of the race photos
+        content:
+          application/zip:
+            schema:
+              type: string
+              format: binary
+      403:
+        description: Admins only
+      404:
+        description: Race not found
+    """
+    Race.query.filter_by(id=race_id).first_or_404()
+    logger.info("Streaming photo archive of race %s", race_id)
+    response = Response(stream_with_context(iter_race_archive(race_id)), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="race-{race_id}-photos.zip"'
+    return response
+
+
+@race_images_bp.route('/', methods=['DELETE'])
+@admin_required()
+def purge_race_image_files(race_id):
+    """
+    Delete all checkpoint and task photos of a finished race (admin only).
+    The logs and their points are kept without photos. Stored files no other
+    race uses are deleted immediately.
+    ---
+    tags:
+      - Races
+    parameters:
+      - in: path
+        name: race_id
+        schema:
+          type: integer
+        required: true
+        description: ID of the race
+    security:
+      - BearerAuth: []
+    responses:
+      200:
+        description: Photos deleted
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                images_removed:
+                  type: integer
+                blobs_removed:
+                  type: integer
+                bytes_freed:
+                  type: integer
+      403:
+        description: Admins only
+      404:
+        description: Race not found
+      409:
+        description: Race logging has not ended yet
+    """
+    race = Race.query.filter_by(id=race_id).first_or_404()
+    if race.end_logging_at > datetime.now():
+        return jsonify({"message": "Photos can only be purged after logging for the race has ended."}), 409
+
+    images_removed, blobs_removed, bytes_freed = purge_race_images(race_id)
+    return jsonify({
+        "images_removed": images_removed,
+        "blobs_removed": blobs_removed,
+        "bytes_freed": bytes_freed,
+    }), 200
@@ -9,13 +9,13 @@ from app import db
 from app.models import (
   Race,
   RaceCategory,
-  RaceCategoryTranslation,
   Registration,
   User,
   race_categories_in_race,
 )
 from app.utils import resolve_language
 from app.routes.admin import admin_required
+from app.services.translation_service import translate_entities
 
 logger = logging.getLogger(__name__)
 
@@ -167,33 +167,9 @@ def get_race_categories(race_id):
             race_id
         )
     language = resolve_language(race, user, requested_language)
-    category_ids = [category.id for category in race.categories]
-    translations_by_category_id = {}
-    if language and category_ids:
-        translations = RaceCategoryTranslation.query.filter(
-            RaceCategoryTranslation.race_category_id.in_(category_ids),
-            RaceCategoryTranslation.language == language,
-        ).all()
-        logger.debug(
-            "Resolved %s race category translations for race %s in language '%s'",
-            len(translations),
-            race_id,
-            language,
-        )
-        translations_by_category_id = {
-            translation.race_category_id: translation
-            for translation in translations
-        }
-
-    response = []
-    for category in race.categories:
-        name = category.name
-        description = category.description
-        translation = translations_by_category_id.get(category.id)
-        if translation:
-            name = translation.name
-            description = translation.description
-        response.append({"id": category.id, "name": name, "description": description})
+    categories = race.categories
+    texts = translate_entities(categories, language)
+    response = [{"id": category.id, **texts[category.id]} for category in categories]
 
     logger.info("Returned %s categories for race %s", len(response), race_id)
     return jsonify(response)
@@ -6,9 +6,12 @@ from marshmallow import ValidationError
 from sqlalchemy.exc import IntegrityError
 
 from app import db
-from app.models import Race, RaceCategory, RaceTranslation, Registration, RegistrationPaymentAttempt, Team
+from app.models import Race, RaceCategory, Registration, RegistrationPaymentAttempt, Team
 from app.services.email_service import EmailService, generate_reset_token
 from app.services.email_tracking_service import add_registration_email_log, apply_brevo_event, normalize_email_send_result
+from app.services.membership_service import bump_team_membership_version
+from app.services.scoring_service import bump_score_version
+from app.services.translation_service import translate_entities, translate_entity
 from app.schemas import BrevoWebhookEventSchema
 from app.services.stripe_service import construct_stripe_event
 from app.services.stripe_service import create_registration_checkout_session
@@ -167,50 +170,20 @@ def get_race_by_registration_slug(registration_slug):
         return jsonify({'message': 'Race registration mode is misconfigured.'}), 409
 
     language = request.args.get('lang')
-    name = race.name
-    description = race.description
-    race_greeting = race.race_greeting
-    if language and language in (race.supported_languages or []):
-        translation = RaceTranslation.query.filter_by(
-            race_id=race.id,
-            language=language,
-        ).first()
-        if translation:
-            name = translation.name
-            description = translation.description
-            if translation.race_greeting is not None:
-                race_greeting = translation.race_greeting
-
-    categories = []
-    for category in race.categories:
-        category_name = category.name
-        category_description = category.description
-
-        if language and language in (race.supported_languages or []):
-            category_translation = next(
-                (translation for translation in (category.translations or []) if translation.language == language),
-                None,
-            )
-            if category_translation:
-                category_name = category_translation.name
-                category_description = category_translation.description
-
-        categories.append(
-            {
-                'id': category.id,
-                'name': category_name,
-                'description': category_description,
-            }
-        )
+    if not language or language not in (race.supported_languages or []):
+        language = None
+    texts = translate_entity(race, language)
+    category_texts = translate_entities(race.categories, language)
+    categories = [{'id': category.id, **category_texts[category.id]} for category in race.categories]
 
     return jsonify(
         {
             'id': race.id,
             'registration_slug': race.registration_slug,
             'registration_enabled': race.registration_enabled,
-            'name': name,
-            'description': description,
-            'race_greeting': race_greeting,
+            'name': texts['name'],
+            'description': texts['description'],
+            'race_greeting': texts['race_greeting'],
             'min_team_size': race.min_team_size,
             'max_team_size': race.max_team_size,
             'allow_team_registration': race.allow_team_registration,
@@ -600,6 +573,9 @@ def stripe_registration_webhook():
         registration.payment_confirmed = True
         registration.payment_confirmed_at = payment_attempt.confirmed_at
         registration.stripe_session_id = session_id
+        bump_score_version(registration.race_id)
+        if not was_paid_before:
+            bump_team_membership_version(registration.team_id)
 
     race = Race.query.filter_by(id=registration.race_id).first()
     team = Team.query.filter_by(id=registration.team_id).first()
@@ -1,18 +1,49 @@
-from flask import Blueprint, jsonify
+import json
+import logging
+import queue
+import sys
+import time
+
+from flask import Blueprint, Response, current_app, jsonify, request
 from flask_jwt_extended import jwt_required
+from marshmallow import ValidationError
 
 from app import db
-from app.models import Checkpoint, CheckpointLog, Race, RaceCategory, Registration, Task, TaskLog, Team
+from app.models import Race
+from app.routes.admin import admin_required
+from app.schemas import RaceResultsQuerySchema, RaceResultsTimelineQuerySchema
+from app.services.leaderboard_hub import StreamLimitReached
+from app.services.scoring_service import load_race_results, load_race_standings_timeline
+from app.utils import not_modified_response, set_etag, to_naive_utc
+
+logger = logging.getLogger(__name__)
 
 race_results_bp = Blueprint('race_results', __name__)
 
 
+def _sse_event(event_name, payload):
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {payload['version']}\nevent: {event_name}\ndata: {data}\n\n"
+
+
+def _serves_concurrent_requests(environ):
+    """True when an open stream does not block the worker: threaded server or gevent-patched sockets."""
+    if environ.get('wsgi.multithread'):
+        return True
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
+
+
 @race_results_bp.route('/results/', methods=['GET'])
 @jwt_required()
 def get_race_results(race_id):
     """
   Get race results for teams with confirmed payments in a race.
-    Returns per-team totals for checkpoints and tasks, and overall total.
+    Returns ranked per-team totals for checkpoints and tasks, and overall total.
+    Teams are ordered by total points; ties go to the team whose last log came
+    first. Disqualified teams are listed last without a rank. With `as_of` the
+    standings are replayed from the logs created up to that time (using the
+    current point values of checkpoints and tasks).
     ---
     tags:
       - Races
@@ -23,11 +54,41 @@ def get_race_results(race_id):
           type: integer
         required: true
         description: ID of the race
+      - in: query
+        name: category
+        schema:
+          type: integer
+        required: false
+        description: Only rank teams of this race category
+      - in: query
+        name: top
+        schema:
+          type: integer
+        required: false
+        description: Return only the first N teams of the leaderboard
+      - in: query
+        name: as_of
+        schema:
+          type: string
+          format: date-time
+        required: false
+        description: Standings as they were at this time (naive times are UTC)
+      - in: header
+        name: If-None-Match
+        schema:
+          type: string
+        required: false
+        description: ETag of previously fetched results; returns 304 when unchanged
     security:
       - BearerAuth: []
     responses:
       200:
         description: Race results grouped by team (payment-confirmed registrations only)
+        headers:
+          ETag:
+            schema:
+              type: string
+            description: Race score version; changes whenever results change
         content:
           application/json:
             schema:
@@ -35,93 +96,242 @@ def get_race_results(race_id):
               items:
                 type: object
                 properties:
+                  rank:
+                    type: integer
+                    nullable: true
+                    description: Position in the leaderboard (shared on ties, null when disqualified)
                   team_id:
                     type: integer
                   team:
                     type: string
                     description: Team name
+                  category_id:
+                    type: integer
                   category:
                     type: string
                     description: Race category name
+                  disqualified:
+                    type: boolean
                   points_for_checkpoints:
                     type: integer
                   points_for_tasks:
                     type: integer
                   total_points:
                     type: integer
+                  last_log_at:
+                    type: string
+                    format: date-time
+                    nullable: true
+                    description: Time of the team's latest log, used as tie-break
+      304:
+        description: Results unchanged since the version given in If-None-Match
+      400:
+        description: Invalid category, top or as_of parameter
       404:
         description: Race not found
     """
-    Race.query.filter_by(id=race_id).first_or_404()
-
-    # table of teams with confirmed registration payment, ordered by team_id
-    registrations = (
-        db.session.query(
-            Registration.team_id,
-            Registration.disqualified,
-            Team.name.label('team_name'),
-            RaceCategory.name.label('race_category_name'),
-        )
-        .select_from(Registration)
-        .join(Team, Registration.team_id == Team.id)
-        .join(RaceCategory, Registration.race_category_id == RaceCategory.id)
-      .filter(
-        Registration.race_id == race_id,
-        Registration.payment_confirmed.is_(True),
-      )
-        .order_by(Registration.team_id)
-        .all()
-    )
+    score_version = db.session.query(Race.score_version).filter(Race.id == race_id).first_or_404()[0]
+
+    try:
+        query_data = RaceResultsQuerySchema().load(request.args.to_dict())
+    except ValidationError as err:
+        return jsonify({'errors': err.messages}), 400
+    category_id = query_data['category']
+    top = query_data['top']
+    as_of = to_naive_utc(query_data['as_of'])
+
+    etag = f"race-{race_id}-scores-{score_version}"
+    if category_id is not None or top is not None:
+        etag = f"{etag}-category-{category_id or 'all'}-top-{top or 'all'}"
+    if as_of is not None:
+        etag = f"{etag}-as-of-{as_of.isoformat()}"
+    not_modified = not_modified_response(etag)
+    if not_modified is not None:
+        return not_modified
+
+    result = load_race_results(race_id, category_id=category_id, top=top, as_of=as_of)
+    return set_etag(jsonify(result), etag), 200
+
+
+@race_results_bp.route('/results/timeline/', methods=['GET'])
+@admin_required()
+def get_race_results_timeline(race_id):
+    """
+    Get the race standings at evenly spaced points in time, requires admin privileges.
+    Splits the interval (defaults to the race logging window) into `buckets`
+    equal parts and returns the ranked standings at the end of each part, read
+    in a single pass over the race's logs.
+    ---
+    tags:
+      - Races
+    parameters:
+      - in: path
+        name: race_id
+        schema:
+          type: integer
+        required: true
+        description: ID of the race
+      - in: query
+        name: buckets
+        schema:
+          type: integer
+          minimum: 1
+          maximum: 100
+          default: 10
+        required: false
+        description: Number of evenly spaced snapshots
+      - in: query
+        name: from
+        schema:
+          type: string
+          format: date-time
+        required: false
+        description: Start of the interval (default start_logging_at)
+      - in: query
+        name: to
+        schema:
+          type: string
+          format: date-time
+        required: false
+        description: End of the interval (default end_logging_at)
+      - in: query
+        name: category
+        schema:
+          type: integer
+        required: false
+        description: Only rank teams of this race category
+    security:
+      - BearerAuth: []
+    responses:
+      200:
+        description: Standings snapshots ordered by time
+        content:
+          application/json:
+            schema:
+              type: array
+              items:
+                type: object
+                properties:
+                  as_of:
+                    type: string
+                    format: date-time
+                  teams:
+                    type: array
+                    description: Ranked rows in the same shape as /results/
+                    items:
+                      type: object
+      400:
+        description: Invalid query parameters
+      403:
+        description: Admins only
+      404:
+        description: Race not found
+    """
+    race = Race.query.filter_by(id=race_id).first_or_404()
+
+    try:
+        query_data = RaceResultsTimelineQuerySchema().load(request.args.to_dict())
+    except ValidationError as err:
+        return jsonify({'errors': err.messages}), 400
 
-    # points for checkpoints for each team which has logged at least one checkpoint, ordered by team_id
-    checkpoints_points = (
-        db.session.query(CheckpointLog.team_id, db.func.sum(Checkpoint.numOfPoints).label('total_points'))
-        .select_from(CheckpointLog)
-        .join(Checkpoint, CheckpointLog.checkpoint_id == Checkpoint.id)
-        .filter(CheckpointLog.race_id == race_id)
-        .group_by(CheckpointLog.team_id)
-        .order_by(CheckpointLog.team_id)
-        .all()
+    start = to_naive_utc(query_data['start']) or race.start_logging_at
+    end = to_naive_utc(query_data['end']) or race.end_logging_at
+    if start >= end:
+        return jsonify({'errors': {'to': ['Must be later than from.']}}), 400
+
+    etag = (
+        f"race-{race_id}-timeline-{race.score_version}-{start.isoformat()}-{end.isoformat()}"
+        f"-buckets-{query_data['buckets']}-category-{query_data['category'] or 'all'}"
     )
+    not_modified = not_modified_response(etag)
+    if not_modified is not None:
+        return not_modified
 
-    # points for tasks for each team which has logged at least one task, ordered by team_id
-    tasks_points = (
-        db.session.query(TaskLog.team_id, db.func.sum(Task.numOfPoints).label('total_points'))
-        .select_from(TaskLog)
-        .join(Task, TaskLog.task_id == Task.id)
-        .filter(TaskLog.race_id == race_id)
-        .group_by(TaskLog.team_id)
-        .order_by(TaskLog.team_id)
-        .all()
+    timeline = load_race_standings_timeline(
+        race_id,
+        start,
+        end,
+        query_data['buckets'],
+        category_id=query_data['category'],
     )
+    return set_etag(jsonify(timeline), etag), 200
+
 
-    result = []
-    checkpoint_idx = 0
-    task_idx = 0
-    for reg in registrations:
-        points_for_checkpoints = 0
-        points_for_tasks = 0
-
-        if checkpoint_idx < len(checkpoints_points) and reg.team_id == checkpoints_points[checkpoint_idx].team_id:
-            # fill points for checkpoints if this team has any, otherwise leave 0
-            points_for_checkpoints = checkpoints_points[checkpoint_idx].total_points
-            checkpoint_idx += 1
-
-        if task_idx < len(tasks_points) and reg.team_id == tasks_points[task_idx].team_id:
-            # fill points for tasks if this team has any, otherwise leave 0
-            points_for_tasks = tasks_points[task_idx].total_points
-            task_idx += 1
-
-        result.append(
-            {
-                'team_id': reg.team_id,
-                'team': reg.team_name,
-                'category': reg.race_category_name,
-                'disqualified': bool(reg.disqualified),
-                'points_for_checkpoints': points_for_checkpoints,
-                'points_for_tasks': points_for_tasks,
-                'total_points': points_for_checkpoints + points_for_tasks,
-            }
-        )
-
-    return jsonify(result), 200
+@race_results_bp.route('/results/stream/', methods=['GET'])
+@jwt_required()
+def stream_race_results(race_id):
+    """
+    Stream live race results as Server-Sent Events.
+    Sends a full `snapshot` event on connect, then `update` events containing
+    only the team rows that changed. Comment lines are sent as heartbeats and
+    the server closes the stream after LEADERBOARD_STREAM_MAX_SECONDS; EventSource
+    clients reconnect automatically. The access token is only accepted in the
+    Authorization header (query strings end up in access logs), so browsers
+    need a fetch-based SSE client instead of EventSource. Sync (one request
+    per process) workers refuse streams, since each one would block the worker.
+    ---
+    tags:
+      - Races
+    parameters:
+      - in: path
+        name: race_id
+        schema:
+          type: integer
+        required: true
+        description: ID of the race
+    security:
+      - BearerAuth: []
+    responses:
+      200:
+        description: text/event-stream with `snapshot` and `update` events
+      404:
+        description: Race not found
+      503:
+        description: >
+          Too many open result streams on this worker, or the worker cannot serve
+          streams (sync worker class); poll /results/ instead
+    """
+    db.session.query(Race.id).filter(Race.id == race_id).first_or_404()
+
+    if not _serves_concurrent_requests(request.environ):
+        logger.warning("Rejected results stream for race %s: worker serves one request at a time", race_id)
+        return jsonify({"message": "Live result streams are not available on this server, poll results instead."}), 503
+
+    hub = current_app.extensions['leaderboard_hub']
+    try:
+        subscriber, snapshot = hub.subscribe(race_id)
+    except StreamLimitReached:
+        logger.warning("Rejected results stream for race %s: connection limit reached", race_id)
+        response = jsonify({"message": "Too many live result streams, poll results instead."})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    # release the DB connection; the stream itself never touches the session
+    db.session.close()
+
+    heartbeat_seconds = current_app.config['LEADERBOARD_STREAM_HEARTBEAT_SECONDS']
+    max_seconds = current_app.config['LEADERBOARD_STREAM_MAX_SECONDS']
+
+    def event_stream():
+        deadline = time.monotonic() + max_seconds
+        yield "retry: 3000\n\n"
+        yield _sse_event('snapshot', snapshot)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                update = subscriber.get(timeout=min(heartbeat_seconds, remaining))
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+                continue
+            yield _sse_event('update', update)
+
+    logger.info("Results stream opened for race %s", race_id)
+    response = Response(
+        event_stream(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+    # runs when the server closes the response, including client disconnects
+    response.call_on_close(lambda: hub.unsubscribe(race_id, subscriber))
+    return response
@@ -0,0 +1,334 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, jsonify, request
+from flask_jwt_extended import jwt_required
+from marshmallow import ValidationError
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Checkpoint, CheckpointLog, IdempotencyKey, RaceScore, Task, TaskLog
+from app.routes.race_api.context import get_race_context
+from app.schemas import RaceSyncSchema
+from app.services.scoring_service import recompute_team_scores
+from app.utils import calculate_distance, local_to_naive_utc, to_naive_utc
+
+race_sync_bp = Blueprint('race_sync', __name__)
+logger = logging.getLogger(__name__)
+
+
+def _item_fingerprint(item):
+    payload = {name: value for name, value in item.items() if name != 'key'}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _earliest_logged_at(race, team_id, now):
+    """
+    Earliest time a synced log may claim, as naive UTC.
+
+    Client times feed the results tie-break, so they may not go back before
+    the logging window, the offline window (``SYNC_MAX_BACKDATE_SECONDS``)
+    or the team's latest log the server already accepted.
+    """
+    bounds = [
+        local_to_naive_utc(race.start_logging_at),
+        now - timedelta(seconds=current_app.config['SYNC_MAX_BACKDATE_SECONDS']),
+        db.session.query(RaceScore.last_log_at).filter_by(race_id=race.id, team_id=team_id).scalar(),
+    ]
+    return max(bound for bound in bounds if bound is not None)
+
+
+def _stored_keys(user_id, scope, items, now):
+    """Item keys already applied for the team by this user, as ``{key: fingerprint}``; drops expired ones."""
+    keys = {item['key'] for item in items if item['key']}
+    if not keys:
+        return {}
+    stored = {}
+    for row in IdempotencyKey.query.filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key.in_(keys),
+    ):
+        if row.expires_at > now:
+            stored[row.key] = row.fingerprint
+        else:
+            db.session.delete(row)
+    db.session.flush()
+    return stored
+
+
+def _logged_at(item, earliest, now):
+    """Client timestamp clamped to [earliest, now] (naive UTC); ``now`` when missing."""
+    logged_at = to_naive_utc(item['logged_at'])
+    if logged_at is None:
+        return now
+    return min(max(logged_at, earliest), now)
+
+
+def _apply_sync_batch(race, team_id, items, now, user_id, scope):
+    """
+    Add the batch's new logs to the session and return per-item results.
+
+    ``now`` is the server-local time the logging window was checked against;
+    like the race window it is converted to naive UTC, the form log
+    timestamps are stored in, before client times are clamped to it. Item
+    keys are stored with the logs (scoped to the user and team), so an item
+    replayed from a stale batch is not applied again, e.g. after an unlog.
+    Reads the referenced checkpoints/tasks, the team's existing logs and the
+    stored keys with one query each, so the cost does not grow with round
+    trips per item.
+    """
+    now = local_to_naive_utc(now)
+    earliest = _earliest_logged_at(race, team_id, now)
+    keys = _stored_keys(user_id, scope, items, now)
+    key_expires_at = now + timedelta(seconds=current_app.config['IDEMPOTENCY_KEY_TTL_SECONDS'])
+    checkpoint_ids = {item['id'] for item in items if item['type'] == 'checkpoint'}
+    task_ids = {item['id'] for item in items if item['type'] == 'task'}
+
+    checkpoints = {}
+    logged_checkpoint_ids = set()
+    if checkpoint_ids:
+        checkpoints = {
+            checkpoint.id: checkpoint
+            for checkpoint in Checkpoint.query.filter(
+                Checkpoint.race_id == race.id,
+                Checkpoint.id.in_(checkpoint_ids),
+            )
+        }
+        logged_checkpoint_ids = {
+            checkpoint_id for (checkpoint_id,) in db.session.query(CheckpointLog.checkpoint_id).filter(
+                CheckpointLog.race_id == race.id,
+                CheckpointLog.team_id == team_id,
+                CheckpointLog.checkpoint_id.in_(checkpoint_ids),
+            )
+        }
+
+    tasks = {}
+    logged_task_ids = set()
+    if task_ids:
+        tasks = {
+            task.id: task
+            for task in Task.query.filter(Task.race_id == race.id, Task.id.in_(task_ids))
+        }
+        logged_task_ids = {
+            task_id for (task_id,) in db.session.query(TaskLog.task_id).filter(
+                TaskLog.race_id == race.id,
+                TaskLog.team_id == team_id,
+                TaskLog.task_id.in_(task_ids),
+            )
+        }
+
+    results = []
+    for item in items:
+        result = {'key': item['key'], 'type': item['type'], 'id': item['id']}
+        results.append(result)
+
+        key = item['key']
+        if key in keys:
+            # replayed from a batch that was already applied
+            if keys[key] != _item_fingerprint(item):
+                result.update(status='invalid', message='Key was already used with a different item.')
+            else:
+                result['status'] = 'already_logged'
+            continue
+
+        if item['type'] == 'checkpoint':
+            checkpoint = checkpoints.get(item['id'])
+            if checkpoint is None:
+                result.update(status='invalid', message='Checkpoint not found in this race.')
+                continue
+            if checkpoint.id in logged_checkpoint_ids:
+                result['status'] = 'already_logged'
+            else:
+                user_latitude = item['user_latitude']
+                user_longitude = item['user_longitude']
+                user_distance_km = None
+                if user_latitude is not None and user_longitude is not None:
+                    user_distance_km = calculate_distance(
+                        checkpoint.latitude, checkpoint.longitude,
+                        user_latitude, user_longitude
+                    )
+                db.session.add(CheckpointLog(
+                    checkpoint_id=checkpoint.id,
+                    team_id=team_id,
+                    race_id=race.id,
+                    user_latitude=user_latitude,
+                    user_longitude=user_longitude,
+                    user_distance_km=user_distance_km,
+                    created_at=_logged_at(item, earliest, now),
+                ))
+                logged_checkpoint_ids.add(checkpoint.id)
+                result['status'] = 'logged'
+        else:
+            task = tasks.get(item['id'])
+            if task is None:
+                result.update(status='invalid', message='Task not found in this race.')
+                continue
+            if task.id in logged_task_ids:
+                result['status'] = 'already_logged'
+            else:
+                db.session.add(TaskLog(
+                    task_id=task.id,
+                    team_id=team_id,
+                    race_id=race.id,
+                    created_at=_logged_at(item, earliest, now),
+                ))
+                logged_task_ids.add(task.id)
+                result['status'] = 'logged'
+
+        if key:
+            keys[key] = _item_fingerprint(item)
+            db.session.add(IdempotencyKey(
+                user_id=user_id,
+                scope=scope,
+                key=key,
+                fingerprint=keys[key],
+                status_code=200,
+                response_body=json.dumps(result),
+                expires_at=key_expires_at,
+            ))
+
+    return results
+
+
+@race_sync_bp.route('/sync/', methods=['POST'])
+@jwt_required()
+def sync_logs(race_id):
+    """
+    Apply a batch of offline checkpoint and task logs for one team.
+    Authorization and the logging window are checked once for the whole batch;
+    all new logs are written in a single transaction. Items that were already
+    logged (e.g. a retried batch) are reported as `already_logged`, unknown
+    checkpoints/tasks as `invalid`. Logs with photos still go through the
+    checkpoint/task log endpoints, as does unlogging.
+    ---
+    tags:
+      - Races
+    parameters:
+      - in: path
+        name: race_id
+        schema:
+          type: integer
+        required: true
+        description: ID of the race
+    security:
+      - BearerAuth: []
+    requestBody:
+      required: true
+      content:
+        application/json:
+          schema:
+            type: object
+            properties:
+              team_id:
+                type: integer
+                example: 2
+              items:
+                type: array
+                maxItems: 200
+                items:
+                  type: object
+                  properties:
+                    type:
+                      type: string
+                      enum: [checkpoint, task]
+                    id:
+                      type: integer
+                      description: Checkpoint or task ID
+                    key:
+                      type: string
+                      description: >
+                        Client idempotency key, echoed back in the item result. Stored with the log, so the
+                        item of a replayed batch is reported as already_logged even after an unlog
+                    logged_at:
+                      type: string
+                      format: date-time
+                      description: >
+                        Client time of the log, clamped to the current time and to the latest of the logging
+                        window start, SYNC_MAX_BACKDATE_SECONDS ago and the team's latest accepted log
+                    user_latitude:
+                      type: number
+                    user_longitude:
+                      type: number
+    responses:
+      200:
+        description: Per-item results in request order
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                results:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      key:
+                        type: string
+                      type:
+                        type: string
+                      id:
+                        type: integer
+                      status:
+                        type: string
+                        enum: [logged, already_logged, invalid]
+                      message:
+                        type: string
+                logged:
+                  type: integer
+      400:
+        description: Invalid payload
+      403:
+        description: Not a member of the team or logging window closed for non-admin users
+      404:
+        description: Race, user, or confirmed registration not found
+      409:
+        description: Concurrent writes conflicted with the batch; retry it
+    """
+    try:
+        data = RaceSyncSchema().load(request.get_json(silent=True) or {})
+    except ValidationError as err:
+        logger.warning("Sync batch validation failed for race %s: %s", race_id, err)
+        return jsonify({"errors": err.messages}), 400
+
+    team_id = data['team_id']
+    context = get_race_context(race_id, team_id)
+    user = context.user
+    race = context.race_or_404()
+    now = datetime.now()
+    if not context.logging_open(now) and not context.is_administrator:
+        logger.warning("Sync batch outside logging period for race %s by user %s", race_id, user.id)
+        return jsonify({"message": "Logging for this race is not allowed at this time."}), 403
+
+    context.registration_or_404()
+    if not (context.is_administrator or context.is_registered_team(team_id)):
+        logger.warning("Unauthorized sync batch by user %s for team %s in race %s", user.id, team_id, race_id)
+        return jsonify({"message": "You are not authorized to log for this team."}), 403
+
+    # a concurrent single log can win the unique constraint between our read and
+    # commit; re-plan the batch once, the retry then reports it as already logged
+    for attempt in range(2):
+        results = _apply_sync_batch(race, team_id, data['items'], now, user.id, f"POST {request.path} team {team_id}")
+        logged = sum(1 for result in results if result['status'] == 'logged')
+        try:
+            if logged:
+                recompute_team_scores(race_id, {team_id})
+            db.session.commit()
+            break
+        except IntegrityError:
+            db.session.rollback()
+            logger.warning("Sync batch for race %s team %s hit a concurrent log (attempt %s)", race_id, team_id, attempt + 1)
+    else:
+        return jsonify({"message": "Conflicting concurrent logs, retry the batch."}), 409
+
+    logger.info(
+        "Sync batch applied: race %s, team %s, user %s, %s items, %s logged",
+        race_id,
+        team_id,
+        user.id,
+        len(results),
+        logged,
+    )
+    return jsonify({"results": results, "logged": logged}), 200
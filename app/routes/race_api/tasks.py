@@ -1,17 +1,27 @@
-import os
-import uuid
 import logging
-from datetime import datetime
 from flask import Blueprint, jsonify, request, current_app
-from sqlalchemy.exc import IntegrityError
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from werkzeug.utils import secure_filename
+from flask_jwt_extended import jwt_required
 from marshmallow import ValidationError
 
 from app import db
-from app.models import Task, TaskLog, User, Image, Registration, Race, TaskTranslation
-from app.schemas import TaskCreateSchema, TaskLogSchema
-from app.utils import resolve_language, allowed_file, validate_uploaded_image
+from app.models import Task, TaskLog, Image, Race
+from app.routes.race_api.context import get_race_context
+from app.schemas import StatusDeltaQuerySchema, TaskCreateSchema, TaskLogSchema
+from app.services.catalog_service import CATALOG_TASKS, bump_catalog_version, catalog_response
+from app.services.idempotency_service import idempotent_request
+from app.services.image_ingest import IMAGE_STATUS_PENDING, submit_image_ingest
+from app.services.image_store import attach_uploaded_image, release_image, remove_image_files, store_image
+from app.services.scoring_service import insert_team_log, record_team_log, record_team_unlog
+from app.services.status_delta import (
+    SYNC_CURSOR_HEADER,
+    TOMBSTONE_TASK,
+    current_cursor,
+    record_tombstone,
+    status_delta,
+    status_etag,
+)
+from app.services.translation_service import translate_entities, translate_entity
+from app.utils import resolve_language, allowed_file, inspect_uploaded_image, not_modified_response, set_etag, to_naive_utc
 from app.routes.admin import admin_required
 
 logger = logging.getLogger(__name__)
@@ -19,16 +29,6 @@ logger = logging.getLogger(__name__)
 # Blueprint for tasks
 tasks_bp = Blueprint('tasks', __name__)
 
-def _apply_task_translation(task, language):
-    if not language:
-        return task.title, task.description
-    translation = TaskTranslation.query.filter_by(task_id=task.id, language=language).first()
-    if translation:
-        return translation.title, translation.description
-    else:
-        logger.debug("No translation found for task %s in language '%s'", task.id, language)
-        return task.title, task.description
-
 @tasks_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_tasks(race_id):
@@ -68,9 +68,12 @@ def get_tasks(race_id):
                     type: string
                   numOfPoints:
                     type: integer
+      304:
+        description: Not modified (If-None-Match matches the ETag of the list)
     """
-    race = Race.query.filter_by(id=race_id).first_or_404()
-    user = User.query.filter_by(id=get_jwt_identity()).first_or_404()
+    context = get_race_context(race_id)
+    race = context.race_or_404()
+    user = context.user
     requested_language = request.args.get("lang")
     if requested_language and requested_language not in (race.supported_languages or []):
         logger.warning(
@@ -78,16 +81,21 @@ def get_tasks(race_id):
             requested_language, race_id
         )
     language = resolve_language(race, user, requested_language)
-    tasks = Task.query.filter_by(race_id=race_id).all()
-    return jsonify([
-        {
-            "id": task.id,
-            "title": _apply_task_translation(task, language)[0],
-            "description": _apply_task_translation(task, language)[1],
-            "numOfPoints": task.numOfPoints
-        }
-        for task in tasks
-    ])
+
+    def build():
+        tasks = Task.query.filter_by(race_id=race_id).all()
+        texts = translate_entities(tasks, language)
+        return [
+            {
+                "id": task.id,
+                "title": texts[task.id]["title"],
+                "description": texts[task.id]["description"],
+                "numOfPoints": task.numOfPoints
+            }
+            for task in tasks
+        ]
+
+    return catalog_response(race, CATALOG_TASKS, language, build)
 
 @tasks_bp.route('/', methods=['POST'])
 @admin_required()
@@ -242,6 +250,7 @@ def create_task(race_id):
         )
         db.session.add(new_task)
         created.append(new_task)
+    bump_catalog_version(race_id)
     db.session.commit()
     logger.info("Created %s task(s) for race %s", len(created), race_id)
 
@@ -300,8 +309,9 @@ def get_task(race_id, task_id):
       404:
         description: Task not found
     """
-    race = Race.query.filter_by(id=race_id).first_or_404()
-    user = User.query.filter_by(id=get_jwt_identity()).first_or_404()
+    context = get_race_context(race_id)
+    race = context.race_or_404()
+    user = context.user
     requested_language = request.args.get("lang")
     if requested_language and requested_language not in (race.supported_languages or []):
         logger.warning(
@@ -310,15 +320,22 @@ def get_task(race_id, task_id):
         )
     language = resolve_language(race, user, requested_language)
     task = Task.query.filter_by(race_id=race_id, id=task_id).first_or_404()
-    title, description = _apply_task_translation(task, language)
+    texts = translate_entity(task, language)
     return jsonify({
         "id": task.id,
-        "title": title,
-        "description": description,
+        "title": texts["title"],
+        "description": texts["description"],
         "numOfPoints": task.numOfPoints}), 200
 
+
+def _duplicate_task_log(race_id, data):
+    logger.warning("Duplicate task log attempt - race: %s, team: %s, task: %s", race_id, data['team_id'], data['task_id'])
+    return jsonify({"message": "Task already logged for this team."}), 409
+
+
 @tasks_bp.route("/log/", methods=["POST"])
 @jwt_required()
+@idempotent_request
 def log_task_completion(race_id):
     """
     Log completion of a task by a team, optionally with an image.
@@ -333,6 +350,13 @@ def log_task_completion(race_id):
           type: integer
         required: true
         description: ID of the race
+      - in: header
+        name: Idempotency-Key
+        schema:
+          type: string
+          maxLength: 255
+        required: false
+        description: Client-generated key; retries with the same key and payload replay the original response (header `Idempotent-Replayed`) without logging again
     requestBody:
       required: true
       content:
@@ -350,6 +374,9 @@ def log_task_completion(race_id):
                 type: string
                 format: binary
                 description: Optional image file to upload
+              image_key:
+                type: string
+                description: Key of a photo already uploaded through `/api/race/{race_id}/images/upload-url/`, instead of `image`
         application/json:
           schema:
             type: object
@@ -360,6 +387,9 @@ def log_task_completion(race_id):
               team_id:
                 type: integer
                 example: 2
+              image_key:
+                type: string
+                description: Key of a photo already uploaded through `/api/race/{race_id}/images/upload-url/`
     responses:
       201:
         description: Task completion logged successfully
@@ -379,6 +409,10 @@ def log_task_completion(race_id):
                 image_id:
                   type: integer
                   nullable: true
+                image_status:
+                  type: string
+                  enum: [pending, ready, failed]
+                  description: Present with an image; background processing state of the photo
       403:
         description: Unauthorized access
         content:
@@ -389,8 +423,12 @@ def log_task_completion(race_id):
                 message:
                   type: string
                   example: You are not authorized to log this task.
+      400:
+        description: Invalid payload, invalid image upload or unknown image_key
       404:
-        description: Race or team not found
+        description: Race, team or task not found
+      422:
+        description: Idempotency-Key was already used with a different payload
     """
     # Accept both JSON and multipart/form-data
     if request.content_type and request.content_type.startswith('multipart/form-data'):
@@ -405,27 +443,34 @@ def log_task_completion(race_id):
     except ValidationError as err:
         logger.warning("Task log validation failed for race %s: %s", race_id, err)
         return jsonify({"errors": getattr(err, 'messages', str(err))}), 400
-    user = User.query.filter_by(id=get_jwt_identity()).first_or_404()
-    is_administrator = user.is_administrator
+    context = get_race_context(race_id, data['team_id'])
+    user = context.user
+    is_administrator = context.is_administrator
 
-    race = Race.query.filter_by(id=race_id).first_or_404()
-    now = datetime.now()
+    context.race_or_404()
     # allow logging only when inside logging period or if admin
-    if not(race.start_logging_at < now and now < race.end_logging_at) and not is_administrator:
+    if not context.logging_open() and not is_administrator:
         logger.warning("Task completion log attempt outside logging period for race %s by user %s", race_id, user.id)
         return jsonify({"message": "Logging for this race is not allowed at this time."}), 403
 
-    registration = Registration.query.filter_by(
-        race_id=race_id,
-        team_id=data['team_id'],
-        payment_confirmed=True,
-    ).first_or_404()
-    user_is_in_team = int(data['team_id']) in [team.id for team in user.teams]
-    is_signed_to_race = user_is_in_team and registration
+    context.registration_or_404()
+    is_signed_to_race = context.is_registered_team(data['team_id'])
 
+    image = None
     image_id = None
-    saved_image_path = None
     if is_administrator or is_signed_to_race:
+        # reject unknown tasks and duplicates before any file I/O
+        task = Task.query.filter_by(id=data['task_id'], race_id=race_id).first_or_404()
+        already_logged = db.session.query(TaskLog.id).filter_by(
+            task_id=task.id,
+            team_id=data['team_id'],
+            race_id=race_id,
+        ).first() is not None
+        if already_logged:
+            return _duplicate_task_log(race_id, data)
+
+        if file and data['image_key']:
+            return jsonify({"message": "Send either image or image_key, not both."}), 400
         if file:
             max_content_length = current_app.config.get('MAX_CONTENT_LENGTH')
             if max_content_length and request.content_length and request.content_length > max_content_length:
@@ -436,59 +481,52 @@ def log_task_completion(race_id):
                 logger.warning("Rejected task upload with invalid extension: %s", file.filename)
                 return jsonify({"message": "Invalid image file extension."}), 400
 
-            is_valid_image, validation_error = validate_uploaded_image(file)
-            if not is_valid_image:
-                logger.warning("Rejected task upload for race %s: %s", race_id, validation_error)
-                return jsonify({"message": validation_error}), 400
-
-            # Generate unique filename: timestamp_uuid_original.ext
-            original_filename = secure_filename(file.filename)
-            file_ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else 'jpg'
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            unique_id = uuid.uuid4().hex[:8]
-            filename = f"{timestamp}_{unique_id}.{file_ext}"
-
-            upload_folder = current_app.config['IMAGE_UPLOAD_FOLDER']
-            filepath = os.path.join(upload_folder, filename)
-            saved_image_path = filepath
-            os.makedirs(upload_folder, exist_ok=True)
+            image_info = inspect_uploaded_image(file)
+            if not image_info.valid:
+                logger.warning("Rejected task upload for race %s: %s", race_id, image_info.error)
+                return jsonify({"message": image_info.error}), 400
+
             try:
-                file.save(filepath)
-                logger.info("Task image saved: %s for race %s, team %s", filename, race_id, data['team_id'])
+                # stored once per content; identical uploads share the file
+                image = store_image(file, image_info.format, status=IMAGE_STATUS_PENDING)
             except OSError as e:
-                logger.error("Error saving task image %s: %s", filename, e)
-                saved_image_path = None
+                logger.error("Error saving task image for race %s, team %s: %s", race_id, data['team_id'], e)
             else:
-                image = Image(filename=filename)
-                db.session.add(image)
-                db.session.flush()
                 image_id = image.id
+                logger.info("Task image saved: %s for race %s, team %s", image.filename, race_id, data['team_id'])
+        elif data['image_key']:
+            # uploaded straight to storage through a presigned URL
+            image = attach_uploaded_image(data['image_key'], status=IMAGE_STATUS_PENDING)
+            if image is None:
+                logger.warning("Task log for race %s references missing upload %s", race_id, data['image_key'])
+                return jsonify({"message": "Uploaded image not found."}), 400
+            image_id = image.id
 
         # log task completion
-        new_log = TaskLog(
+        log = insert_team_log(
+            TaskLog,
             task_id=data['task_id'],
             team_id=data['team_id'],
             race_id=race_id,
             image_id=image_id)
-        db.session.add(new_log)
-        try:
-            db.session.commit()
-            logger.info("Task completion logged - race: %s, team: %s, task: %s, user: %s", race_id, data['team_id'], data['task_id'], user.id)
-        except IntegrityError:
-            db.session.rollback()
-            if saved_image_path and os.path.exists(saved_image_path):
-                try:
-                    os.remove(saved_image_path)
-                except OSError as cleanup_err:
-                    logger.error("Error cleaning up task image file %s: %s", saved_image_path, cleanup_err)
-            logger.warning("Duplicate task log attempt - race: %s, team: %s, task: %s", race_id, data['team_id'], data['task_id'])
-            return jsonify({"message": "Task already logged for this team."}), 409
-        return jsonify({
-            "id": new_log.id,
-            "task_id": new_log.task_id,
-            "team_id": new_log.team_id,
+        if log is None:
+            # a concurrent request logged the task after our check
+            if image is not None:
+                release_image(image)
+                db.session.commit()
+            return _duplicate_task_log(race_id, data)
+        record_team_log(race_id, data['team_id'], log.created_at, task_points=task.numOfPoints)
+        db.session.commit()
+        logger.info("Task completion logged - race: %s, team: %s, task: %s, user: %s", race_id, data['team_id'], data['task_id'], user.id)
+        response_data = {
+            "id": log.id,
+            "task_id": data['task_id'],
+            "team_id": data['team_id'],
             "race_id": race_id,
-            "image_id": image_id}), 201
+            "image_id": image_id}
+        if image_id is not None:
+            response_data["image_status"] = submit_image_ingest(image_id)
+        return jsonify(response_data), 201
     else:
         logger.warning("Unauthorized task completion log attempt by user %s for team %s", user.id, data['team_id'])
         return jsonify({"message": "You are not authorized to log this task."}), 403
@@ -563,23 +601,18 @@ def unlog_task_completion(race_id):
         return jsonify({"errors": getattr(err, 'messages', str(err))}), 400
 
     # check if user is admin or member of the team
-    user = User.query.filter_by(id=get_jwt_identity()).first_or_404()
-    is_administrator = user.is_administrator
+    context = get_race_context(race_id, data['team_id'])
+    user = context.user
+    is_administrator = context.is_administrator
 
-    race = Race.query.filter_by(id=race_id).first_or_404()
-    now = datetime.now()
+    context.race_or_404()
     # allow logging only when inside logging period or if admin
-    if not(race.start_logging_at < now and now < race.end_logging_at) and not is_administrator:
+    if not context.logging_open() and not is_administrator:
         logger.warning("Task unlog attempt outside logging period for race %s by user %s", race_id, user.id)
         return jsonify({"message": "Logging for this race is not allowed at this time."}), 403
 
-    user_is_in_team = int(data['team_id']) in [team.id for team in user.teams]
-    registration = Registration.query.filter_by(
-        race_id=race_id,
-        team_id=data['team_id'],
-        payment_confirmed=True,
-    ).first_or_404()
-    is_signed_to_race = user_is_in_team and registration
+    context.registration_or_404()
+    is_signed_to_race = context.is_registered_team(data['team_id'])
 
     if is_administrator or is_signed_to_race:
         log = TaskLog.query.filter_by(
@@ -589,19 +622,16 @@ def unlog_task_completion(race_id):
         ).first()
 
         if log:
-            # Delete associated image file and record if present.
+            task = db.session.get(Task, log.task_id)
+            db.session.delete(log)
+            record_tombstone(race_id, TOMBSTONE_TASK, log.task_id, log.team_id)
+
+            # Release the associated image record; shared photo files are reclaimed by the blob sweeper.
+            legacy_image_path = None
             if log.image_id:
                 image = Image.query.filter_by(id=log.image_id).first()
                 if image:
-                    upload_folder = current_app.config['IMAGE_UPLOAD_FOLDER']
-                    image_path = os.path.join(upload_folder, image.filename)
-                    try:
-                        if os.path.exists(image_path):
-                            os.remove(image_path)
-                            logger.info("Deleted task image file %s for log %s", image.filename, log.id)
-                    except OSError as e:
-                        logger.error("Error deleting task image file %s: %s", image.filename, e)
-                    db.session.delete(image)
+                    legacy_image_path = release_image(image)
                 else:
                     logger.warning(
                         "Missing image %s referenced by task log %s during unlog",
@@ -609,8 +639,9 @@ def unlog_task_completion(race_id):
                         log.id,
                     )
 
-            db.session.delete(log)
+            record_team_unlog(race_id, log.team_id, task_points=task.numOfPoints if task else 0)
             db.session.commit()
+            remove_image_files([legacy_image_path])
             logger.info(
                 "Task completion unlogged - race: %s, team: %s, task: %s, user: %s",
                 race_id,
@@ -659,11 +690,27 @@ def get_tasks_with_status(race_id, team_id):
             type: string
           required: false
           description: Optional language code for translated fields
+        - in: query
+          name: since
+          schema:
+            type: string
+          required: false
+          description: >
+            Cursor from the Sync-Cursor header or `cursor` of an earlier response; only
+            tasks whose data, translation or completion changed since then are returned
     security:
         - BearerAuth: []
     responses:
         200:
-          description: List of tasks with completion status (translated when available)
+          description: >
+            List of tasks with completion status (translated when available). With `since`
+            an object with the changed tasks in `items`, the ids of deleted tasks in
+            `deleted` and the next `cursor`.
+          headers:
+            Sync-Cursor:
+              schema:
+                type: string
+              description: Cursor to pass as `since` in the next poll
           content:
             application/json:
               schema:
@@ -685,16 +732,21 @@ def get_tasks_with_status(race_id, team_id):
                       type: string
                       nullable: true
                       description: Present when a completion includes an image
+        304:
+          description: Not modified (If-None-Match matches the ETag of the full list)
+        400:
+          description: Invalid since cursor
         403:
           description: Unauthorized (user is not an admin or team member)
       """
 
-    user = User.query.filter_by(id=get_jwt_identity()).first_or_404()
-    if not user.is_administrator and team_id not in [team.id for team in user.teams]:
+    context = get_race_context(race_id)
+    user = context.user
+    if not context.can_access_team(team_id):
         logger.warning("Unauthorized access attempt to team %s tasks by user %s", team_id, user.id)
         return jsonify({"msg": "Unauthorized"}), 403
 
-    race = Race.query.filter_by(id=race_id).first_or_404()
+    race = context.race_or_404()
     requested_language = request.args.get("lang")
     if requested_language and requested_language not in (race.supported_languages or []):
         logger.warning(
@@ -702,31 +754,73 @@ def get_tasks_with_status(race_id, team_id):
             requested_language, race_id
         )
     language = resolve_language(race, user, requested_language)
-    tasks = race.tasks
+    try:
+        since = to_naive_utc(StatusDeltaQuerySchema().load(request.args.to_dict())['since'])
+    except ValidationError as err:
+        return jsonify({"errors": err.messages}), 400
+
+    etag = None
+    if since is None:
+        etag = status_etag(race, team_id, TOMBSTONE_TASK, language)
+        not_modified = not_modified_response(etag)
+        if not_modified is not None:
+            return not_modified
+
+    cursor = current_cursor()
+    if since is None:
+        response = tasks_with_status(race, team_id, language)
+        body = response
+    else:
+        changed_ids, deleted_ids = status_delta(race_id, team_id, TOMBSTONE_TASK, since, language)
+        response = tasks_with_status(race, team_id, language, changed_ids) if changed_ids else []
+        present_ids = {task["id"] for task in response}
+        body = {"items": response, "deleted": sorted(deleted_ids - present_ids), "cursor": cursor}
+
+    logger.info(
+        "Retrieved %d tasks with status for race %d, team %d, user %d (since %s)",
+        len(response), race_id, team_id, user.id, since,
+    )
+    result = jsonify(body)
+    result.headers[SYNC_CURSOR_HEADER] = cursor
+    if etag is not None:
+        set_etag(result, etag)
+    return result, 200
+
+
+def tasks_with_status(race, team_id, language, task_ids=None):
+    """
+    Translated tasks of the race with the team's completion status; three queries.
+
+    ``task_ids`` limits the list to those tasks.
+    """
+    race_id = race.id
+    completions = TaskLog.query.filter(TaskLog.race_id == race_id, TaskLog.team_id == team_id)
+    if task_ids is None:
+        tasks = race.tasks
+    else:
+        tasks = Task.query.filter(Task.race_id == race_id, Task.id.in_(task_ids)).all()
+        completions = completions.filter(TaskLog.task_id.in_(task_ids))
 
     completion_rows = (
-      db.session.query(TaskLog, Image.filename.label('image_filename'))
+      completions.with_entities(TaskLog, Image.filename.label('image_filename'))
       .outerjoin(Image, Image.id == TaskLog.image_id)
-      .filter(TaskLog.race_id == race_id, TaskLog.team_id == team_id)
       .all()
     )
     completions_by_task = {
       completion.task_id: (completion, image_filename)
       for completion, image_filename in completion_rows
     }
-
-    logger.info("Retrieved %d tasks with status for race %d, team %d, user %d", len(tasks), race_id, team_id, user.id)
+    texts = translate_entities(tasks, language)
 
     response = []
     for task in tasks:
         completion_entry = completions_by_task.get(task.id)
         completion = completion_entry[0] if completion_entry else None
         image_filename = completion_entry[1] if completion_entry else None
-        title, description = _apply_task_translation(task, language)
         task_data = {
             "id": task.id,
-            "title": title,
-            "description": description,
+            "title": texts[task.id]["title"],
+            "description": texts[task.id]["description"],
             "numOfPoints": task.numOfPoints,
           "completed": completion_entry is not None,
         }
@@ -740,5 +834,4 @@ def get_tasks_with_status(race_id, team_id):
               completion.id,
             )
         response.append(task_data)
-
-    return jsonify(response), 200
\ No newline at end of file
+    return response
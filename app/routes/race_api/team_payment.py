@@ -9,6 +9,8 @@ from app.models import Race, Registration, RegistrationPaymentAttempt, Team
 from app.routes.admin import admin_required
 from app.services.stripe_service import create_registration_checkout_session
 from app.services.stripe_service import get_checkout_session_payment_state
+from app.services.membership_service import bump_team_membership_version
+from app.services.scoring_service import bump_score_version
 from app.utils import registration_mode as _registration_mode
 
 logger = logging.getLogger(__name__)
@@ -37,6 +39,7 @@ def _sync_registration_payment_state(registration, race):
 
     mode = _registration_mode(race)
     relevant = team_confirmed if mode == 'team' else driver_confirmed
+    was_confirmed = bool(registration.payment_confirmed)
 
     if relevant:
         latest = max(relevant, key=lambda attempt: ((attempt.confirmed_at or attempt.created_at), attempt.id))
@@ -48,6 +51,12 @@ def _sync_registration_payment_state(registration, race):
         registration.payment_confirmed_at = None
         registration.stripe_session_id = None
 
+    # payment-confirmed registrations make up the results table
+    bump_score_version(registration.race_id)
+    if bool(registration.payment_confirmed) != was_confirmed:
+        # confirmed registrations are embedded in the members' access tokens
+        bump_team_membership_version(registration.team_id)
+
 
 @team_payment_bp.route("/team/<int:team_id>/payments/retry/", methods=["POST"])
 @admin_required()
@@ -1,10 +1,11 @@
 import logging
 
 from flask import Blueprint, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 
 from app import db
-from app.models import Checkpoint, CheckpointLog, Image, Task, TaskLog, User
+from app.models import Checkpoint, CheckpointLog, Image, Task, TaskLog
+from app.routes.race_api.context import get_race_context
 from app.routes.admin import admin_required
 
 race_visits_bp = Blueprint('race_visits', __name__)
@@ -47,8 +48,9 @@ def get_visits_by_race_and_team(race_id, team_id):
       403:
         description: Forbidden, user is not an admin or member of the team.
     """
-    user = User.query.filter_by(id=get_jwt_identity()).first_or_404()
-    if not user.is_administrator and team_id not in [team.id for team in user.teams]:
+    context = get_race_context(race_id)
+    user = context.user
+    if not context.can_access_team(team_id):
         logger.warning(
             "Unauthorized visit history access for race %s team %s by user %s",
             race_id,
@@ -63,6 +65,7 @@ def get_visits_by_race_and_team(race_id, team_id):
             CheckpointLog.checkpoint_id,
             Checkpoint.title.label('checkpoint_title'),
             Image.filename.label('image_filename'),
+            Image.status.label('image_status'),
             Checkpoint.numOfPoints,
             CheckpointLog.team_id,
             CheckpointLog.created_at,
@@ -97,6 +100,7 @@ def get_visits_by_race_and_team(race_id, team_id):
             'team_id': visit.team_id,
             'created_at': visit.created_at,
             'image_filename': visit.image_filename,
+            'image_status': visit.image_status,
             'image_distance_km': visit.image_distance_km,
             'image_latitude': visit.image_latitude,
             'image_longitude': visit.image_longitude,
@@ -146,7 +150,7 @@ def get_visits_by_race(race_id):
         description: Admins only
     """
     visits = (
-      db.session.query(CheckpointLog, Image.filename.label('image_filename'))
+      db.session.query(CheckpointLog, Image.filename.label('image_filename'), Image.status.label('image_status'))
       .outerjoin(Image, CheckpointLog.image_id == Image.id)
       .filter(CheckpointLog.race_id == race_id)
       .all()
@@ -158,6 +162,7 @@ def get_visits_by_race(race_id):
         'team_id': visit.team_id,
         'created_at': visit.created_at,
         'image_filename': image_filename,
+        'image_status': image_status,
         'image_distance_km': visit.image_distance_km,
         'image_latitude': visit.image_latitude,
         'image_longitude': visit.image_longitude,
@@ -165,7 +170,7 @@ def get_visits_by_race(race_id):
         'user_latitude': visit.user_latitude,
         'user_longitude': visit.user_longitude,
         }
-      for visit, image_filename in visits
+      for visit, image_filename, image_status in visits
     ])
 
 
@@ -220,8 +225,9 @@ def get_task_completions_by_race_and_team(race_id, team_id):
       403:
         description: Forbidden, user is not an admin or member of the team.
     """
-    user = User.query.filter_by(id=get_jwt_identity()).first_or_404()
-    if not user.is_administrator and team_id not in [team.id for team in user.teams]:
+    context = get_race_context(race_id)
+    user = context.user
+    if not context.can_access_team(team_id):
         logger.warning(
             "Unauthorized task completion history access for race %s team %s by user %s",
             race_id,
@@ -236,6 +242,7 @@ def get_task_completions_by_race_and_team(race_id, team_id):
             TaskLog.task_id,
             Task.title.label('task_title'),
             Image.filename.label('image_filename'),
+            Image.status.label('image_status'),
             Task.numOfPoints,
             TaskLog.team_id,
             TaskLog.created_at,
@@ -264,6 +271,7 @@ def get_task_completions_by_race_and_team(race_id, team_id):
             'team_id': completion.team_id,
             'created_at': completion.created_at,
             'image_filename': completion.image_filename,
+            'image_status': completion.image_status,
         }
         for completion in completions
     ])
@@ -307,7 +315,7 @@ def get_task_completions_by_race(race_id):
         description: Admins only
     """
     completions = (
-      db.session.query(TaskLog, Image.filename.label('image_filename'))
+      db.session.query(TaskLog, Image.filename.label('image_filename'), Image.status.label('image_status'))
       .outerjoin(Image, TaskLog.image_id == Image.id)
       .filter(TaskLog.race_id == race_id)
       .all()
@@ -319,6 +327,7 @@ def get_task_completions_by_race(race_id):
             'team_id': completion.team_id,
             'created_at': completion.created_at,
             'image_filename': image_filename,
+            'image_status': image_status,
         }
-      for completion, image_filename in completions
+      for completion, image_filename, image_status in completions
     ])
@@ -6,6 +6,7 @@ from sqlalchemy.exc import IntegrityError
 from app import db
 from app.models import RaceCategory, RaceCategoryTranslation, Registration, race_categories_in_race
 from app.routes.admin import admin_required
+from app.services.translation_service import translate_entities
 from app.schemas import (
   RaceCategoryCreateSchema,
   RaceCategoryTranslationCreateSchema,
@@ -61,18 +62,8 @@ def get_race_categories():
         return jsonify({"errors": {"language": ["Unsupported language"]}}), 400
     categories = RaceCategory.query.all()
     language = requested_language or DEFAULT_LANGUAGE
-    response = []
-    for category in categories:
-        name = category.name
-        description = category.description
-        translation = RaceCategoryTranslation.query.filter_by(
-            race_category_id=category.id,
-            language=language,
-        ).first()
-        if translation:
-            name = translation.name
-            description = translation.description
-        response.append({"id": category.id, "name": name, "description": description})
+    texts = translate_entities(categories, language)
+    response = [{"id": category.id, **texts[category.id]} for category in categories]
     return jsonify(response), 200
 
 # create new race category
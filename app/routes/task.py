@@ -1,6 +1,6 @@
 import os
 import logging
-from flask import Blueprint, jsonify, current_app, request
+from flask import Blueprint, jsonify, request
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -8,6 +8,10 @@ from app import db
 from app.models import Task, TaskLog, Image, TaskTranslation
 from app.routes.admin import admin_required
 from app.schemas import TaskUpdateSchema, TaskTranslationCreateSchema, TaskTranslationUpdateSchema
+from app.services.catalog_service import bump_catalog_version
+from app.services.image_store import release_image, remove_image_derivatives
+from app.services.scoring_service import recompute_task_scores, recompute_team_scores
+from app.services.status_delta import TOMBSTONE_TASK, record_tombstone, touch_entity
 from app.utils import find_translation_by_language, is_supported_race_language, resolve_title_description
 
 logger = logging.getLogger(__name__)
@@ -149,8 +153,12 @@ def update_task(task_id):
         task.description = validated['description']
         updated_fields.append('description')
     if 'numOfPoints' in validated:
+        points_changed = task.numOfPoints != validated['numOfPoints']
         task.numOfPoints = validated['numOfPoints']
         updated_fields.append('numOfPoints')
+        if points_changed:
+            recompute_task_scores(task)
+    bump_catalog_version(task.race_id)
 
     db.session.commit()
     logger.info("Task %s updated - fields: %s", task_id, ', '.join(updated_fields))
@@ -274,6 +282,7 @@ def create_task_translation(task_id):
         description=validated.get("description"),
     )
     db.session.add(translation)
+    bump_catalog_version(task.race_id)
     try:
         db.session.commit()
     except IntegrityError:
@@ -352,6 +361,7 @@ def update_task_translation(task_id, language):
         translation.title = validated["title"]
     if "description" in validated:
         translation.description = validated["description"]
+    bump_catalog_version(task.race_id)
 
     db.session.commit()
     logger.info("Task translation updated for task %s language %s", task_id, language)
@@ -393,6 +403,8 @@ def delete_task_translation(task_id, language):
         description: Translation not found
     """
     translation = TaskTranslation.query.filter_by(task_id=task_id, language=language).first_or_404()
+    bump_catalog_version(translation.task.race_id)
+    touch_entity(translation.task)
     db.session.delete(translation)
     db.session.commit()
     logger.info("Task translation deleted for task %s language %s", task_id, language)
@@ -443,21 +455,19 @@ def delete_task(task_id):
     )
     images_by_id = {image.id: image for image in images}
 
-    image_paths = []
-    images_folder = current_app.config['IMAGE_UPLOAD_FOLDER']
-    for image in images:
-        image_paths.append((image.filename, os.path.join(images_folder, image.filename)))
-
     for log in logs:
         if log.image_id and log.image_id not in images_by_id:
             logger.warning("Task %s log %s references missing image %s", task_id, log.id, log.image_id)
         db.session.delete(log)
 
-    for image in images:
-        db.session.delete(image)
+    # blob-backed photos only lose a reference; pre-blob files are unlinked after commit
+    legacy_image_paths = [release_image(image) for image in images]
 
     db.session.delete(task)
+    bump_catalog_version(task.race_id)
+    record_tombstone(task.race_id, TOMBSTONE_TASK, task.id)
     try:
+        recompute_team_scores(task.race_id, {log.team_id for log in logs})
         db.session.commit()
     except SQLAlchemyError as err:
         db.session.rollback()
@@ -465,13 +475,14 @@ def delete_task(task_id):
         return jsonify({"message": "Unable to delete task."}), 500
 
     deleted_images = 0
-    for filename, image_path in image_paths:
+    for image_path in filter(None, legacy_image_paths):
+        remove_image_derivatives(image_path)
         try:
             if os.path.exists(image_path):
                 os.remove(image_path)
                 deleted_images += 1
         except OSError as e:
-            logger.error("Error deleting image file %s for task %s: %s", filename, task_id, e)
+            logger.error("Error deleting image file %s for task %s: %s", image_path, task_id, e)
 
-    logger.info("Task %s deleted with %s logs and %s images", task_id, len(logs), deleted_images)
+    logger.info("Task %s deleted with %s logs and %s images (%s files removed)", task_id, len(logs), len(images), deleted_images)
     return jsonify({"message": "Task and associated logs deleted."}), 200
@@ -19,6 +19,8 @@ from app.schemas import (
 )
 from app.services.email_service import EmailService, generate_reset_token
 from app.services.email_tracking_service import add_registration_email_log, normalize_email_send_result
+from app.services.membership_service import bump_membership_version, bump_team_membership_version
+from app.services.scoring_service import bump_score_version
 from app.utils import (
   registration_mode as _registration_mode,
   resolve_race_category_name as _resolve_race_category_name,
@@ -425,6 +427,8 @@ def delete_registration(race_id, team_id):
     """
     registration = Registration.query.filter_by(race_id=race_id, team_id=team_id).first_or_404()
     db.session.delete(registration)
+    bump_score_version(race_id)
+    bump_team_membership_version(team_id)
     db.session.commit()
     logger.info("Registration deleted: team %s unregistered from race %s", team_id, race_id)
     return jsonify({"message": "Registration deleted successfully"}), 200
@@ -500,6 +504,7 @@ def toggle_disqualification(race_id, team_id):
 
     disqualified = validated['disqualified']
     registration.disqualified = disqualified
+    bump_score_version(race_id)
     db.session.commit()
 
     action = "disqualified" if disqualified else "reverted to competing status"
@@ -1071,6 +1076,7 @@ def add_members(team_id):
                 team.members.append(user)
                 added_user_ids.append(user.id)
 
+    bump_membership_version(added_user_ids)
     db.session.commit()
     logger.info("Added %s members to team %s: %s", len(added_user_ids), team_id, added_user_ids)
     return jsonify({"team_id": team.id, "user_ids": added_user_ids}), 201
@@ -1131,6 +1137,7 @@ def remove_all_members(team_id):
         description: Team not found
     """
     team = Team.query.filter_by(id=team_id).first_or_404()
+    bump_membership_version(user.id for user in team.members)
     team.members.clear()
     db.session.commit()
     logger.info("All members removed from team %s (ID: %s)", team.name, team.id)
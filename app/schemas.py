@@ -1,5 +1,6 @@
-from marshmallow import INCLUDE, Schema, fields, validate, pre_load, validates_schema, ValidationError
+from marshmallow import EXCLUDE, INCLUDE, Schema, fields, validate, pre_load, validates_schema, ValidationError
 from app.constants import SUPPORTED_LANGUAGES, DEFAULT_LANGUAGE
+from app.utils import to_naive_utc
 
 
 class CheckpointCreateSchema(Schema):
@@ -57,6 +58,7 @@ class CheckpointUpdateSchema(Schema):
 class CheckpointLogSchema(Schema):
     checkpoint_id = fields.Integer(required=True)
     team_id = fields.Integer(required=True)
+    image_key = fields.String(load_default=None, allow_none=True, validate=validate.Length(max=255))
     image_latitude = fields.Float(load_default=None)
     image_longitude = fields.Float(load_default=None)
     image_distance_km = fields.Float(load_default=None)
@@ -111,6 +113,34 @@ class TaskUpdateSchema(Schema):
 class TaskLogSchema(Schema):
     task_id = fields.Integer(required=True)
     team_id = fields.Integer(required=True)
+    image_key = fields.String(load_default=None, allow_none=True, validate=validate.Length(max=255))
+
+
+class ImageUploadUrlSchema(Schema):
+    team_id = fields.Integer(required=True)
+    sha256 = fields.String(required=True, validate=validate.Regexp(r'^[0-9a-f]{64}$'))
+    content_type = fields.String(
+        required=True,
+        validate=validate.OneOf(['image/jpeg', 'image/png', 'image/gif']),
+    )
+
+
+class SyncLogItemSchema(Schema):
+    type = fields.String(required=True, validate=validate.OneOf(['checkpoint', 'task']))
+    id = fields.Integer(required=True, validate=validate.Range(min=1))
+    key = fields.String(load_default=None, allow_none=True, validate=validate.Length(max=100))
+    logged_at = fields.DateTime(load_default=None, allow_none=True)
+    user_latitude = fields.Float(load_default=None, allow_none=True)
+    user_longitude = fields.Float(load_default=None, allow_none=True)
+
+
+class RaceSyncSchema(Schema):
+    team_id = fields.Integer(required=True)
+    items = fields.List(
+        fields.Nested(SyncLogItemSchema),
+        required=True,
+        validate=validate.Length(min=1, max=200),
+    )
 
 
 class RaceCreateSchema(Schema):
@@ -420,6 +450,32 @@ class TeamDisqualifySchema(Schema):
     disqualified = fields.Boolean(required=True)
 
 
+class RaceResultsQuerySchema(Schema):
+    category = fields.Integer(load_default=None, allow_none=True, validate=validate.Range(min=1))
+    top = fields.Integer(load_default=None, allow_none=True, validate=validate.Range(min=1))
+    as_of = fields.DateTime(load_default=None, allow_none=True)
+
+
+class StatusDeltaQuerySchema(Schema):
+    class Meta:
+        unknown = EXCLUDE
+
+    since = fields.DateTime(load_default=None, allow_none=True)
+
+
+class RaceResultsTimelineQuerySchema(Schema):
+    buckets = fields.Integer(load_default=10, validate=validate.Range(min=1, max=100))
+    category = fields.Integer(load_default=None, allow_none=True, validate=validate.Range(min=1))
+    start = fields.DateTime(data_key='from', load_default=None, allow_none=True)
+    end = fields.DateTime(data_key='to', load_default=None, allow_none=True)
+
+    @validates_schema
+    def validate_range(self, data, **kwargs):
+        start, end = to_naive_utc(data.get('start')), to_naive_utc(data.get('end'))
+        if start and end and start >= end:
+            raise ValidationError({'to': ['Must be later than from.']})
+
+
 class RegistrationEmailLogQuerySchema(Schema):
     status = fields.String(
         load_default=None,
@@ -0,0 +1,96 @@
+"""
+Cached, serialized checkpoint and task lists of a race.
+
+The race API's checkpoint and task lists are fetched on every app open but
+rarely change during a race. ``catalog_response`` keeps their JSON bytes in a
+small per-worker LRU (``CatalogCache``) keyed by ``(race_id, catalog,
+language, Race.catalog_version)`` and serves them with an ETag built from the
+same key, so a matching ``If-None-Match`` is answered with 304 before anything
+is loaded or serialized.
+
+Handlers that create, update or delete checkpoints, tasks or their
+translations call ``bump_catalog_version`` in the same transaction. The new
+version is seen by every worker on its next request, so stale lists are never
+served; their entries simply age out of the LRU.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+from app.models import Race
+from app.utils import not_modified_response, set_etag
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CHECKPOINTS = 'checkpoints'
+CATALOG_TASKS = 'tasks'
+
+
+class CatalogCache:
+    """Bounded LRU of serialized catalogs; thread-safe."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, cache_key):
+        with self._lock:
+            body = self._entries.get(cache_key)
+            if body is not None:
+                self._entries.move_to_end(cache_key)
+            return body
+
+    def put(self, cache_key, body):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[cache_key] = body
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def bump_catalog_version(race_id):
+    """Increment the race's catalog version so cached checkpoint/task lists (and ETags) are invalidated."""
+    Race.query.filter_by(id=race_id).update(
+        {Race.catalog_version: Race.catalog_version + 1},
+        synchronize_session=False,
+    )
+
+
+def catalog_etag(race, catalog, language):
+    """ETag of the race's ``catalog`` list in ``language`` at its current catalog version."""
+    return f"race-{race.id}-{catalog}-{language or 'default'}-{race.catalog_version}"
+
+
+def catalog_response(race, catalog, language, build):
+    """
+    Response with the race's ``catalog`` list in ``language``, served from the cache.
+
+    ``build()`` returns the JSON-serializable list; it only runs when the
+    list is not cached for the race's current catalog version.
+    """
+    etag = catalog_etag(race, catalog, language)
+    not_modified = not_modified_response(etag)
+    if not_modified is not None:
+        return not_modified
+
+    cache = current_app.extensions['catalog_cache']
+    cache_key = (race.id, catalog, language, race.catalog_version)
+    body = cache.get(cache_key)
+    if body is None:
+        body = current_app.json.response(build()).get_data()
+        cache.put(cache_key, body)
+        logger.debug("Cached %s of race %s in language '%s' (%s bytes)", catalog, race.id, language, len(body))
+    return set_etag(current_app.response_class(body, mimetype='application/json'), etag)
+
+
+def init_catalog_cache(app):
+    """Attach the per-worker catalog cache to the application."""
+    app.extensions['catalog_cache'] = CatalogCache(app.config['CATALOG_CACHE_MAX_ENTRIES'])
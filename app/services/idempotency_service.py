@@ -0,0 +1,225 @@
+"""
+Idempotency-Key support for retried POSTs.
+
+Mobile clients retry log POSTs on flaky networks. A request carrying an
+``Idempotency-Key`` header first claims ``(user, method + path, key)`` in the
+``idempotency_key`` table, which is shared by all workers; the handler only
+runs for the request that won the claim. Its 2xx JSON response is stored and
+replayed to every retry until the key expires, so a retry does not save the
+image or insert the log again. Failed responses release the claim so the
+client can retry for real. An in-progress claim only holds the key for
+``IDEMPOTENCY_CLAIM_LEASE_SECONDS``; when its worker dies mid-request, a
+retry after the lease takes the key over instead of getting 409 until the
+key would have expired.
+
+Completed responses are also kept in a small per-worker LRU with TTL eviction
+(``ReplayCache``), so most retries are answered without a database read.
+Expired rows are removed with ``flask idempotency purge``.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import Response, current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+class ReplayCache:
+    """Bounded LRU of completed responses with per-entry expiry; thread-safe."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, cache_key, now=None):
+        now = now or datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            if entry['expires_at'] <= now:
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry
+
+    def put(self, cache_key, entry):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[cache_key] = entry
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _request_fingerprint():
+    """Hash of the form/JSON fields and uploaded file contents of the current request."""
+    digest = hashlib.sha256()
+    if request.mimetype == 'multipart/form-data':
+        fields = request.form.to_dict(flat=False)
+    else:
+        fields = request.get_json(silent=True)
+    digest.update(json.dumps(fields, sort_keys=True, default=str).encode('utf-8'))
+    for name in sorted(request.files):
+        for upload in request.files.getlist(name):
+            digest.update(f'\0{name}\0{upload.filename}\0'.encode('utf-8'))
+            stream = upload.stream
+            for chunk in iter(lambda: stream.read(64 * 1024), b''):
+                digest.update(chunk)
+            stream.seek(0)
+    return digest.hexdigest()
+
+
+def _entry(row):
+    return {
+        'fingerprint': row.fingerprint,
+        'status_code': row.status_code,
+        'body': row.response_body,
+        'expires_at': row.expires_at,
+    }
+
+
+def _replay(entry, fingerprint):
+    if entry['fingerprint'] != fingerprint:
+        return jsonify({"message": "Idempotency-Key was already used with a different request."}), 422
+    response = Response(entry['body'], status=entry['status_code'], mimetype='application/json')
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _claim(user_id, scope, key, fingerprint):
+    """
+    Insert the in-progress row for the key and commit it.
+
+    Returns ``(claim_id, None)`` when this request owns the key, otherwise
+    ``(None, existing_row)``. The claim expires after the lease until the
+    response is stored; an expired row (a finished key past its TTL or an
+    abandoned claim) is replaced once.
+    """
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=current_app.config['IDEMPOTENCY_CLAIM_LEASE_SECONDS'])
+    for _attempt in range(2):
+        row = IdempotencyKey(user_id=user_id, scope=scope, key=key, fingerprint=fingerprint, expires_at=expires_at)
+        db.session.add(row)
+        try:
+            db.session.flush()
+            claim_id = row.id
+            db.session.commit()
+            return claim_id, None
+        except IntegrityError:
+            db.session.rollback()
+        existing = IdempotencyKey.query.filter_by(user_id=user_id, scope=scope, key=key).first()
+        if existing is None:
+            continue
+        if existing.expires_at > now:
+            return None, existing
+        db.session.delete(existing)
+        db.session.commit()
+    return None, None
+
+
+def _release(row_id):
+    db.session.rollback()
+    IdempotencyKey.query.filter_by(id=row_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def idempotent_request(view):
+    """
+    Replay the stored response for requests repeating an ``Idempotency-Key``.
+
+    Apply below ``@jwt_required()``; keys are scoped to the user and the
+    request method and path. Requests without the header are not affected.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"message": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters."}), 400
+
+        user_id = int(get_jwt_identity())
+        scope = f"{request.method} {request.path}"
+        fingerprint = _request_fingerprint()
+        cache = current_app.extensions['idempotency_cache']
+        cache_key = (user_id, scope, key)
+
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return _replay(cached, fingerprint)
+
+        row_id, existing = _claim(user_id, scope, key, fingerprint)
+        if row_id is None:
+            if existing is not None and existing.status_code is not None:
+                entry = _entry(existing)
+                cache.put(cache_key, entry)
+                logger.info("Replaying idempotent response for user %s, %s", user_id, scope)
+                return _replay(entry, fingerprint)
+            if existing is not None and existing.fingerprint != fingerprint:
+                return _replay(_entry(existing), fingerprint)
+            response = jsonify({"message": "A request with this Idempotency-Key is still in progress."})
+            response.status_code = 409
+            response.headers['Retry-After'] = '1'
+            return response
+
+        expires_at = datetime.utcnow() + timedelta(seconds=current_app.config['IDEMPOTENCY_KEY_TTL_SECONDS'])
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _release(row_id)
+            raise
+
+        if not (200 <= response.status_code < 300 and response.is_json):
+            _release(row_id)
+            return response
+
+        body = response.get_data(as_text=True)
+        IdempotencyKey.query.filter_by(id=row_id).update(
+            {
+                IdempotencyKey.status_code: response.status_code,
+                IdempotencyKey.response_body: body,
+                IdempotencyKey.expires_at: expires_at,
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+        cache.put(cache_key, {
+            'fingerprint': fingerprint,
+            'status_code': response.status_code,
+            'body': body,
+            'expires_at': expires_at,
+        })
+        return response
+
+    return wrapper
+
+
+def purge_expired_idempotency_keys(now=None):
+    """Delete expired rows; returns the number removed. Caller commits."""
+    now = now or datetime.utcnow()
+    return IdempotencyKey.query.filter(IdempotencyKey.expires_at <= now).delete(synchronize_session=False)
+
+
+def init_idempotency_cache(app):
+    """Attach the per-worker replay cache to the application."""
+    app.extensions['idempotency_cache'] = ReplayCache(app.config['IDEMPOTENCY_MEMORY_MAX_ENTRIES'])
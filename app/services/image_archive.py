@@ -0,0 +1,158 @@
+"""
+Per-race export and removal of checkpoint and task photos.
+
+A race's photos are the images referenced by its ``CheckpointLog`` and
+``TaskLog`` rows; content-addressed blobs shared with other races stay
+stored while any reference remains.
+
+``iter_race_archive`` streams them as a ZIP (``checkpoints/<id>/team-<id>.jpg``,
+``tasks/<id>/team-<id>.jpg``) chunk by chunk: entries are written
+uncompressed with data descriptors, so neither the archive nor a photo is
+held in memory and the output needs no seeking. ``purge_race_images``
+detaches the photos of a finished race from its logs with set-based updates
+per chunk of images, keeping the logs and their points, and deletes the
+blobs left without references right away instead of waiting for the sweep.
+"""
+import logging
+import os
+import zipfile
+
+from flask import current_app
+from sqlalchemy import case, func, literal, select, union_all
+
+from app import db
+from app.models import CheckpointLog, Image, ImageBlob, TaskLog
+from app.services.image_storage import get_image_storage
+from app.services.image_store import CHUNK_SIZE, delete_unreferenced_blobs, remove_image_files
+from app.services.status_delta import bump_status_version
+
+logger = logging.getLogger(__name__)
+
+
+class _ZipStream:
+    """Write-only file object collecting what ``zipfile`` writes until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def race_photos(race_id):
+    """``(archive name, stored filename, logged at)`` of every photo of the race."""
+    logs = union_all(
+        select(
+            literal('checkpoints').label('kind'),
+            CheckpointLog.checkpoint_id.label('item_id'),
+            CheckpointLog.team_id,
+            CheckpointLog.image_id,
+            CheckpointLog.created_at,
+        ).where(CheckpointLog.race_id == race_id, CheckpointLog.image_id.isnot(None)),
+        select(
+            literal('tasks').label('kind'),
+            TaskLog.task_id.label('item_id'),
+            TaskLog.team_id,
+            TaskLog.image_id,
+            TaskLog.created_at,
+        ).where(TaskLog.race_id == race_id, TaskLog.image_id.isnot(None)),
+    ).subquery()
+    rows = (
+        db.session.query(logs.c.kind, logs.c.item_id, logs.c.team_id, Image.filename, logs.c.created_at)
+        .join(Image, Image.id == logs.c.image_id)
+        .order_by(logs.c.kind, logs.c.item_id, logs.c.team_id)
+    )
+    for kind, item_id, team_id, filename, created_at in rows:
+        extension = os.path.splitext(filename)[1]
+        yield f"{kind}/{item_id}/team-{team_id}{extension}", filename, created_at
+
+
+def iter_race_archive(race_id):
+    """Yield a ZIP of the race's photos in chunks; photos missing from storage are skipped."""
+    photos = list(race_photos(race_id))
+    storage = get_image_storage()
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for name, filename, created_at in photos:
+            try:
+                source = storage.open(filename)
+            except OSError as err:
+                logger.warning("Skipping photo %s of race %s in archive: %s", filename, race_id, err)
+                continue
+            entry = zipfile.ZipInfo(name, date_time=(created_at.timetuple()[:6] if created_at else (1980, 1, 1, 0, 0, 0)))
+            with source, archive.open(entry, 'w', force_zip64=True) as out:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    out.write(chunk)
+                    yield stream.drain()
+    yield stream.drain()
+    logger.info("Streamed archive of %s photos of race %s", len(photos), race_id)
+
+
+def _race_image_ids(race_id):
+    ids = union_all(
+        select(CheckpointLog.image_id).where(CheckpointLog.race_id == race_id, CheckpointLog.image_id.isnot(None)),
+        select(TaskLog.image_id).where(TaskLog.race_id == race_id, TaskLog.image_id.isnot(None)),
+    )
+    return sorted({image_id for (image_id,) in db.session.execute(ids)})
+
+
+def purge_race_images(race_id, batch_size=500):
+    """
+    Remove every photo of a race, keeping its logs. Commits.
+
+    Returns ``(images_removed, blobs_removed, bytes_freed)``; blobs still
+    referenced by other races are kept.
+    """
+    image_ids = _race_image_ids(race_id)
+    blob_ids = set()
+    legacy_paths = []
+    folder = current_app.config['IMAGE_UPLOAD_FOLDER']
+    for start in range(0, len(image_ids), batch_size):
+        chunk = image_ids[start:start + batch_size]
+        for filename, blob_id in db.session.query(Image.filename, Image.blob_id).filter(Image.id.in_(chunk)):
+            if blob_id is None:
+                legacy_paths.append(os.path.join(folder, filename))
+            else:
+                blob_ids.add(blob_id)
+
+        released = (
+            select(func.count(Image.id))
+            .where(Image.blob_id == ImageBlob.id, Image.id.in_(chunk))
+            .scalar_subquery()
+        )
+        ImageBlob.query.filter(ImageBlob.id.in_(select(Image.blob_id).where(Image.id.in_(chunk)))).update(
+            {
+                ImageBlob.ref_count: ImageBlob.ref_count - released,
+                ImageBlob.released_at: case(
+                    (ImageBlob.ref_count - released <= 0, func.now()),
+                    else_=ImageBlob.released_at,
+                ),
+            },
+            synchronize_session=False,
+        )
+        # updated_at moves delta polls off the removed photos
+        for model in (CheckpointLog, TaskLog):
+            model.query.filter(model.image_id.in_(chunk)).update(
+                {model.image_id: None, model.updated_at: func.now()}, synchronize_session=False
+            )
+        Image.query.filter(Image.id.in_(chunk)).delete(synchronize_session=False)
+    if image_ids:
+        bump_status_version([race_id])
+    db.session.commit()
+
+    removed_blobs, freed = delete_unreferenced_blobs(sorted(blob_ids))
+    remove_image_files(legacy_paths)
+    logger.info(
+        "Purged %s photos of race %s: %s blobs (%s bytes) deleted, %s pre-blob files",
+        len(image_ids), race_id, removed_blobs, freed, len(legacy_paths),
+    )
+    return len(image_ids), removed_blobs, freed
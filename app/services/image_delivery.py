@@ -0,0 +1,102 @@
+"""
+HTTP delivery of stored photos.
+
+Stored photo names are never reused for different content (blobs are named
+by their SHA-256, derivatives by their blob), so responses are cacheable as
+``immutable`` for ``IMAGE_CACHE_MAX_AGE_SECONDS``. Blob originals use their
+digest and size as a strong ETag; other files use their modification time
+and size.
+
+``IMAGE_SENDFILE_MODE`` hands the file body to the front proxy instead of
+streaming it from a Flask worker:
+
+* ``x-sendfile``: ``X-Sendfile: <absolute path>`` (Apache ``mod_xsendfile``, lighttpd).
+* ``x-accel``: ``X-Accel-Redirect: <IMAGE_ACCEL_REDIRECT_PREFIX>/<relative path>``
+  for an nginx ``internal`` location aliased to ``IMAGE_UPLOAD_FOLDER``.
+
+In both modes the file is only ``stat``-ed, never read. Without a mode,
+Werkzeug streams the file and answers ``Range`` and conditional requests.
+
+With a remote storage backend the response redirects to a presigned
+download URL, cached for half of the URL's lifetime.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from flask import abort, current_app, redirect, request
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+from app.services.image_derivatives import DERIVED_FOLDER
+from app.services.image_storage import STORAGE_BACKEND_LOCAL, get_image_storage
+
+SENDFILE_MODE_X_SENDFILE = 'x-sendfile'
+SENDFILE_MODE_X_ACCEL = 'x-accel'
+
+_SHA256_HEX = re.compile(r'[0-9a-f]{64}')
+
+
+def image_etag(relative_path, stat_result):
+    """Strong ETag of a stored photo file."""
+    stem = os.path.splitext(os.path.basename(relative_path))[0]
+    if not relative_path.startswith(f"{DERIVED_FOLDER}/") and _SHA256_HEX.fullmatch(stem):
+        # the size tells the uploaded bytes from their re-encoded replacement
+        return f"{stem}-{stat_result.st_size:x}"
+    return f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+
+
+def _accel_redirect_response(relative_path, etag, max_age):
+    prefix = current_app.config['IMAGE_ACCEL_REDIRECT_PREFIX'].rstrip('/')
+    mimetype = mimetypes.guess_type(relative_path)[0] or 'application/octet-stream'
+    response = current_app.response_class(mimetype=mimetype)
+    response.headers['X-Accel-Redirect'] = f"{prefix}/{quote(relative_path)}"
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    # answers If-None-Match with 304; nginx serves ranges of the redirected file
+    return response.make_conditional(request.environ)
+
+
+def _redirect_response(storage, relative_path):
+    expires_in = current_app.config['IMAGE_UPLOAD_URL_EXPIRES_SECONDS']
+    response = redirect(storage.download_url(relative_path, expires_in), code=302)
+    response.cache_control.public = True
+    response.cache_control.max_age = min(expires_in // 2, current_app.config['IMAGE_CACHE_MAX_AGE_SECONDS'])
+    return response
+
+
+def send_image(relative_path):
+    """Response for a stored photo; 404 when a local file is missing."""
+    storage = get_image_storage()
+    if storage.name != STORAGE_BACKEND_LOCAL:
+        if safe_join('/', relative_path) is None:
+            abort(404)
+        return _redirect_response(storage, relative_path)
+
+    path = safe_join(current_app.config['IMAGE_UPLOAD_FOLDER'], relative_path)
+    try:
+        stat_result = os.stat(path) if path else None
+    except OSError:
+        stat_result = None
+    if stat_result is None or not os.path.isfile(path):
+        abort(404)
+
+    etag = image_etag(relative_path, stat_result)
+    max_age = current_app.config['IMAGE_CACHE_MAX_AGE_SECONDS']
+    mode = current_app.config['IMAGE_SENDFILE_MODE']
+    if mode == SENDFILE_MODE_X_ACCEL:
+        response = _accel_redirect_response(relative_path, etag, max_age)
+    else:
+        response = send_file(
+            path,
+            request.environ,
+            etag=etag,
+            last_modified=stat_result.st_mtime,
+            max_age=max_age,
+            use_x_sendfile=mode == SENDFILE_MODE_X_SENDFILE,
+            response_class=current_app.response_class,
+        )
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,143 @@
+"""
+Thumbnail and web-size derivatives of uploaded photos.
+
+Each stored photo gets downscaled JPEG and WebP renditions per size in
+``DERIVATIVE_SIZES``, stored under ``.derived/<size>/`` next to the
+original's key (``.derived/thumb/ab/cd/<sha256>.webp``) in the photo
+storage backend. They are rendered by the image ingest after upload;
+``serve_image`` renders a missing one on first request and
+``flask images derivatives`` backfills photos uploaded before derivatives
+existed.
+"""
+import logging
+import mimetypes
+import os
+
+from flask import current_app
+from PIL import Image as PILImage
+from PIL import ImageOps, UnidentifiedImageError, features
+
+from app.services.image_storage import get_image_storage, incoming_temp_path
+
+logger = logging.getLogger(__name__)
+
+DERIVED_FOLDER = '.derived'
+
+# size name -> longest edge in pixels
+DERIVATIVE_SIZES = {'thumb': 320, 'medium': 1280}
+
+# format name -> (file extension, Pillow save options); the quality is
+# overridden by IMAGE_JPEG_QUALITY / IMAGE_WEBP_QUALITY
+DERIVATIVE_FORMATS = {
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+}
+
+
+def available_formats():
+    """Derivative formats this Pillow build can write."""
+    return [fmt for fmt in DERIVATIVE_FORMATS if fmt != 'webp' or features.check('webp')]
+
+
+def negotiate_format(accept_mimetypes):
+    """Pick WebP when the client accepts it (and Pillow supports it), otherwise JPEG."""
+    if 'webp' in available_formats() and accept_mimetypes.quality('image/webp') > 0:
+        return 'webp'
+    return 'jpeg'
+
+
+def derivative_relative_path(filename, size, fmt):
+    """Storage key of a derivative of the photo stored at ``filename``."""
+    stem = os.path.splitext(filename)[0]
+    return f"{DERIVED_FOLDER}/{size}/{stem}.{DERIVATIVE_FORMATS[fmt][0]}"
+
+
+def derivative_keys(filename):
+    """Storage keys of every possible derivative of ``filename``."""
+    return [
+        derivative_relative_path(filename, size, fmt)
+        for size in DERIVATIVE_SIZES
+        for fmt in DERIVATIVE_FORMATS
+    ]
+
+
+def _prepare(source):
+    """Upright RGB copy of an opened photo, ready for downscaling."""
+    prepared = ImageOps.exif_transpose(source)
+    if prepared.mode not in ('RGB', 'L'):
+        prepared = prepared.convert('RGB')
+    return prepared if prepared is not source else source.copy()
+
+
+def _save(rendition, key, fmt):
+    """Render into a local temp file and move it into storage in one step."""
+    extension, options = DERIVATIVE_FORMATS[fmt]
+    options = dict(options, quality=current_app.config[f"IMAGE_{fmt.upper()}_QUALITY"])
+    temp_path = incoming_temp_path(f".{extension}")
+    try:
+        rendition.save(temp_path, fmt.upper(), **options)
+        get_image_storage().put_file(key, temp_path, content_type=mimetypes.guess_type(key)[0])
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _open_prepared(filename, source=None):
+    if source is not None:
+        source.seek(0)
+        with PILImage.open(source) as picture:
+            return _prepare(picture)
+    with get_image_storage().open(filename) as stored, PILImage.open(stored) as picture:
+        return _prepare(picture)
+
+
+def ensure_derivative(filename, size, fmt):
+    """
+    Return the storage key of a derivative, rendering it if missing.
+
+    Returns None when the original is missing or cannot be decoded.
+    """
+    storage = get_image_storage()
+    relative_path = derivative_relative_path(filename, size, fmt)
+    try:
+        if storage.exists(relative_path):
+            return relative_path
+        if not storage.exists(filename):
+            return None
+        rendition = _open_prepared(filename)
+        max_edge = DERIVATIVE_SIZES[size]
+        rendition.thumbnail((max_edge, max_edge), PILImage.Resampling.LANCZOS)
+        _save(rendition, relative_path, fmt)
+    except (OSError, UnidentifiedImageError, PILImage.DecompressionBombError) as err:
+        logger.error("Could not render %s %s of %s: %s", size, fmt, filename, err)
+        return None
+    return relative_path
+
+
+def generate_derivatives(filename, overwrite=False, source=None):
+    """
+    Render every missing size and format of a stored photo from a single decode.
+
+    ``source`` is an already opened binary file of the original, which saves
+    reading it from storage again. Returns the number of files written.
+    Raises OSError or ``UnidentifiedImageError`` when the original cannot be read.
+    """
+    storage = get_image_storage()
+    missing = {}
+    for size in DERIVATIVE_SIZES:
+        for fmt in available_formats():
+            key = derivative_relative_path(filename, size, fmt)
+            if overwrite or not storage.exists(key):
+                missing.setdefault(size, []).append((fmt, key))
+    if not missing:
+        return 0
+
+    rendition = _open_prepared(filename, source)
+    written = 0
+    # largest first: each smaller size is downscaled from the previous rendition
+    for size, max_edge in sorted(DERIVATIVE_SIZES.items(), key=lambda item: -item[1]):
+        rendition.thumbnail((max_edge, max_edge), PILImage.Resampling.LANCZOS)
+        for fmt, key in missing.get(size, []):
+            _save(rendition, key, fmt)
+            written += 1
+    return written
@@ -0,0 +1,161 @@
+"""
+Garbage collection of photo files and ``Image`` rows that lost their counterpart.
+
+``sweep_unreferenced_blobs`` only deletes blobs whose reference count
+dropped to zero. A failed cleanup, a manual database edit or a cascade
+delete that bypasses ``release_image`` can also leave files in
+``IMAGE_UPLOAD_FOLDER`` that no row names, and ``Image`` rows whose file is
+gone. ``ImageGarbageCollector`` finds both without loading either side
+into memory:
+
+* files: the folder is walked with ``os.scandir`` and each batch of names
+  is looked up in ``Image.filename`` and ``ImageBlob.path``. A derivative is
+  orphaned when no referenced photo has its stem, a staging file when it
+  outlived the grace period.
+* rows: ``Image`` rows are read in keyset-paginated chunks by id and their
+  file is ``stat``-ed.
+
+Files modified within the grace period are never reported, which covers
+uploads whose row is not committed yet. Only the local storage backend can
+be scanned. ``flask images gc`` drives it.
+"""
+import logging
+import os
+import time
+
+from werkzeug.security import safe_join
+
+from app import db
+from app.models import CheckpointLog, Image, ImageBlob, TaskLog
+from app.services.image_derivatives import DERIVATIVE_SIZES, DERIVED_FOLDER
+from app.services.image_storage import INCOMING_FOLDER
+from app.services.image_store import release_image
+from app.services.status_delta import bump_status_version
+from app.utils import ALLOWED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+
+def walk_image_folder(folder):
+    """Yield ``(relative_path, DirEntry)`` of every file below ``folder``, one directory open at a time."""
+    pending = ['']
+    while pending:
+        relative_dir = pending.pop()
+        try:
+            with os.scandir(os.path.join(folder, relative_dir)) as entries:
+                for entry in entries:
+                    relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(relative_path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield relative_path, entry
+        except FileNotFoundError:
+            # removed while walking
+            continue
+
+
+def _derivative_originals(relative_path):
+    """Keys the original of a derivative can have, or None when the path is not a derivative."""
+    parts = relative_path.split('/', 2)
+    if len(parts) != 3 or parts[0] != DERIVED_FOLDER or parts[1] not in DERIVATIVE_SIZES:
+        return None
+    stem = os.path.splitext(parts[2])[0]
+    return [f"{stem}.{extension}" for extension in sorted(ALLOWED_EXTENSIONS)]
+
+
+def _referenced(keys):
+    """The subset of ``keys`` named by an ``Image`` row or a blob."""
+    if not keys:
+        return set()
+    referenced = {row.filename for row in db.session.query(Image.filename).filter(Image.filename.in_(keys))}
+    referenced.update(row.path for row in db.session.query(ImageBlob.path).filter(ImageBlob.path.in_(keys)))
+    return referenced
+
+
+class ImageGarbageCollector:
+    """Finds and removes orphaned photo files and ``Image`` rows without a file."""
+
+    def __init__(self, folder, grace_seconds, batch_size=500, now=None):
+        self.folder = folder
+        self.batch_size = batch_size
+        self.cutoff = (now if now is not None else time.time()) - grace_seconds
+        self.files_scanned = 0
+        self.rows_scanned = 0
+
+    def orphan_files(self):
+        """Yield ``(relative_path, size_bytes)`` of files no row accounts for."""
+        batch = []
+        for relative_path, entry in walk_image_folder(self.folder):
+            self.files_scanned += 1
+            try:
+                stat_result = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if stat_result.st_mtime > self.cutoff:
+                continue
+            batch.append((relative_path, stat_result.st_size))
+            if len(batch) >= self.batch_size:
+                yield from self._orphans_in(batch)
+                batch = []
+        if batch:
+            yield from self._orphans_in(batch)
+
+    def _orphans_in(self, batch):
+        candidates = {}
+        for relative_path, _size in batch:
+            if relative_path.startswith(f"{INCOMING_FOLDER}/"):
+                candidates[relative_path] = []
+            else:
+                candidates[relative_path] = _derivative_originals(relative_path) or [relative_path]
+        referenced = _referenced([key for keys in candidates.values() for key in keys])
+        for relative_path, size in batch:
+            if not referenced.intersection(candidates[relative_path]):
+                yield relative_path, size
+
+    def delete_file(self, relative_path):
+        """Remove an orphaned file; False when it is already gone."""
+        try:
+            os.remove(os.path.join(self.folder, relative_path))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def missing_images(self):
+        """Yield ``(image_id, filename)`` of ``Image`` rows whose file does not exist."""
+        last_id = 0
+        while True:
+            chunk = (
+                db.session.query(Image.id, Image.filename)
+                .filter(Image.id > last_id)
+                .order_by(Image.id)
+                .limit(self.batch_size)
+                .all()
+            )
+            if not chunk:
+                return
+            last_id = chunk[-1].id
+            for image_id, filename in chunk:
+                self.rows_scanned += 1
+                path = safe_join(self.folder, filename)
+                if path is None or not os.path.isfile(path):
+                    yield image_id, filename
+
+    def release_images(self, image_ids):
+        """
+        Detach the logs from images whose file is gone and release the images. Commits.
+
+        The detached logs are marked as updated and their races' status version
+        is bumped, so team status lists, delta polls and bootstraps drop the image.
+        """
+        if not image_ids:
+            return
+        race_ids = set()
+        for model in (CheckpointLog, TaskLog):
+            logs = model.query.filter(model.image_id.in_(image_ids))
+            race_ids.update(race_id for (race_id,) in logs.with_entities(model.race_id).distinct())
+            logs.update({model.image_id: None, model.updated_at: db.func.now()}, synchronize_session=False)
+        bump_status_version(race_ids)
+        for image in Image.query.filter(Image.id.in_(image_ids)):
+            release_image(image)
+        db.session.commit()
+        logger.info("Released %s images without a stored file", len(image_ids))
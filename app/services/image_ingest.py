@@ -0,0 +1,208 @@
+"""
+Background processing of uploaded checkpoint and task photos.
+
+Log handlers validate the upload and read its GPS position from the header
+(``inspect_uploaded_image``), write the raw bytes and commit the log with an
+``Image`` row in ``pending`` state. ``submit_image_ingest`` then hands the
+image to a bounded per-worker thread pool which fills ``CheckpointLog.image_*``
+for logs still missing the position, stores the perceptual hash used for
+near-duplicate detection, applies the re-encoding policy of
+``app/services/image_optimize.py`` to new JPEG blobs, renders the thumbnail
+and medium derivatives and marks the image ``ready`` (or ``failed``). Photos
+uploaded directly to storage are first checked against the SHA-256 in their
+key.
+Clients see the state as ``image_status`` on the log response and the visit
+listings.
+
+With ``IMAGE_INGEST_WORKERS = 0`` images are processed inline after the log
+commit. When the queue is full the request processes its own image inline,
+so a burst slows the uploading requests instead of growing memory. Images
+left ``pending`` by a restarted worker are picked up by
+``flask images ingest-pending``.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from PIL import UnidentifiedImageError
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from app.models import Checkpoint, CheckpointLog, Image, ImageBlob
+from app.services.image_derivatives import generate_derivatives
+from app.services.image_optimize import ingest_policy, optimize_blob
+from app.services.image_similarity import image_phash
+from app.services.image_storage import get_image_storage
+from app.services.image_store import CHUNK_SIZE, blob_key_digest
+from app.utils import calculate_distance, extract_image_coordinates
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STATUS_PENDING = 'pending'
+IMAGE_STATUS_READY = 'ready'
+IMAGE_STATUS_FAILED = 'failed'
+
+
+def process_image(image_id):
+    """
+    Finish a pending image: fill the GPS position of logs that lack it,
+    shrink a new blob under the ingest policy and render its derivatives.
+
+    Returns the image's resulting status, or None when the image no longer
+    exists (e.g. the log was removed before processing). Commits.
+    """
+    image = db.session.get(Image, image_id)
+    if image is None:
+        return None
+    if image.status != IMAGE_STATUS_PENDING:
+        return image.status
+
+    try:
+        source = get_image_storage().open(image.filename)
+    except FileNotFoundError:
+        logger.error("Image file %s for image %s is missing", image.filename, image_id)
+        image.status = IMAGE_STATUS_FAILED
+        db.session.commit()
+        return image.status
+    except OSError as err:
+        # storage unavailable: leave it pending for a retry
+        logger.error("Could not read image %s from storage: %s", image_id, err)
+        return image.status
+
+    original_size = None
+    if image.blob_id is not None:
+        original_size = db.session.query(ImageBlob.original_size_bytes).filter_by(id=image.blob_id).scalar()
+
+    with source:
+        # a re-encoded blob no longer hashes to its key
+        if original_size is None and not _content_matches_key(source, image.filename):
+            logger.error("Content of image %s does not match its key %s", image_id, image.filename)
+            image.status = IMAGE_STATUS_FAILED
+            db.session.commit()
+            return image.status
+
+        latitude, longitude = extract_image_coordinates(source)
+        if latitude is not None and longitude is not None:
+            logs = (
+                db.session.query(CheckpointLog, Checkpoint)
+                .join(Checkpoint, CheckpointLog.checkpoint_id == Checkpoint.id)
+                .filter(CheckpointLog.image_id == image_id, CheckpointLog.image_latitude.is_(None))
+            )
+            for log, checkpoint in logs:
+                log.image_latitude = latitude
+                log.image_longitude = longitude
+                log.image_distance_km = calculate_distance(
+                    checkpoint.latitude, checkpoint.longitude,
+                    latitude, longitude
+                )
+                logger.info("Image %s taken %.3f km from checkpoint %s", image_id, log.image_distance_km, checkpoint.id)
+        else:
+            logger.info("No GPS coordinates found in image EXIF metadata for %s", image.filename)
+
+        try:
+            if image.phash is None:
+                image.phash = image_phash(image, source)
+            policy = ingest_policy(current_app.config)
+            saved = 0
+            if policy is not None and image.blob_id is not None and original_size is None:
+                saved = optimize_blob(image.blob_id, image.filename, policy, source=source)
+            # render from the re-encoded object when it replaced the upload
+            generate_derivatives(image.filename, source=None if saved else source)
+        except (OSError, UnidentifiedImageError) as err:
+            logger.error("Could not process image %s: %s", image_id, err)
+            image.status = IMAGE_STATUS_FAILED
+            db.session.commit()
+            return image.status
+
+    image.status = IMAGE_STATUS_READY
+    db.session.commit()
+    return image.status
+
+
+def _content_matches_key(source, filename):
+    """Whether a blob's content hashes to the SHA-256 in its key (pre-blob files always match)."""
+    expected = blob_key_digest(filename)
+    if expected is None:
+        return True
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest() == expected
+
+
+def _process_image_safely(image_id):
+    """
+    Run ``process_image`` and mark the image failed on any error.
+
+    The log is already committed, so an error here must neither fail the
+    request (inline ingest) nor leave the image ``pending`` forever (pool).
+    """
+    try:
+        return process_image(image_id)
+    except Exception:
+        db.session.rollback()
+        logger.exception("Image ingest failed for image %s", image_id)
+    try:
+        Image.query.filter_by(id=image_id).update({Image.status: IMAGE_STATUS_FAILED}, synchronize_session=False)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        logger.exception("Could not mark image %s as failed", image_id)
+        return IMAGE_STATUS_PENDING
+    return IMAGE_STATUS_FAILED
+
+
+class ImageIngestPool:
+    """Per-worker thread pool with a bounded number of queued images."""
+
+    def __init__(self, app):
+        self.app = app
+        self.max_workers = app.config['IMAGE_INGEST_WORKERS']
+        self.max_queue = app.config['IMAGE_INGEST_MAX_QUEUE']
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue) if self.max_workers else None
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='image-ingest',
+                )
+            return self._executor
+
+    def submit(self, image_id):
+        """Queue an image; returns ``pending``, or the final status when processed inline."""
+        if self._slots is None:
+            return _process_image_safely(image_id)
+        if not self._slots.acquire(blocking=False):
+            logger.warning("Image ingest queue full, processing image %s inline", image_id)
+            return _process_image_safely(image_id)
+        try:
+            self._get_executor().submit(self._run, image_id)
+        except RuntimeError:
+            # executor shut down (interpreter exit)
+            self._slots.release()
+            return _process_image_safely(image_id)
+        return IMAGE_STATUS_PENDING
+
+    def _run(self, image_id):
+        try:
+            with self.app.app_context():
+                _process_image_safely(image_id)
+        finally:
+            self._slots.release()
+
+
+def submit_image_ingest(image_id):
+    """Hand a committed pending image to the ingest pool; returns its status."""
+    return current_app.extensions['image_ingest'].submit(image_id)
+
+
+def init_image_ingest(app):
+    """Attach the image ingest pool to the application."""
+    app.extensions['image_ingest'] = ImageIngestPool(app)
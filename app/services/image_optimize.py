@@ -0,0 +1,249 @@
+"""
+Downscaling and recompression of stored photo originals.
+
+Phones upload 12 MP JPEGs of several megabytes; the race only needs them
+at screen resolution. With ``IMAGE_OPTIMIZE_ON_INGEST`` the image ingest
+re-encodes each new JPEG blob once: the long edge is limited to
+``IMAGE_MAX_LONG_EDGE``, the EXIF orientation is applied, metadata is
+dropped except the GPS block (kept with ``IMAGE_PRESERVE_GPS_EXIF``) and
+the photo is saved at ``IMAGE_JPEG_QUALITY``. The result replaces the
+stored object only when it is smaller. PNG and GIF uploads are kept as-is.
+
+The blob keeps its key, which names the SHA-256 of the uploaded bytes, so
+later uploads of the same photo still deduplicate against it.
+``ImageBlob.original_size_bytes`` records the uploaded size and marks the
+blob as processed; ``flask images reencode`` applies the policy to blobs
+stored before it, in a process pool, and ``flask images report`` sums the
+bytes saved per race.
+"""
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple
+
+from PIL import ExifTags, ImageOps, UnidentifiedImageError
+from PIL import Image as PILImage
+from sqlalchemy import func, union
+
+from app import db
+from app.models import CheckpointLog, Image, ImageBlob, TaskLog
+from app.services.image_storage import get_image_storage, incoming_temp_path
+
+logger = logging.getLogger(__name__)
+
+
+class IngestPolicy(NamedTuple):
+    max_long_edge: int
+    jpeg_quality: int
+    preserve_gps: bool
+
+
+def ingest_policy(config):
+    """The configured re-encoding policy, or None when optimization is off."""
+    if not config['IMAGE_OPTIMIZE_ON_INGEST']:
+        return None
+    return IngestPolicy(
+        max_long_edge=config['IMAGE_MAX_LONG_EDGE'],
+        jpeg_quality=config['IMAGE_JPEG_QUALITY'],
+        preserve_gps=config['IMAGE_PRESERVE_GPS_EXIF'],
+    )
+
+
+def reencode_file(source_path, target_path, policy):
+    """
+    Re-encode the JPEG at ``source_path`` into ``target_path`` under ``policy``.
+
+    Returns the new size in bytes, or None when the original should be kept
+    (not a JPEG, or the result is not smaller). Pure file-to-file work, so it
+    can run in a worker process.
+    """
+    with PILImage.open(source_path) as picture:
+        if picture.format != 'JPEG':
+            return None
+        exif = PILImage.Exif()
+        if policy.preserve_gps:
+            gps = picture.getexif().get_ifd(ExifTags.IFD.GPSInfo)
+            if gps:
+                exif[ExifTags.IFD.GPSInfo] = gps
+        rendition = ImageOps.exif_transpose(picture)
+        if rendition.mode not in ('RGB', 'L'):
+            rendition = rendition.convert('RGB')
+        if policy.max_long_edge and max(rendition.size) > policy.max_long_edge:
+            rendition.thumbnail((policy.max_long_edge, policy.max_long_edge), PILImage.Resampling.LANCZOS)
+        rendition.save(
+            target_path,
+            'JPEG',
+            quality=policy.jpeg_quality,
+            optimize=True,
+            progressive=True,
+            exif=exif,
+        )
+    new_size = os.path.getsize(target_path)
+    if new_size >= os.path.getsize(source_path):
+        return None
+    return new_size
+
+
+def _local_copy(storage, key, source=None):
+    """Local path of the stored object and whether it is a temporary copy."""
+    local_path = storage.local_path(key)
+    if local_path is not None:
+        return local_path, False
+    temp_path = incoming_temp_path(os.path.splitext(key)[1])
+    with open(temp_path, 'wb') as out:
+        if source is None:
+            with storage.open(key) as stored:
+                shutil.copyfileobj(stored, out)
+        else:
+            source.seek(0)
+            shutil.copyfileobj(source, out)
+            source.seek(0)
+    return temp_path, True
+
+
+def _claim_blob(blob_id, original_size):
+    """Mark the blob processed; False when another ingest or the CLI got there first."""
+    return bool(
+        ImageBlob.query.filter(ImageBlob.id == blob_id, ImageBlob.original_size_bytes.is_(None)).update(
+            {ImageBlob.original_size_bytes: original_size}, synchronize_session=False
+        )
+    )
+
+
+def _store_reencoded(blob_id, key, original_size, target_path, new_size):
+    """Record the outcome for a claimed blob and replace the object when it shrank."""
+    if new_size is not None:
+        get_image_storage().put_file(key, target_path, content_type='image/jpeg')
+    ImageBlob.query.filter_by(id=blob_id).update(
+        {ImageBlob.size_bytes: new_size if new_size is not None else original_size},
+        synchronize_session=False,
+    )
+
+
+def optimize_blob(blob_id, key, policy, source=None):
+    """
+    Apply ``policy`` to a blob not processed yet; returns the bytes saved.
+
+    ``source`` is an open file of the stored object, saving a download from
+    remote storage. Leaves the commit to the caller; raises OSError or
+    ``UnidentifiedImageError`` when the original cannot be read.
+    """
+    storage = get_image_storage()
+    original_size = storage.size(key)
+    if original_size is None or not _claim_blob(blob_id, original_size):
+        return 0
+
+    source_path, is_copy = _local_copy(storage, key, source)
+    target_path = incoming_temp_path('.jpg')
+    try:
+        new_size = reencode_file(source_path, target_path, policy)
+        _store_reencoded(blob_id, key, original_size, target_path, new_size)
+    except (OSError, UnidentifiedImageError, PILImage.DecompressionBombError):
+        ImageBlob.query.filter_by(id=blob_id).update(
+            {ImageBlob.original_size_bytes: None}, synchronize_session=False
+        )
+        raise
+    finally:
+        for path in (target_path, source_path if is_copy else None):
+            if path and os.path.exists(path):
+                os.remove(path)
+    if new_size is None:
+        return 0
+    logger.info("Image blob %s re-encoded: %s -> %s bytes", key, original_size, new_size)
+    return original_size - new_size
+
+
+def reencode_archive(policy, workers, batch_size=32):
+    """
+    Apply ``policy`` to every referenced blob not processed yet.
+
+    Decoding and encoding run in a process pool of ``workers``; downloads,
+    uploads and database updates stay in this process. Commits per batch.
+    Returns ``(blobs_processed, bytes_saved, failures)``.
+    """
+    storage = get_image_storage()
+    processed = saved = failures = 0
+    last_id = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = (
+                db.session.query(ImageBlob.id, ImageBlob.path)
+                .filter(ImageBlob.id > last_id, ImageBlob.original_size_bytes.is_(None), ImageBlob.ref_count > 0)
+                .order_by(ImageBlob.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            jobs = {}
+            for blob_id, key in batch:
+                try:
+                    source_path, is_copy = _local_copy(storage, key)
+                except OSError as err:
+                    logger.error("Could not read image blob %s: %s", key, err)
+                    failures += 1
+                    continue
+                target_path = incoming_temp_path('.jpg')
+                future = pool.submit(reencode_file, source_path, target_path, policy)
+                jobs[future] = (blob_id, key, source_path, is_copy, target_path)
+
+            for future in as_completed(jobs):
+                blob_id, key, source_path, is_copy, target_path = jobs[future]
+                try:
+                    new_size = future.result()
+                    original_size = os.path.getsize(source_path)
+                    if _claim_blob(blob_id, original_size):
+                        _store_reencoded(blob_id, key, original_size, target_path, new_size)
+                        processed += 1
+                        saved += original_size - new_size if new_size is not None else 0
+                except (OSError, UnidentifiedImageError, PILImage.DecompressionBombError) as err:
+                    logger.error("Could not re-encode image blob %s: %s", key, err)
+                    failures += 1
+                finally:
+                    for path in (target_path, source_path if is_copy else None):
+                        if path and os.path.exists(path):
+                            os.remove(path)
+            db.session.commit()
+    logger.info("Re-encoded %s image blobs, saved %s bytes (%s failed)", processed, saved, failures)
+    return processed, saved, failures
+
+
+def image_savings_by_race():
+    """
+    Per-race photo storage: distinct blobs, stored bytes and bytes saved by re-encoding.
+
+    A photo shared by logs of several races counts for each of them.
+    """
+    race_images = union(
+        db.session.query(CheckpointLog.race_id.label('race_id'), CheckpointLog.image_id.label('image_id'))
+        .filter(CheckpointLog.image_id.isnot(None)),
+        db.session.query(TaskLog.race_id.label('race_id'), TaskLog.image_id.label('image_id'))
+        .filter(TaskLog.image_id.isnot(None)),
+    ).subquery()
+    race_blobs = (
+        db.session.query(race_images.c.race_id, Image.blob_id)
+        .join(Image, Image.id == race_images.c.image_id)
+        .filter(Image.blob_id.isnot(None))
+        .distinct()
+        .subquery()
+    )
+    stored = func.coalesce(ImageBlob.size_bytes, 0)
+    rows = (
+        db.session.query(
+            race_blobs.c.race_id,
+            func.count(ImageBlob.id),
+            func.sum(stored),
+            func.sum(func.coalesce(ImageBlob.original_size_bytes, stored) - stored),
+        )
+        .join(ImageBlob, ImageBlob.id == race_blobs.c.blob_id)
+        .group_by(race_blobs.c.race_id)
+        .order_by(race_blobs.c.race_id)
+        .all()
+    )
+    return [
+        {'race_id': race_id, 'photos': photos, 'stored_bytes': int(stored_bytes or 0), 'saved_bytes': int(saved or 0)}
+        for race_id, photos, stored_bytes, saved in rows
+    ]
@@ -0,0 +1,162 @@
+"""
+Perceptual hashes of photos and near-duplicate detection across teams.
+
+The image ingest stores a 64-bit difference hash (dHash) on each ``Image``:
+the photo is shrunk to 9x8 grey pixels and every bit says whether a pixel is
+brighter than its right neighbour. Re-compressed, resized or slightly
+cropped copies of a photo differ in a few bits only, so the Hamming distance
+between two hashes measures how alike the photos are.
+
+``find_duplicate_photos`` compares the photos logged for each checkpoint of a
+race with a BK-tree, which only visits the subtrees whose distance to the
+query can be within the threshold instead of comparing all pairs.
+"""
+import logging
+
+from PIL import Image as PILImage
+from PIL import ImageOps
+
+from app import db
+from app.models import CheckpointLog, Image
+
+logger = logging.getLogger(__name__)
+
+HASH_WIDTH = 8
+HASH_HEIGHT = 8
+_HASH_MASK = (1 << (HASH_WIDTH * HASH_HEIGHT)) - 1
+
+
+def _to_signed(value):
+    """Fit an unsigned 64-bit hash into a signed BIGINT column."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def perceptual_hash(source):
+    """
+    Difference hash of the photo in the open binary file ``source``, as a signed 64-bit int.
+
+    Raises OSError or ``UnidentifiedImageError`` when it cannot be decoded.
+    """
+    source.seek(0)
+    with PILImage.open(source) as picture:
+        # JPEG: let the decoder downscale, a full-size decode is not needed
+        picture.draft('L', (HASH_WIDTH * 16, HASH_HEIGHT * 16))
+        grey = ImageOps.exif_transpose(picture).convert('L')
+    source.seek(0)
+    # mode L: one byte per pixel, row by row
+    pixels = grey.resize((HASH_WIDTH + 1, HASH_HEIGHT), PILImage.Resampling.LANCZOS).tobytes()
+    value = 0
+    for row in range(HASH_HEIGHT):
+        offset = row * (HASH_WIDTH + 1)
+        for column in range(HASH_WIDTH):
+            value = (value << 1) | (pixels[offset + column] > pixels[offset + column + 1])
+    return _to_signed(value)
+
+
+def image_phash(image, source):
+    """Hash of ``image``, reused from another image of the same blob when one has it."""
+    if image.blob_id is not None:
+        shared = (
+            db.session.query(Image.phash)
+            .filter(Image.blob_id == image.blob_id, Image.phash.isnot(None))
+            .limit(1)
+            .scalar()
+        )
+        if shared is not None:
+            return shared
+    return perceptual_hash(source)
+
+
+def hamming_distance(first, second):
+    """Number of differing bits of two hashes."""
+    return ((first ^ second) & _HASH_MASK).bit_count()
+
+
+class BKTree:
+    """Metric tree of hashes under the Hamming distance."""
+
+    def __init__(self):
+        # node: [hash, item, {distance: child node}]
+        self._root = None
+
+    def add(self, value, item):
+        if self._root is None:
+            self._root = [value, item, {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, item, {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """``(distance, item)`` of every entry within ``max_distance`` of ``value``."""
+        if self._root is None:
+            return []
+        found = []
+        pending = [self._root]
+        while pending:
+            node = pending.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= max_distance:
+                found.append((distance, node[1]))
+            # triangle inequality: only children at distance within the window can match
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+        return found
+
+
+def _photo(row):
+    return {
+        "log_id": row.log_id,
+        "team_id": row.team_id,
+        "image_id": row.image_id,
+        "image_filename": row.filename,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+def find_duplicate_photos(race_id, max_distance):
+    """
+    Pairs of checkpoint photos of different teams whose hashes are within ``max_distance``.
+
+    Returns dicts with ``checkpoint_id``, ``distance`` and the two ``photos``,
+    closest pairs first within each checkpoint.
+    """
+    rows = (
+        db.session.query(
+            CheckpointLog.id.label('log_id'),
+            CheckpointLog.checkpoint_id,
+            CheckpointLog.team_id,
+            CheckpointLog.created_at,
+            Image.id.label('image_id'),
+            Image.filename,
+            Image.phash,
+        )
+        .join(Image, Image.id == CheckpointLog.image_id)
+        .filter(CheckpointLog.race_id == race_id, Image.phash.isnot(None))
+        .order_by(CheckpointLog.checkpoint_id, CheckpointLog.id)
+    )
+    pairs = []
+    checkpoint_id = None
+    tree = None
+    checkpoint_pairs = []
+    for row in rows:
+        if row.checkpoint_id != checkpoint_id:
+            pairs.extend(sorted(checkpoint_pairs, key=lambda pair: pair["distance"]))
+            checkpoint_id, tree, checkpoint_pairs = row.checkpoint_id, BKTree(), []
+        for distance, earlier in tree.search(row.phash, max_distance):
+            if earlier.team_id != row.team_id:
+                checkpoint_pairs.append({
+                    "checkpoint_id": checkpoint_id,
+                    "distance": distance,
+                    "photos": [_photo(earlier), _photo(row)],
+                })
+        tree.add(row.phash, row)
+    pairs.extend(sorted(checkpoint_pairs, key=lambda pair: pair["distance"]))
+    logger.info("Found %s near-duplicate photo pairs in race %s (max distance %s)", len(pairs), race_id, max_distance)
+    return pairs
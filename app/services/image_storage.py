@@ -0,0 +1,266 @@
+"""
+Storage backends for uploaded photos and their derivatives.
+
+Photos are addressed by a relative key (``ab/cd/<sha256>.jpg``,
+``.derived/thumb/ab/cd/<sha256>.webp``); ``IMAGE_STORAGE_BACKEND`` selects
+where the bytes live:
+
+* ``local`` (default): files under ``IMAGE_UPLOAD_FOLDER`` on this host.
+* ``s3``: an S3-compatible bucket (AWS, MinIO, ...) configured by the
+  ``IMAGE_S3_*`` settings. Requires ``boto3``; credentials come from the
+  usual AWS environment variables. ``serve_image`` redirects to presigned
+  GET URLs, so photo bytes do not pass through Flask workers.
+
+Both backends issue presigned uploads: the client ``PUT``s a photo to the
+returned URL and then sends only its key to the log endpoint. The key is
+derived from the SHA-256 the client announced, and the upload is rejected
+(local) or the photo is marked ``failed`` by the ingest (both) when the
+content does not match it.
+"""
+import base64
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+
+from flask import current_app, url_for
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from werkzeug.security import safe_join
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND_LOCAL = 'local'
+STORAGE_BACKEND_S3 = 's3'
+
+UPLOAD_TOKEN_SALT = 'image-upload'
+
+# local staging area for files on their way into storage
+INCOMING_FOLDER = '.incoming'
+
+# objects read back for processing are kept in memory up to this size
+_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+class LocalImageStorage:
+    """Photos as files under ``IMAGE_UPLOAD_FOLDER``."""
+
+    name = STORAGE_BACKEND_LOCAL
+
+    @property
+    def folder(self):
+        return current_app.config['IMAGE_UPLOAD_FOLDER']
+
+    def local_path(self, key):
+        """Absolute path of ``key``, or None when it escapes the folder."""
+        return safe_join(self.folder, key)
+
+    def size(self, key):
+        """Size of the stored object in bytes, or None when it does not exist."""
+        path = self.local_path(key)
+        try:
+            return os.path.getsize(path) if path and os.path.isfile(path) else None
+        except OSError:
+            return None
+
+    def exists(self, key):
+        return self.size(key) is not None
+
+    def open(self, key):
+        """Open the stored object for binary reading; raises FileNotFoundError."""
+        path = self.local_path(key)
+        if path is None:
+            raise FileNotFoundError(key)
+        return open(path, 'rb')
+
+    def put_file(self, key, source_path, content_type=None):
+        """Move a local file into storage under ``key``, replacing an existing object."""
+        path = self.local_path(key)
+        if path is None:
+            raise FileNotFoundError(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+
+    def delete(self, key):
+        """Delete the object; returns False when it did not exist."""
+        path = self.local_path(key)
+        if path is None:
+            return False
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def presigned_upload(self, key, content_type, sha256_hex, expires_in):
+        """Signed URL of ``upload_image_object`` accepting one PUT of the announced content."""
+        token = _upload_serializer().dumps({'key': key, 'sha256': sha256_hex, 'content_type': content_type})
+        return {
+            'url': url_for('upload_image_object', token=token, _external=True),
+            'method': 'PUT',
+            'headers': {'Content-Type': content_type},
+        }
+
+    def download_url(self, key, expires_in):
+        """Local files are served by ``serve_image`` itself."""
+        return None
+
+
+class S3ImageStorage:
+    """Photos as objects in an S3-compatible bucket."""
+
+    name = STORAGE_BACKEND_S3
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, client=None):
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.endpoint_url = endpoint_url or None
+        self.region = region or None
+        self._client = client
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # boto3 clients are thread-safe, creating them is not
+        with self._lock:
+            if self._client is None:
+                import boto3
+
+                self._client = boto3.session.Session().client(
+                    's3', endpoint_url=self.endpoint_url, region_name=self.region
+                )
+            return self._client
+
+    def _object_key(self, key):
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def local_path(self, key):
+        return None
+
+    def size(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as err:
+            if err.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise OSError(f"Could not look up {key} in storage: {err}") from err
+        return head['ContentLength']
+
+    def exists(self, key):
+        return self.size(key) is not None
+
+    def open(self, key):
+        """Download the object into a seekable spooled temp file."""
+        from botocore.exceptions import ClientError
+
+        spooled = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE)
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))['Body']
+            shutil.copyfileobj(body, spooled)
+        except ClientError as err:
+            spooled.close()
+            if err.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(key) from err
+            raise OSError(f"Could not read {key} from storage: {err}") from err
+        spooled.seek(0)
+        return spooled
+
+    def put_file(self, key, source_path, content_type=None):
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        extra_args = {'CacheControl': f"public, max-age={current_app.config['IMAGE_CACHE_MAX_AGE_SECONDS']}, immutable"}
+        if content_type:
+            extra_args['ContentType'] = content_type
+        try:
+            self.client.upload_file(source_path, self.bucket, self._object_key(key), ExtraArgs=extra_args)
+        except (BotoCoreError, ClientError) as err:
+            raise OSError(f"Could not write {key} to storage: {err}") from err
+        finally:
+            if os.path.exists(source_path):
+                os.remove(source_path)
+
+    def delete(self, key):
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        if not self.exists(key):
+            return False
+        try:
+            self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+        except (BotoCoreError, ClientError) as err:
+            raise OSError(f"Could not delete {key} from storage: {err}") from err
+        return True
+
+    def presigned_upload(self, key, content_type, sha256_hex, expires_in):
+        """Presigned PUT; the bucket rejects bodies not matching the checksum header."""
+        checksum = base64.b64encode(bytes.fromhex(sha256_hex)).decode('ascii')
+        url = self.client.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': self.bucket,
+                'Key': self._object_key(key),
+                'ContentType': content_type,
+                'ChecksumSHA256': checksum,
+            },
+            ExpiresIn=expires_in,
+        )
+        return {
+            'url': url,
+            'method': 'PUT',
+            'headers': {'Content-Type': content_type, 'x-amz-checksum-sha256': checksum},
+        }
+
+    def download_url(self, key, expires_in):
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self._object_key(key)},
+            ExpiresIn=expires_in,
+        )
+
+
+def incoming_temp_path(extension=''):
+    """Fresh path in the local staging folder for a file about to be stored."""
+    incoming = os.path.join(current_app.config['IMAGE_UPLOAD_FOLDER'], INCOMING_FOLDER)
+    os.makedirs(incoming, exist_ok=True)
+    return os.path.join(incoming, uuid.uuid4().hex + extension)
+
+
+def _upload_serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=UPLOAD_TOKEN_SALT)
+
+
+def load_upload_token(token):
+    """Claims of a local presigned upload token, or None when invalid or expired."""
+    try:
+        return _upload_serializer().loads(token, max_age=current_app.config['IMAGE_UPLOAD_URL_EXPIRES_SECONDS'])
+    except (BadSignature, SignatureExpired):
+        return None
+
+
+def create_image_storage(config):
+    """Build the backend selected by ``IMAGE_STORAGE_BACKEND``."""
+    backend = config['IMAGE_STORAGE_BACKEND']
+    if backend == STORAGE_BACKEND_LOCAL:
+        return LocalImageStorage()
+    if backend == STORAGE_BACKEND_S3:
+        if not config['IMAGE_S3_BUCKET']:
+            raise ValueError("IMAGE_S3_BUCKET is required for the s3 image storage backend.")
+        return S3ImageStorage(
+            config['IMAGE_S3_BUCKET'],
+            prefix=config['IMAGE_S3_PREFIX'],
+            endpoint_url=config['IMAGE_S3_ENDPOINT_URL'],
+            region=config['IMAGE_S3_REGION'],
+        )
+    raise ValueError(f"Unknown IMAGE_STORAGE_BACKEND {backend!r}, use 'local' or 's3'.")
+
+
+def get_image_storage():
+    """The application's photo storage backend."""
+    return current_app.extensions['image_storage']
+
+
+def init_image_storage(app):
+    """Attach the configured photo storage backend to the application."""
+    app.extensions['image_storage'] = create_image_storage(app.config)
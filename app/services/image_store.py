@@ -0,0 +1,344 @@
+"""
+Content-addressed storage of uploaded photos.
+
+Uploads are hashed while they stream to a local staging file and stored
+once per content in the photo storage backend under a hash-sharded key
+(``ab/cd/<sha256>.jpg``). Every ``Image`` row references its ``ImageBlob``,
+whose ``ref_count`` counts those rows, so a photo uploaded by two devices
+of a team, or retried, is written only once. Deleting a log or checkpoint
+releases the reference instead of deleting the object; ``flask images
+sweep`` reclaims blobs that have had no references for
+``IMAGE_BLOB_SWEEP_GRACE_SECONDS``.
+
+Clients may also upload directly to storage (``presign_image_upload``) and
+send only the resulting key with the log (``attach_uploaded_image``).
+
+Images stored before blobs existed (flat ``timestamp_uuid.ext`` names in
+``IMAGE_UPLOAD_FOLDER``, no ``blob_id``) are still unlinked directly when
+released; ``flask images migrate-legacy`` moves them into blob storage with
+``adopt_legacy_image``.
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import safe_join
+
+from app import db
+from app.models import CheckpointLog, Image, ImageBlob, TaskLog
+from app.services.image_derivatives import derivative_keys
+from app.services.image_storage import get_image_storage, incoming_temp_path
+from app.services.status_delta import bump_status_version
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Pillow format name -> stored file extension
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif'}
+
+# upload content type -> stored file extension
+CONTENT_TYPE_EXTENSIONS = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/gif': 'gif'}
+
+_BLOB_KEY = re.compile(r'([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{64})\.(jpg|png|gif)')
+
+
+def blob_relative_path(digest, extension):
+    """Relative path of a blob: two levels of 2-character shards, then the full hash."""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
+
+
+def blob_key_digest(key):
+    """SHA-256 a blob key is named after, or None for other keys (e.g. pre-blob files)."""
+    match = _BLOB_KEY.fullmatch(key or '')
+    if match is None or match.group(3)[:4] != match.group(1) + match.group(2):
+        return None
+    return match.group(3)
+
+
+def stream_to_temp(stream):
+    """Copy a binary stream into a staging file while hashing it; returns (path, sha256, size)."""
+    temp_path = incoming_temp_path()
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, 'wb') as out:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path, digest.hexdigest(), size
+
+
+def _reference_blob(digest, relative_path, size, uploaded_bytes=True):
+    """
+    Add one reference to the blob, creating its row if needed; returns the blob id.
+
+    ``uploaded_bytes`` says the stored object now holds the bytes as uploaded,
+    so an earlier re-encoding (see ``image_optimize``) has to run again.
+    """
+    values = {ImageBlob.ref_count: ImageBlob.ref_count + 1, ImageBlob.released_at: None}
+    if uploaded_bytes:
+        values.update({ImageBlob.size_bytes: size, ImageBlob.original_size_bytes: None})
+    if not ImageBlob.query.filter_by(sha256=digest).update(values, synchronize_session=False):
+        try:
+            with db.session.begin_nested():
+                db.session.add(ImageBlob(sha256=digest, path=relative_path, size_bytes=size, ref_count=1))
+        except IntegrityError:
+            # a concurrent upload of the same content created the row first
+            ImageBlob.query.filter_by(sha256=digest).update(values, synchronize_session=False)
+    return db.session.query(ImageBlob.id).filter_by(sha256=digest).scalar()
+
+
+def store_image(file_storage, image_format, **image_fields):
+    """
+    Store an upload content-addressed and add an ``Image`` row referencing it.
+
+    ``image_format`` is the Pillow format from ``inspect_uploaded_image``.
+    The row is flushed, not committed; if the transaction rolls back, the
+    written object is left in storage without a blob row.
+    Raises OSError when the file cannot be written.
+    """
+    stream = file_storage.stream
+    stream.seek(0)
+    try:
+        temp_path, digest, size = stream_to_temp(stream)
+    finally:
+        stream.seek(0)
+    relative_path = blob_relative_path(digest, FORMAT_EXTENSIONS.get(image_format, 'jpg'))
+    storage = get_image_storage()
+    reencoded = db.session.query(ImageBlob.id).filter(
+        ImageBlob.sha256 == digest, ImageBlob.path == relative_path, ImageBlob.original_size_bytes.isnot(None)
+    ).first() is not None
+    uploaded_bytes = not (reencoded and storage.exists(relative_path))
+    try:
+        # identical content: replacing an existing blob is harmless and
+        # restores it if a sweep removed it concurrently; a re-encoded one is kept
+        if uploaded_bytes:
+            storage.put_file(relative_path, temp_path, content_type=mimetypes.guess_type(relative_path)[0])
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    blob_id = _reference_blob(digest, relative_path, size, uploaded_bytes)
+    image = Image(filename=relative_path, blob_id=blob_id, **image_fields)
+    db.session.add(image)
+    db.session.flush()
+    return image
+
+
+def adopt_legacy_image(image):
+    """
+    Move a pre-blob image file into content-addressed storage and point the row at it.
+
+    Returns the old file path, which the caller removes after committing, or
+    None when the file is missing. The logs showing the image are marked as
+    changed for delta polls and their races' status version is bumped, so
+    team status list and bootstrap ETags pick up the new filename; scores
+    are untouched. Flushes, does not commit.
+    """
+    old_path = safe_join(current_app.config['IMAGE_UPLOAD_FOLDER'], image.filename)
+    if old_path is None or not os.path.isfile(old_path):
+        return None
+    with open(old_path, 'rb') as source:
+        temp_path, digest, size = stream_to_temp(source)
+    extension = os.path.splitext(image.filename)[1].lstrip('.').lower()
+    relative_path = blob_relative_path(digest, 'jpg' if extension == 'jpeg' else extension or 'jpg')
+    # same content already stored, possibly under another extension
+    relative_path = db.session.query(ImageBlob.path).filter_by(sha256=digest).scalar() or relative_path
+    try:
+        get_image_storage().put_file(relative_path, temp_path, content_type=mimetypes.guess_type(relative_path)[0])
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    image.blob_id = _reference_blob(digest, relative_path, size)
+    image.filename = relative_path
+    race_ids = set()
+    for model in (CheckpointLog, TaskLog):
+        logs = model.query.filter(model.image_id == image.id)
+        race_ids.update(race_id for (race_id,) in logs.with_entities(model.race_id))
+        logs.update({model.updated_at: db.func.now()}, synchronize_session=False)
+    bump_status_version(race_ids)
+    db.session.flush()
+    return old_path
+
+
+def presign_image_upload(sha256_hex, content_type):
+    """
+    Key and upload instructions for sending a photo straight to storage.
+
+    ``upload`` is None when the content is already stored, so the client
+    can skip the transfer and log with the key right away.
+    """
+    key = blob_relative_path(sha256_hex, CONTENT_TYPE_EXTENSIONS[content_type])
+    storage = get_image_storage()
+    stored = db.session.query(ImageBlob.id).filter(
+        ImageBlob.sha256 == sha256_hex, ImageBlob.path == key, ImageBlob.ref_count > 0
+    ).first() is not None
+    if stored and storage.exists(key):
+        return {'key': key, 'upload': None}
+    expires_in = current_app.config['IMAGE_UPLOAD_URL_EXPIRES_SECONDS']
+    upload = storage.presigned_upload(key, content_type, sha256_hex, expires_in)
+    return {'key': key, 'upload': dict(upload, expires_in=expires_in)}
+
+
+def receive_image_upload(key, sha256_hex, content_type, stream):
+    """
+    Store the body of a presigned upload to the local backend under ``key``.
+
+    Returns False, storing nothing, when the content does not hash to the
+    announced SHA-256.
+    """
+    temp_path, digest, _size = stream_to_temp(stream)
+    try:
+        if digest != sha256_hex:
+            return False
+        get_image_storage().put_file(key, temp_path, content_type=content_type)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return True
+
+
+def attach_uploaded_image(key, **image_fields):
+    """
+    Add an ``Image`` row for a photo the client uploaded directly to storage.
+
+    Returns None when ``key`` is not a blob key, nothing was uploaded
+    under it or the content is stored under a different extension. The content is checked against the key by the image ingest.
+    Flushes, does not commit.
+    """
+    digest = blob_key_digest(key)
+    if digest is None:
+        return None
+    stored = db.session.query(ImageBlob.path, ImageBlob.size_bytes).filter_by(sha256=digest).first()
+    if stored is not None and stored.path != key:
+        # same content already stored under another extension
+        return None
+    size = get_image_storage().size(key)
+    if size is None:
+        return None
+    # a re-encoded blob changes size when the client uploads the original again
+    blob_id = _reference_blob(digest, key, size, uploaded_bytes=stored is None or size != stored.size_bytes)
+    image = Image(filename=key, blob_id=blob_id, **image_fields)
+    db.session.add(image)
+    db.session.flush()
+    return image
+
+
+def release_image(image):
+    """
+    Delete an ``Image`` row and drop its blob reference.
+
+    Callers delete the logs referencing the image first. Returns the file
+    path of a pre-blob image, which the caller unlinks with
+    ``remove_image_files`` after committing, or None.
+    """
+    if image.blob_id is None:
+        db.session.delete(image)
+        return os.path.join(current_app.config['IMAGE_UPLOAD_FOLDER'], image.filename)
+    # the UPDATE autoflushes pending deletes of the logs referencing the image first
+    ImageBlob.query.filter_by(id=image.blob_id).update(
+        {
+            ImageBlob.ref_count: ImageBlob.ref_count - 1,
+            ImageBlob.released_at: db.case(
+                (ImageBlob.ref_count <= 1, db.func.now()),
+                else_=ImageBlob.released_at,
+            ),
+        },
+        synchronize_session=False,
+    )
+    db.session.delete(image)
+    return None
+
+
+def remove_image_derivatives(path):
+    """Delete the stored derivatives of the image at ``path``, if any."""
+    filename = os.path.relpath(path, current_app.config['IMAGE_UPLOAD_FOLDER']) if os.path.isabs(path) else path
+    storage = get_image_storage()
+    for key in derivative_keys(filename):
+        try:
+            storage.delete(key)
+        except OSError as err:
+            logger.error("Error deleting image derivative %s: %s", key, err)
+
+
+def remove_image_files(paths):
+    """Unlink pre-blob image files and their derivatives; returns how many originals were removed."""
+    removed = 0
+    for path in paths:
+        if not path:
+            continue
+        remove_image_derivatives(path)
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+            else:
+                logger.warning("Image file %s already missing", path)
+        except OSError as err:
+            logger.error("Error deleting image file %s: %s", path, err)
+    return removed
+
+
+def delete_unreferenced_blobs(blob_ids, batch_size=500):
+    """
+    Delete the given blobs that have no references, with their files.
+
+    Deletes the rows with one statement per chunk of ids, which re-checks the
+    reference count so a blob referenced again meanwhile survives, commits,
+    then removes the deleted blobs' files. Returns ``(blobs_removed, bytes_freed)``.
+    """
+    storage = get_image_storage()
+    blob_ids = list(blob_ids)
+    removed = 0
+    freed = 0
+    for start in range(0, len(blob_ids), batch_size):
+        chunk = blob_ids[start:start + batch_size]
+        deleted = db.session.execute(
+            delete(ImageBlob)
+            .where(ImageBlob.id.in_(chunk), ImageBlob.ref_count <= 0)
+            .returning(ImageBlob.path, ImageBlob.size_bytes)
+        ).all()
+        db.session.commit()
+        for path, size_bytes in deleted:
+            removed += 1
+            freed += size_bytes or 0
+            remove_image_derivatives(path)
+            try:
+                if not storage.delete(path):
+                    logger.warning("Image blob %s already missing from storage", path)
+            except OSError as err:
+                logger.error("Error deleting image blob %s: %s", path, err)
+    return removed, freed
+
+
+def sweep_unreferenced_blobs(grace_seconds=None, now=None):
+    """
+    Delete blobs without references for longer than the grace period and their files.
+
+    Returns ``(blobs_removed, bytes_freed)``. Commits.
+    """
+    if grace_seconds is None:
+        grace_seconds = current_app.config['IMAGE_BLOB_SWEEP_GRACE_SECONDS']
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(seconds=grace_seconds)
+
+    candidates = [
+        row.id for row in db.session.query(ImageBlob.id)
+        .filter(ImageBlob.ref_count <= 0, ImageBlob.released_at <= cutoff)
+        .order_by(ImageBlob.id)
+    ]
+    removed, freed = delete_unreferenced_blobs(candidates)
+    logger.info("Image blob sweep removed %s blobs (%s bytes)", removed, freed)
+    return removed, freed
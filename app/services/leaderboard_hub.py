@@ -0,0 +1,240 @@
+"""
+Live leaderboard fan-out for the results event stream.
+
+One ``_RaceFeed`` per race and worker owns the latest results snapshot and a
+background thread. Whenever the race's score version changes the feed reloads
+the results once and pushes only the changed team rows to every subscriber
+queue, so N open streams cost one recomputation.
+
+Change notifications travel through a broker with a small publish/subscribe
+interface. ``LocalBroker`` is the in-process stand-in: writes committed in this
+worker wake the feed immediately. Writes committed by other gunicorn workers
+are picked up by the feed's periodic ``Race.score_version`` check, so streams
+stay correct across workers without extra infrastructure; a networked broker
+(e.g. Redis pub/sub) can replace ``LocalBroker`` to cut that latency.
+"""
+import logging
+import queue
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from app.models import Race
+from app.services.scoring_service import SCORE_CHANGES_SESSION_KEY, load_race_results
+
+logger = logging.getLogger(__name__)
+
+
+class StreamLimitReached(Exception):
+    """Raised when a worker already serves the maximum number of result streams."""
+
+
+class LocalBroker:
+    """In-process publish/subscribe broker keyed by channel name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handlers = {}
+
+    def subscribe(self, channel, handler):
+        with self._lock:
+            self._handlers.setdefault(channel, set()).add(handler)
+
+    def unsubscribe(self, channel, handler):
+        with self._lock:
+            handlers = self._handlers.get(channel)
+            if handlers:
+                handlers.discard(handler)
+                if not handlers:
+                    del self._handlers[channel]
+
+    def publish(self, channel, message=None):
+        with self._lock:
+            handlers = list(self._handlers.get(channel, ()))
+        for handler in handlers:
+            handler(message)
+
+
+def _race_channel(race_id):
+    return f"race:{race_id}:scores"
+
+
+def _diff_rows(previous_rows, current_rows):
+    """Return (changed rows, removed team ids) between two snapshots keyed by team id."""
+    changed = [row for team_id, row in current_rows.items() if previous_rows.get(team_id) != row]
+    removed = sorted(team_id for team_id in previous_rows if team_id not in current_rows)
+    return changed, removed
+
+
+class _RaceFeed:
+    def __init__(self, hub, race_id):
+        self.hub = hub
+        self.race_id = race_id
+        self.version = None
+        self.rows_by_team = {}
+        self.subscribers = set()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def notify(self, _message=None):
+        self.wake.set()
+
+    def load(self):
+        """Load version and rows; must run inside an application context."""
+        version = db.session.query(Race.score_version).filter(Race.id == self.race_id).scalar()
+        rows = load_race_results(self.race_id)
+        return version, {row['team_id']: row for row in rows}
+
+    def snapshot(self):
+        return {
+            'race_id': self.race_id,
+            'version': self.version,
+            'teams': list(self.rows_by_team.values()),
+        }
+
+    def run(self):
+        app = self.hub.app
+        while True:
+            self.wake.wait(self.hub.poll_seconds)
+            self.wake.clear()
+            with self.hub.lock:
+                if not self.subscribers:
+                    self.hub.drop_feed(self)
+                    return
+            try:
+                with app.app_context():
+                    current_version = db.session.query(Race.score_version).filter(Race.id == self.race_id).scalar()
+                    if current_version == self.version:
+                        continue
+                    version, rows_by_team = self.load()
+            except SQLAlchemyError as err:
+                logger.error("Leaderboard feed for race %s failed to refresh: %s", self.race_id, err)
+                continue
+
+            changed, removed = _diff_rows(self.rows_by_team, rows_by_team)
+            with self.hub.lock:
+                self.version = version
+                self.rows_by_team = rows_by_team
+                subscribers = list(self.subscribers)
+            if not changed and not removed:
+                continue
+
+            update = {'race_id': self.race_id, 'version': version, 'teams': changed, 'removed': removed}
+            for subscriber in subscribers:
+                subscriber.put(update)
+            logger.debug(
+                "Leaderboard update for race %s (version %s) sent to %s subscribers",
+                self.race_id,
+                version,
+                len(subscribers),
+            )
+
+
+class LeaderboardHub:
+    """Per-worker registry of race feeds and their stream subscribers."""
+
+    def __init__(self, app, broker=None):
+        self.app = app
+        self.broker = broker or LocalBroker()
+        self.lock = threading.Lock()
+        self.feeds = {}
+        self.active_streams = 0
+        self.max_streams = app.config['LEADERBOARD_STREAM_MAX_CONNECTIONS']
+        self.poll_seconds = app.config['LEADERBOARD_POLL_SECONDS']
+
+    def subscribe(self, race_id):
+        """
+        Register a new stream for a race.
+
+        Returns ``(subscriber_queue, snapshot)``; must be called inside an
+        application context. Raises StreamLimitReached when the worker is full.
+        """
+        with self.lock:
+            if self.active_streams >= self.max_streams:
+                raise StreamLimitReached()
+            self.active_streams += 1
+            feed = self.feeds.get(race_id)
+            if feed is None:
+                feed = _RaceFeed(self, race_id)
+                self.feeds[race_id] = feed
+                self.broker.subscribe(_race_channel(race_id), feed.notify)
+            needs_load = feed.version is None
+
+        if needs_load:
+            try:
+                version, rows_by_team = feed.load()
+            except SQLAlchemyError:
+                with self.lock:
+                    self.active_streams -= 1
+                raise
+            with self.lock:
+                if feed.version is None:
+                    feed.version = version
+                    feed.rows_by_team = rows_by_team
+
+        subscriber = queue.Queue()
+        with self.lock:
+            if self.feeds.get(race_id) is not feed:
+                # the feed went idle and was dropped while we were loading it
+                self.feeds[race_id] = feed
+                self.broker.subscribe(_race_channel(race_id), feed.notify)
+            feed.subscribers.add(subscriber)
+            if feed.thread is None:
+                feed.thread = threading.Thread(
+                    target=feed.run,
+                    name=f"leaderboard-race-{race_id}",
+                    daemon=True,
+                )
+                feed.thread.start()
+            snapshot = feed.snapshot()
+        return subscriber, snapshot
+
+    def unsubscribe(self, race_id, subscriber):
+        """Release a stream slot; safe to call more than once for the same subscriber."""
+        with self.lock:
+            feed = self.feeds.get(race_id)
+            if feed is None or subscriber not in feed.subscribers:
+                return
+            feed.subscribers.discard(subscriber)
+            self.active_streams -= 1
+            if not feed.subscribers:
+                feed.wake.set()
+
+    def drop_feed(self, feed):
+        """Forget an idle feed; caller holds ``self.lock``."""
+        if self.feeds.get(feed.race_id) is feed:
+            del self.feeds[feed.race_id]
+        self.broker.unsubscribe(_race_channel(feed.race_id), feed.notify)
+        feed.thread = None
+
+    def publish_score_change(self, race_id):
+        self.broker.publish(_race_channel(race_id), {'race_id': race_id})
+
+
+def _publish_committed_score_changes(session):
+    race_ids = session.info.pop(SCORE_CHANGES_SESSION_KEY, None)
+    if not race_ids:
+        return
+    from flask import current_app, has_app_context
+    if not has_app_context():
+        return
+    hub = current_app.extensions.get('leaderboard_hub')
+    if hub is None:
+        return
+    for race_id in race_ids:
+        hub.publish_score_change(race_id)
+
+
+def _discard_rolled_back_score_changes(session):
+    session.info.pop(SCORE_CHANGES_SESSION_KEY, None)
+
+
+event.listen(db.session, 'after_commit', _publish_committed_score_changes)
+event.listen(db.session, 'after_rollback', _discard_rolled_back_score_changes)
+
+
+def init_leaderboard_hub(app):
+    """Attach a leaderboard hub to the application."""
+    app.extensions['leaderboard_hub'] = LeaderboardHub(app)
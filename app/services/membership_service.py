@@ -0,0 +1,63 @@
+"""
+Team membership claims carried in access tokens.
+
+Access tokens embed the user's team ids, the confirmed ``(race_id, team_id)``
+registrations and ``User.membership_version``. race_api authorization reads
+memberships from these claims instead of joining ``team_members``; the version
+is compared with the database on every race request (see
+app/routes/race_api/context.py) so a token issued before a membership or
+registration change is rejected and must be refreshed.
+"""
+from app import db
+from app.models import Registration, User, team_members
+
+TEAMS_CLAIM = 'teams'
+RACE_TEAMS_CLAIM = 'race_teams'
+MEMBERSHIP_VERSION_CLAIM = 'membership_version'
+
+
+def confirmed_race_teams(user_id):
+    """Return sorted ``[race_id, team_id]`` pairs of the user's payment-confirmed registrations."""
+    rows = (
+        db.session.query(Registration.race_id, Registration.team_id)
+        .join(team_members, team_members.c.team_id == Registration.team_id)
+        .filter(
+            team_members.c.user_id == user_id,
+            Registration.payment_confirmed.is_(True),
+        )
+        .order_by(Registration.race_id, Registration.team_id)
+        .all()
+    )
+    return [[race_id, team_id] for race_id, team_id in rows]
+
+
+def access_token_claims(user, race_teams=None):
+    """Additional claims for a user's access token; pass ``race_teams`` when already loaded."""
+    if race_teams is None:
+        race_teams = confirmed_race_teams(user.id)
+    return {
+        'is_administrator': bool(user.is_administrator),
+        TEAMS_CLAIM: sorted(team.id for team in user.teams),
+        RACE_TEAMS_CLAIM: [list(pair) for pair in race_teams],
+        MEMBERSHIP_VERSION_CLAIM: user.membership_version or 0,
+    }
+
+
+def bump_membership_version(user_ids):
+    """Invalidate the membership claims of the given users' access tokens."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    User.query.filter(User.id.in_(user_ids)).update(
+        {User.membership_version: db.func.coalesce(User.membership_version, 0) + 1},
+        synchronize_session=False,
+    )
+
+
+def bump_team_membership_version(team_id):
+    """Invalidate the membership claims of every member of a team."""
+    member_ids = db.select(team_members.c.user_id).where(team_members.c.team_id == team_id)
+    User.query.filter(User.id.in_(member_ids)).update(
+        {User.membership_version: db.func.coalesce(User.membership_version, 0) + 1},
+        synchronize_session=False,
+    )
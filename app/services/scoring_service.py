@@ -0,0 +1,573 @@
+"""
+Incrementally maintained race scores.
+
+Log/unlog handlers adjust a team's RaceScore row in the same transaction as the
+CheckpointLog/TaskLog write, so race results never have to aggregate the logs.
+The recompute helpers rebuild rows from the logs when point values change or
+when the table has drifted. Every change also bumps Race.score_version, which
+the results endpoint exposes as its ETag.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Checkpoint, CheckpointLog, Race, RaceCategory, RaceScore, Registration, Task, TaskLog, Team
+
+logger = logging.getLogger(__name__)
+
+# Session.info key collecting race ids whose scores changed in the open transaction;
+# published to live leaderboard streams after commit (see leaderboard_hub.py).
+SCORE_CHANGES_SESSION_KEY = 'score_changed_race_ids'
+
+
+def _dialect_insert(table):
+    """Return a dialect-specific INSERT supporting ON CONFLICT, or None if unsupported."""
+    dialect_name = db.session.get_bind().dialect.name
+    if dialect_name == 'postgresql':
+        return postgresql.insert(table)
+    if dialect_name == 'sqlite':
+        return sqlite.insert(table)
+    return None
+
+
+def bump_score_version(race_id):
+    """Increment the race's score version so cached results (ETags) are invalidated."""
+    Race.query.filter_by(id=race_id).update(
+        {Race.score_version: Race.score_version + 1},
+        synchronize_session=False,
+    )
+    db.session.info.setdefault(SCORE_CHANGES_SESSION_KEY, set()).add(race_id)
+
+
+def _last_log_at_subquery(race_id, team_id):
+    """Scalar subquery: time of the team's latest remaining checkpoint or task log."""
+    log_times = db.union_all(
+        db.select(CheckpointLog.created_at.label('created_at'))
+        .where(CheckpointLog.race_id == race_id, CheckpointLog.team_id == team_id),
+        db.select(TaskLog.created_at.label('created_at'))
+        .where(TaskLog.race_id == race_id, TaskLog.team_id == team_id),
+    ).subquery()
+    return db.select(db.func.max(log_times.c.created_at)).scalar_subquery()
+
+
+# Columns of the one-log-per-team unique constraints of the log tables.
+_LOG_CONFLICT_COLUMNS = {
+    CheckpointLog: ('checkpoint_id', 'team_id', 'race_id'),
+    TaskLog: ('task_id', 'team_id', 'race_id'),
+}
+
+
+def insert_team_log(log_model, **values):
+    """
+    Insert a checkpoint/task log unless the team already has it.
+
+    Returns the new log's ``id`` and ``created_at`` (as attributes), or None
+    when the team already has the log. Uses ``INSERT ... ON CONFLICT DO
+    NOTHING`` so a concurrent duplicate neither raises nor rolls back the
+    caller's transaction; dialects without it fall back to a savepoint.
+    """
+    table = log_model.__table__
+    insert_stmt = _dialect_insert(table)
+    if insert_stmt is not None:
+        return db.session.execute(
+            insert_stmt.values(**values)
+            .on_conflict_do_nothing(index_elements=[table.c[name] for name in _LOG_CONFLICT_COLUMNS[log_model]])
+            .returning(table.c.id, table.c.created_at)
+        ).first()
+
+    log = log_model(**values)
+    try:
+        with db.session.begin_nested():
+            db.session.add(log)
+    except IntegrityError:
+        return None
+    return log
+
+
+def record_team_log(race_id, team_id, logged_at, checkpoint_points=0, task_points=0):
+    """
+    Add a new log's points to the team's running score and advance its last log time.
+
+    ``logged_at`` is the log's ``created_at``; the last log time only moves
+    forward, so it stays the latest ``created_at`` of the team's logs, as
+    ``recompute_team_scores`` and point-in-time results compute it. Runs as an
+    atomic upsert so concurrent logs for the same team never lose an
+    increment. The caller owns the transaction.
+    """
+    bump_score_version(race_id)
+    checkpoint_points = checkpoint_points or 0
+    task_points = task_points or 0
+
+    table = RaceScore.__table__
+    latest_log_at = db.case(
+        (db.or_(table.c.last_log_at.is_(None), table.c.last_log_at < logged_at), logged_at),
+        else_=table.c.last_log_at,
+    )
+    insert_stmt = _dialect_insert(table)
+    if insert_stmt is not None:
+        db.session.execute(
+            insert_stmt.values(
+                race_id=race_id,
+                team_id=team_id,
+                points_for_checkpoints=checkpoint_points,
+                points_for_tasks=task_points,
+                last_log_at=logged_at,
+            ).on_conflict_do_update(
+                index_elements=[table.c.race_id, table.c.team_id],
+                set_={
+                    'points_for_checkpoints': table.c.points_for_checkpoints + checkpoint_points,
+                    'points_for_tasks': table.c.points_for_tasks + task_points,
+                    'last_log_at': latest_log_at,
+                    'updated_at': db.func.now(),
+                },
+            )
+        )
+        return
+
+    updated = (
+        RaceScore.query
+        .filter_by(race_id=race_id, team_id=team_id)
+        .update(
+            {
+                RaceScore.points_for_checkpoints: RaceScore.points_for_checkpoints + checkpoint_points,
+                RaceScore.points_for_tasks: RaceScore.points_for_tasks + task_points,
+                RaceScore.last_log_at: latest_log_at,
+            },
+            synchronize_session=False,
+        )
+    )
+    if not updated:
+        db.session.add(RaceScore(
+            race_id=race_id,
+            team_id=team_id,
+            points_for_checkpoints=checkpoint_points,
+            points_for_tasks=task_points,
+            last_log_at=logged_at,
+        ))
+
+
+def record_team_unlog(race_id, team_id, checkpoint_points=0, task_points=0):
+    """
+    Subtract a removed log's points from the team's running score.
+
+    Must be called after the log row was deleted in the session; the last log
+    time is recomputed from the team's remaining logs.
+    """
+    bump_score_version(race_id)
+    db.session.flush()
+    RaceScore.query.filter_by(race_id=race_id, team_id=team_id).update(
+        {
+            RaceScore.points_for_checkpoints: RaceScore.points_for_checkpoints - (checkpoint_points or 0),
+            RaceScore.points_for_tasks: RaceScore.points_for_tasks - (task_points or 0),
+            RaceScore.last_log_at: _last_log_at_subquery(race_id, team_id),
+        },
+        synchronize_session=False,
+    )
+
+
+def recompute_team_scores(race_id, team_ids=None):
+    """
+    Rebuild RaceScore rows for a race from CheckpointLog/TaskLog.
+
+    Limits the rebuild to ``team_ids`` when given, otherwise rebuilds every
+    team in the race. Returns the number of score rows written.
+    """
+    if team_ids is not None:
+        team_ids = set(team_ids)
+        if not team_ids:
+            return 0
+    bump_score_version(race_id)
+
+    checkpoint_query = (
+        db.session.query(CheckpointLog.team_id, db.func.sum(Checkpoint.numOfPoints))
+        .select_from(CheckpointLog)
+        .join(Checkpoint, CheckpointLog.checkpoint_id == Checkpoint.id)
+        .filter(CheckpointLog.race_id == race_id)
+        .group_by(CheckpointLog.team_id)
+    )
+    task_query = (
+        db.session.query(TaskLog.team_id, db.func.sum(Task.numOfPoints))
+        .select_from(TaskLog)
+        .join(Task, TaskLog.task_id == Task.id)
+        .filter(TaskLog.race_id == race_id)
+        .group_by(TaskLog.team_id)
+    )
+    checkpoint_times_query = (
+        db.session.query(CheckpointLog.team_id, db.func.max(CheckpointLog.created_at))
+        .filter(CheckpointLog.race_id == race_id)
+        .group_by(CheckpointLog.team_id)
+    )
+    task_times_query = (
+        db.session.query(TaskLog.team_id, db.func.max(TaskLog.created_at))
+        .filter(TaskLog.race_id == race_id)
+        .group_by(TaskLog.team_id)
+    )
+    score_query = RaceScore.query.filter(RaceScore.race_id == race_id)
+    if team_ids is not None:
+        checkpoint_query = checkpoint_query.filter(CheckpointLog.team_id.in_(team_ids))
+        task_query = task_query.filter(TaskLog.team_id.in_(team_ids))
+        checkpoint_times_query = checkpoint_times_query.filter(CheckpointLog.team_id.in_(team_ids))
+        task_times_query = task_times_query.filter(TaskLog.team_id.in_(team_ids))
+        score_query = score_query.filter(RaceScore.team_id.in_(team_ids))
+
+    checkpoint_points = {team_id: points or 0 for team_id, points in checkpoint_query.all()}
+    task_points = {team_id: points or 0 for team_id, points in task_query.all()}
+    last_log_times = dict(checkpoint_times_query.all())
+    for team_id, logged_at in task_times_query.all():
+        if last_log_times.get(team_id) is None or (logged_at and logged_at > last_log_times[team_id]):
+            last_log_times[team_id] = logged_at
+    scores_by_team = {score.team_id: score for score in score_query.all()}
+
+    all_team_ids = set(checkpoint_points) | set(task_points) | set(scores_by_team)
+    for team_id in all_team_ids:
+        score = scores_by_team.get(team_id)
+        if score is None:
+            score = RaceScore(race_id=race_id, team_id=team_id)
+            db.session.add(score)
+        score.points_for_checkpoints = checkpoint_points.get(team_id, 0)
+        score.points_for_tasks = task_points.get(team_id, 0)
+        score.last_log_at = last_log_times.get(team_id)
+
+    logger.info("Recomputed %s score rows for race %s", len(all_team_ids), race_id)
+    return len(all_team_ids)
+
+
+def recompute_checkpoint_scores(checkpoint):
+    """Rebuild scores of every team that logged the given checkpoint."""
+    team_ids = {
+        team_id for (team_id,) in
+        db.session.query(CheckpointLog.team_id).filter(CheckpointLog.checkpoint_id == checkpoint.id).distinct()
+    }
+    return recompute_team_scores(checkpoint.race_id, team_ids)
+
+
+def recompute_task_scores(task):
+    """Rebuild scores of every team that logged the given task."""
+    team_ids = {
+        team_id for (team_id,) in
+        db.session.query(TaskLog.team_id).filter(TaskLog.task_id == task.id).distinct()
+    }
+    return recompute_team_scores(task.race_id, team_ids)
+
+
+def _supports_window_functions():
+    bind = db.session.get_bind()
+    if bind.dialect.name == 'sqlite':
+        return bind.dialect.dbapi.sqlite_version_info >= (3, 25, 0)
+    return True
+
+
+def _log_points_query(race_id, as_of=None):
+    """
+    UNION ALL of the race's checkpoint and task logs as
+    (team_id, created_at, checkpoint_points, task_points), optionally up to ``as_of``.
+
+    Served by the (race_id, created_at) indexes on both log tables.
+    """
+    checkpoint_logs = (
+        db.select(
+            CheckpointLog.team_id.label('team_id'),
+            CheckpointLog.created_at.label('created_at'),
+            db.func.coalesce(Checkpoint.numOfPoints, 0).label('checkpoint_points'),
+            db.literal(0).label('task_points'),
+        )
+        .join(Checkpoint, CheckpointLog.checkpoint_id == Checkpoint.id)
+        .where(CheckpointLog.race_id == race_id)
+    )
+    task_logs = (
+        db.select(
+            TaskLog.team_id.label('team_id'),
+            TaskLog.created_at.label('created_at'),
+            db.literal(0).label('checkpoint_points'),
+            db.func.coalesce(Task.numOfPoints, 0).label('task_points'),
+        )
+        .join(Task, TaskLog.task_id == Task.id)
+        .where(TaskLog.race_id == race_id)
+    )
+    if as_of is not None:
+        checkpoint_logs = checkpoint_logs.where(CheckpointLog.created_at <= as_of)
+        task_logs = task_logs.where(TaskLog.created_at <= as_of)
+    return db.union_all(checkpoint_logs, task_logs)
+
+
+def _score_source(race_id, as_of=None):
+    """
+    Per-team (team_id, points_for_checkpoints, points_for_tasks, last_log_at).
+
+    Reads the maintained race_score rows, or aggregates the logs up to ``as_of``
+    for point-in-time standings.
+    """
+    if as_of is None:
+        return (
+            db.select(
+                RaceScore.team_id,
+                RaceScore.points_for_checkpoints,
+                RaceScore.points_for_tasks,
+                RaceScore.last_log_at,
+            )
+            .where(RaceScore.race_id == race_id)
+            .subquery('scores')
+        )
+    logs = _log_points_query(race_id, as_of).subquery('logs')
+    return (
+        db.select(
+            logs.c.team_id,
+            db.func.sum(logs.c.checkpoint_points).label('points_for_checkpoints'),
+            db.func.sum(logs.c.task_points).label('points_for_tasks'),
+            db.func.max(logs.c.created_at).label('last_log_at'),
+        )
+        .group_by(logs.c.team_id)
+        .subquery('scores')
+    )
+
+
+def _ranking_key(row):
+    last_log_at = row['last_log_at']
+    return (row['disqualified'], -row['total_points'], last_log_at is None, last_log_at or datetime.min)
+
+
+def _assign_ranks(rows):
+    """Set ``rank`` on result rows already in ranking order; tied rows share a rank."""
+    previous_key = None
+    rank = 0
+    for position, row in enumerate(rows, start=1):
+        key = _ranking_key(row)
+        if key != previous_key:
+            rank = position
+            previous_key = key
+        row['rank'] = None if row['disqualified'] else rank
+
+
+def _result_row(team_id, team, category_id, category, disqualified, checkpoint_points, task_points, last_log_at):
+    checkpoint_points = checkpoint_points or 0
+    task_points = task_points or 0
+    return {
+        'rank': None,
+        'team_id': team_id,
+        'team': team,
+        'category_id': category_id,
+        'category': category,
+        'disqualified': bool(disqualified),
+        'points_for_checkpoints': checkpoint_points,
+        'points_for_tasks': task_points,
+        'total_points': checkpoint_points + task_points,
+        'last_log_at': last_log_at,
+    }
+
+
+def _serialize_last_log_at(rows):
+    for row in rows:
+        if row['last_log_at'] is not None:
+            row['last_log_at'] = row['last_log_at'].isoformat()
+    return rows
+
+
+def _confirmed_registrations_query(race_id, category_id=None):
+    query = (
+        db.session.query(
+            Registration.team_id,
+            Team.name.label('team_name'),
+            RaceCategory.id.label('race_category_id'),
+            RaceCategory.name.label('race_category_name'),
+            Registration.disqualified,
+        )
+        .select_from(Registration)
+        .join(Team, Registration.team_id == Team.id)
+        .join(RaceCategory, Registration.race_category_id == RaceCategory.id)
+        .filter(
+            Registration.race_id == race_id,
+            Registration.payment_confirmed.is_(True),
+        )
+    )
+    if category_id is not None:
+        query = query.filter(Registration.race_category_id == category_id)
+    return query
+
+
+def load_race_results(race_id, category_id=None, top=None, as_of=None):
+    """
+    Return ranked result rows for payment-confirmed registrations.
+
+    Teams are ordered by total points, ties broken by the earliest last log
+    (the team that reached the score first wins); teams that never logged come
+    after those that did. Disqualified teams are listed last with ``rank`` None.
+    ``category_id`` restricts the leaderboard (and ranks) to one race category,
+    ``top`` limits the number of rows returned and ``as_of`` computes the
+    standings from the logs created up to that time instead of race_score.
+    """
+    scores = _score_source(race_id, as_of)
+    checkpoint_points = db.func.coalesce(scores.c.points_for_checkpoints, 0)
+    task_points = db.func.coalesce(scores.c.points_for_tasks, 0)
+    ranking_order = [
+        Registration.disqualified.asc(),
+        (checkpoint_points + task_points).desc(),
+        scores.c.last_log_at.is_(None).asc(),
+        scores.c.last_log_at.asc(),
+    ]
+    use_window = _supports_window_functions()
+
+    query = (
+        _confirmed_registrations_query(race_id, category_id)
+        .outerjoin(scores, scores.c.team_id == Registration.team_id)
+        .add_columns(
+            checkpoint_points.label('points_for_checkpoints'),
+            task_points.label('points_for_tasks'),
+            scores.c.last_log_at,
+        )
+    )
+    if use_window:
+        query = query.add_columns(db.func.rank().over(order_by=ranking_order).label('rank'))
+    query = query.order_by(*ranking_order, Registration.team_id)
+    if top is not None:
+        query = query.limit(top)
+
+    result = []
+    for row in query.all():
+        result_row = _result_row(
+            row.team_id,
+            row.team_name,
+            row.race_category_id,
+            row.race_category_name,
+            row.disqualified,
+            row.points_for_checkpoints,
+            row.points_for_tasks,
+            row.last_log_at,
+        )
+        if use_window and not result_row['disqualified']:
+            result_row['rank'] = row.rank
+        result.append(result_row)
+    if not use_window:
+        # older SQLite without window functions: rows are already in ranking order
+        _assign_ranks(result)
+    return _serialize_last_log_at(result)
+
+
+def load_team_result(race_id, team_id):
+    """
+    Return one team's ranked result row, as in ``load_race_results``, or None.
+
+    Reads the team's race_score row and counts the teams ranked ahead of it
+    in one query, instead of ranking the whole field. None when the team has
+    no payment-confirmed registration for the race.
+    """
+    scores = _score_source(race_id)
+    checkpoint_points = db.func.coalesce(scores.c.points_for_checkpoints, 0)
+    task_points = db.func.coalesce(scores.c.points_for_tasks, 0)
+    total_points = checkpoint_points + task_points
+
+    other_registration = db.aliased(Registration)
+    other_score = db.aliased(RaceScore)
+    other_total_points = (
+        db.func.coalesce(other_score.points_for_checkpoints, 0)
+        + db.func.coalesce(other_score.points_for_tasks, 0)
+    )
+    # same ordering as load_race_results: more points first, then the earlier last log
+    teams_ahead = (
+        db.select(db.func.count())
+        .select_from(other_registration)
+        .outerjoin(
+            other_score,
+            db.and_(other_score.race_id == race_id, other_score.team_id == other_registration.team_id),
+        )
+        .where(
+            other_registration.race_id == race_id,
+            other_registration.payment_confirmed.is_(True),
+            other_registration.disqualified.is_(False),
+            db.or_(
+                other_total_points > total_points,
+                db.and_(
+                    other_total_points == total_points,
+                    other_score.last_log_at.isnot(None),
+                    db.or_(scores.c.last_log_at.is_(None), other_score.last_log_at < scores.c.last_log_at),
+                ),
+            ),
+        )
+        .scalar_subquery()
+    )
+
+    row = (
+        _confirmed_registrations_query(race_id)
+        .filter(Registration.team_id == team_id)
+        .outerjoin(scores, scores.c.team_id == Registration.team_id)
+        .add_columns(
+            checkpoint_points.label('points_for_checkpoints'),
+            task_points.label('points_for_tasks'),
+            scores.c.last_log_at,
+            teams_ahead.label('teams_ahead'),
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    result_row = _result_row(
+        row.team_id,
+        row.team_name,
+        row.race_category_id,
+        row.race_category_name,
+        row.disqualified,
+        row.points_for_checkpoints,
+        row.points_for_tasks,
+        row.last_log_at,
+    )
+    if not result_row['disqualified']:
+        result_row['rank'] = row.teams_ahead + 1
+    return _serialize_last_log_at([result_row])[0]
+
+
+def load_race_standings_timeline(race_id, start, end, buckets, category_id=None):
+    """
+    Return the standings at ``buckets`` evenly spaced times in (start, end].
+
+    Streams the race's logs once in time order and snapshots the running team
+    totals at each bucket boundary, instead of running one as-of query per
+    bucket. Each entry is ``{'as_of': ..., 'teams': [ranked rows]}``.
+    """
+    teams = {
+        row.team_id: row
+        for row in _confirmed_registrations_query(race_id, category_id)
+    }
+    running = {team_id: [0, 0, None] for team_id in teams}
+    step = (end - start) / buckets
+    boundaries = [start + step * index for index in range(1, buckets)] + [end]
+
+    def snapshot(as_of):
+        rows = [
+            _result_row(
+                team_id,
+                team.team_name,
+                team.race_category_id,
+                team.race_category_name,
+                team.disqualified,
+                *running[team_id],
+            )
+            for team_id, team in teams.items()
+        ]
+        rows.sort(key=lambda row: (_ranking_key(row), row['team_id']))
+        _assign_ranks(rows)
+        return {'as_of': as_of.isoformat(), 'teams': _serialize_last_log_at(rows)}
+
+    logs = _log_points_query(race_id, as_of=end).subquery('logs')
+    log_rows = db.session.execute(
+        db.select(logs).order_by(logs.c.created_at),
+        execution_options={'yield_per': 1000},
+    )
+
+    timeline = []
+    next_boundary = 0
+    for log in log_rows:
+        while log.created_at > boundaries[next_boundary]:
+            timeline.append(snapshot(boundaries[next_boundary]))
+            next_boundary += 1
+        totals = running.get(log.team_id)
+        if totals is None:
+            continue
+        totals[0] += log.checkpoint_points or 0
+        totals[1] += log.task_points or 0
+        totals[2] = log.created_at
+    while next_boundary < len(boundaries):
+        timeline.append(snapshot(boundaries[next_boundary]))
+        next_boundary += 1
+    return timeline
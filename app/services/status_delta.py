@@ -0,0 +1,147 @@
+"""
+Delta polls of a team's checkpoint and task status lists.
+
+Checkpoints, tasks, their translations and the team logs carry ``updated_at``;
+deleted checkpoints/tasks and removed logs (unlogs) leave a ``SyncTombstone``
+row. A status list requested with ``?since=<cursor>`` only contains the
+entities of which any of these changed at or after the cursor, plus the ids
+of deleted entities, and the response hands out the next cursor.
+
+Cursors are database timestamps taken before the delta is read. Rows are
+stamped by the database clock when their transaction writes them, which may
+be before an in-flight transaction commits, so each poll re-reads the last
+``CURSOR_OVERLAP`` before the cursor; clients apply items idempotently.
+
+Full status lists carry an ETag (``status_etag``) computed from a watermark
+of the team's logs (count, highest id, latest update, number of unlogs),
+``Race.catalog_version`` and ``Race.status_version``, so an unchanged list is
+answered with 304 before checkpoints, tasks or translations are loaded.
+Photo maintenance that changes what logs show touches the logs'
+``updated_at`` for delta polls and bumps the status version with
+``bump_status_version``.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+
+from sqlalchemy import literal, select, union
+
+from app import db
+from app.models import (
+    Checkpoint,
+    CheckpointLog,
+    CheckpointTranslation,
+    Race,
+    SyncTombstone,
+    Task,
+    TaskLog,
+    TaskTranslation,
+)
+
+logger = logging.getLogger(__name__)
+
+SYNC_CURSOR_HEADER = 'Sync-Cursor'
+TOMBSTONE_CHECKPOINT = 'checkpoint'
+TOMBSTONE_TASK = 'task'
+
+CURSOR_OVERLAP = timedelta(seconds=5)
+
+# tombstone type -> (entity model, translation model, translation foreign key, log model, log foreign key)
+_TRACKED = {
+    TOMBSTONE_CHECKPOINT: (Checkpoint, CheckpointTranslation, 'checkpoint_id', CheckpointLog, 'checkpoint_id'),
+    TOMBSTONE_TASK: (Task, TaskTranslation, 'task_id', TaskLog, 'task_id'),
+}
+
+
+def record_tombstone(race_id, entity_type, entity_id, team_id=None):
+    """
+    Remember a deleted checkpoint/task, or with ``team_id`` a removed team log.
+
+    Adds to the session; the caller commits with the deletion.
+    """
+    db.session.add(SyncTombstone(race_id=race_id, entity_type=entity_type, entity_id=entity_id, team_id=team_id))
+
+
+def touch_entity(entity):
+    """Mark a checkpoint/task as changed, e.g. when one of its translations is deleted."""
+    entity.updated_at = db.func.now()
+
+
+def bump_status_version(race_ids):
+    """Increment the status version of the races so team status list and bootstrap ETags are invalidated."""
+    race_ids = set(race_ids)
+    if race_ids:
+        Race.query.filter(Race.id.in_(race_ids)).update(
+            {Race.status_version: Race.status_version + 1},
+            synchronize_session=False,
+        )
+
+
+def current_cursor():
+    """Database time to hand out as the next cursor, as an ISO 8601 string."""
+    return db.session.query(db.func.now()).scalar().isoformat()
+
+
+def status_etag(race, team_id, entity_type, language):
+    """ETag of the team's full checkpoint or task status list in ``language``; one query."""
+    log_model = _TRACKED[entity_type][3]
+    unlog_count = (
+        select(db.func.count(SyncTombstone.id))
+        .where(
+            SyncTombstone.race_id == race.id,
+            SyncTombstone.entity_type == entity_type,
+            SyncTombstone.team_id == team_id,
+        )
+        .scalar_subquery()
+    )
+    watermark = db.session.query(
+        db.func.count(log_model.id),
+        db.func.max(log_model.id),
+        db.func.max(log_model.updated_at),
+        unlog_count,
+    ).filter(log_model.race_id == race.id, log_model.team_id == team_id).one()
+    digest = hashlib.sha256('-'.join(str(value) for value in watermark).encode('utf-8')).hexdigest()[:16]
+    versions = f"{race.catalog_version}-{race.status_version}"
+    return f"race-{race.id}-team-{team_id}-{entity_type}-status-{language}-{versions}-{digest}"
+
+
+def status_delta(race_id, team_id, entity_type, since, language):
+    """
+    ``(changed_ids, deleted_ids)`` of the race's checkpoints or tasks since ``since``.
+
+    An entity has changed when it, its translation in ``language`` or the
+    team's log of it was written, or the team's log was removed. Deleted ids
+    may still be reported as changed when an id was reused; callers drop ids
+    that no longer exist from the changed ones. Issues one query.
+    """
+    model, translation_model, translation_key, log_model, log_key = _TRACKED[entity_type]
+    since = since - CURSOR_OVERLAP
+    translation_entity_id = getattr(translation_model, translation_key)
+    changes = union(
+        select(model.id, literal(False).label('deleted'))
+        .where(model.race_id == race_id, model.updated_at >= since),
+        select(translation_entity_id, literal(False))
+        .join(model, model.id == translation_entity_id)
+        .where(
+            model.race_id == race_id,
+            translation_model.language == language,
+            translation_model.updated_at >= since,
+        ),
+        select(getattr(log_model, log_key), literal(False))
+        .where(log_model.race_id == race_id, log_model.team_id == team_id, log_model.updated_at >= since),
+        select(SyncTombstone.entity_id, SyncTombstone.team_id.is_(None))
+        .where(
+            SyncTombstone.race_id == race_id,
+            SyncTombstone.entity_type == entity_type,
+            SyncTombstone.deleted_at >= since,
+            db.or_(SyncTombstone.team_id.is_(None), SyncTombstone.team_id == team_id),
+        ),
+    )
+    changed_ids, deleted_ids = set(), set()
+    for entity_id, deleted in db.session.execute(changes):
+        (deleted_ids if deleted else changed_ids).add(entity_id)
+    logger.debug(
+        "Status delta of %s for race %s team %s: %s changed, %s deleted",
+        entity_type, race_id, team_id, len(changed_ids), len(deleted_ids),
+    )
+    return changed_ids, deleted_ids
@@ -0,0 +1,86 @@
+"""
+Batched resolution of translated race, category, checkpoint and task texts.
+
+List endpoints used to look up each entity's translation with its own
+query. ``translate_entities`` loads the translations of all entities of a
+list in one ``IN`` query and returns their texts with the fallback rules of
+``resolve_title_description``: the translated title or name replaces the
+base one when it is non-empty, every other field (description, race
+greeting) when it is not NULL.
+"""
+import logging
+
+from app.models import (
+    Checkpoint,
+    CheckpointTranslation,
+    Race,
+    RaceCategory,
+    RaceCategoryTranslation,
+    RaceTranslation,
+    Task,
+    TaskTranslation,
+)
+
+logger = logging.getLogger(__name__)
+
+# entity model -> (translation model, foreign key attribute, translated fields; the first one is the title)
+TRANSLATABLE_MODELS = {
+    Race: (RaceTranslation, 'race_id', ('name', 'description', 'race_greeting')),
+    RaceCategory: (RaceCategoryTranslation, 'race_category_id', ('name', 'description')),
+    Checkpoint: (CheckpointTranslation, 'checkpoint_id', ('title', 'description')),
+    Task: (TaskTranslation, 'task_id', ('title', 'description')),
+}
+
+
+def _resolve_fields(entity, translation, fields):
+    texts = {field: getattr(entity, field) for field in fields}
+    if translation is None:
+        return texts
+    title_field = fields[0]
+    if getattr(translation, title_field):
+        texts[title_field] = getattr(translation, title_field)
+    for field in fields[1:]:
+        if getattr(translation, field) is not None:
+            texts[field] = getattr(translation, field)
+    return texts
+
+
+def translate_entities(entities, language):
+    """
+    Translated texts of ``entities`` (one model) in ``language``, keyed by entity id.
+
+    Issues a single query for all entities, none without a language. Each
+    value maps the model's translated fields (e.g. ``title``, ``description``)
+    to the translation or the base text.
+    """
+    entities = list(entities)
+    if not entities:
+        return {}
+    translation_model, foreign_key, fields = TRANSLATABLE_MODELS[type(entities[0])]
+    translations = {}
+    if language:
+        entity_ids = {entity.id for entity in entities}
+        column = getattr(translation_model, foreign_key)
+        translations = {
+            getattr(translation, foreign_key): translation
+            for translation in translation_model.query.filter(
+                column.in_(entity_ids),
+                translation_model.language == language,
+            )
+        }
+        logger.debug(
+            "Resolved %s of %s %s translations in language '%s'",
+            len(translations),
+            len(entity_ids),
+            translation_model.__tablename__,
+            language,
+        )
+    return {
+        entity.id: _resolve_fields(entity, translations.get(entity.id), fields)
+        for entity in entities
+    }
+
+
+def translate_entity(entity, language):
+    """Translated texts of a single entity, see ``translate_entities``."""
+    return translate_entities([entity], language)[entity.id]
@@ -1,8 +1,10 @@
 import logging
 from datetime import datetime, timezone
 from math import radians, sin, cos, sqrt, atan2
+from typing import BinaryIO, NamedTuple
 from dateutil import parser
-from PIL import Image, UnidentifiedImageError
+from flask import make_response, request
+from PIL import ExifTags, Image, UnidentifiedImageError
 from app.constants import DEFAULT_LANGUAGE
 
 logger = logging.getLogger(__name__)
@@ -16,28 +18,55 @@ def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def validate_uploaded_image(file_storage) -> tuple[bool, str | None]:
-    """Validate uploaded image using MIME type and binary signature checks."""
+class UploadedImageInfo(NamedTuple):
+    """Result of ``inspect_uploaded_image``; ``error`` is set when the upload is rejected."""
+    valid: bool
+    error: str | None = None
+    format: str | None = None
+    width: int | None = None
+    height: int | None = None
+    latitude: float | None = None
+    longitude: float | None = None
+
+
+def inspect_uploaded_image(file_storage) -> UploadedImageInfo:
+    """
+    Validate an upload and read its format, dimensions and GPS position in one pass.
+
+    Pillow opens images lazily, so this reads the header and the EXIF segment
+    of the in-memory stream without decoding pixels; ``verify()`` then checks
+    the file structure on the same image object. The stream is rewound for
+    the caller.
+    """
     if file_storage is None:
-        return False, "Image file is missing."
+        return UploadedImageInfo(False, "Image file is missing.")
 
     mimetype = (file_storage.mimetype or "").lower().strip()
     if mimetype and mimetype not in ALLOWED_IMAGE_MIME_TYPES:
-        return False, "Invalid image MIME type."
+        return UploadedImageInfo(False, "Invalid image MIME type.")
 
     try:
         file_storage.stream.seek(0)
         image = Image.open(file_storage.stream)
+        image_format = image.format
+        width, height = image.size
+        latitude, longitude = _gps_coordinates(image.getexif())
         image.verify()
-    except (UnidentifiedImageError, OSError, ValueError):
-        return False, "Invalid image file."
+    except (UnidentifiedImageError, OSError, ValueError, SyntaxError):
+        return UploadedImageInfo(False, "Invalid image file.")
     finally:
         try:
             file_storage.stream.seek(0)
         except (OSError, ValueError):
             pass
 
-    return True, None
+    return UploadedImageInfo(True, None, image_format, width, height, latitude, longitude)
+
+
+def validate_uploaded_image(file_storage) -> tuple[bool, str | None]:
+    """Validate uploaded image using MIME type and binary signature checks."""
+    info = inspect_uploaded_image(file_storage)
+    return info.valid, info.error
 
 def parse_datetime(s: str) -> datetime:
     """Parse common datetime string formats into a timezone-aware UTC datetime."""
@@ -81,32 +110,51 @@ def parse_datetime(s: str) -> datetime:
         raise ValueError(f"unrecognized datetime format: {s}") from exc
 
 
-def extract_image_coordinates(image_path: str) -> tuple:
+def to_naive_utc(dt: datetime | None) -> datetime | None:
+    """Convert a datetime to naive UTC, the form log timestamps are stored in."""
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def local_to_naive_utc(dt: datetime | None) -> datetime | None:
+    """Convert a naive server-local datetime (e.g. a race window bound) to naive UTC."""
+    if dt is None:
+        return dt
+    return to_naive_utc(dt.astimezone())
+
+
+def extract_image_coordinates(source: str | BinaryIO) -> tuple:
     """
     Extract GPS coordinates from image EXIF metadata.
 
     Args:
-        image_path: Path to the image file
+        source: Path to the image file, or an open binary file object
 
     Returns:
         Tuple of (latitude, longitude) or (None, None) if not available
     """
     try:
-        image = Image.open(image_path)
-        exif_data = image.getexif()
+        with Image.open(source) as image:
+            return _gps_coordinates(image.getexif())
+    except (OSError, ValueError) as err:
+        logger.warning("Failed to extract coordinates from image %s: %s", getattr(source, "name", source), err)
+        return None, None
+
 
+def _gps_coordinates(exif_data) -> tuple:
+    """Read (latitude, longitude) from a Pillow ``Exif`` mapping, or (None, None)."""
+    try:
         if not exif_data:
-            logger.debug("No EXIF data found in image: %s", image_path)
+            logger.debug("No EXIF data found in image")
             return None, None
 
         # GPS IFD tags
-        gps_ifd_tag = 34853
-        if gps_ifd_tag not in exif_data:
-            logger.debug("No GPS data in EXIF for image: %s", image_path)
+        gps_data = exif_data.get_ifd(ExifTags.IFD.GPSInfo)
+        if not gps_data:
+            logger.debug("No GPS data in EXIF")
             return None, None
 
-        gps_data = exif_data[gps_ifd_tag]
-
         # GPS tags: North/South (1) and East/West (3)
         lat_tag = 2  # North latitude
         lon_tag = 4  # East longitude
@@ -126,11 +174,11 @@ def extract_image_coordinates(image_path: str) -> tuple:
             logger.info("Extracted GPS coordinates from image: (%s, %s)", lat, lon)
             return lat, lon
 
-        logger.debug("Incomplete GPS data in image: %s", image_path)
+        logger.debug("Incomplete GPS data in image")
         return None, None
 
-    except (OSError, AttributeError, TypeError, ValueError, KeyError) as err:
-        logger.warning("Failed to extract coordinates from image %s: %s", image_path, err)
+    except (AttributeError, TypeError, ValueError, KeyError) as err:
+        logger.warning("Failed to read GPS coordinates from EXIF: %s", err)
         return None, None
 
 
@@ -282,3 +330,20 @@ def resolve_title_description(base_title, base_description, translation=None):
         else base_description
     )
     return title, description
+
+
+def not_modified_response(etag):
+    """Return a 304 response if the request's If-None-Match matches the ETag, else None."""
+    if not request.if_none_match.contains(etag):
+        return None
+    response = make_response("", 304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def set_etag(response, etag):
+    """Attach an ETag to a response and require clients to revalidate it on every use."""
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
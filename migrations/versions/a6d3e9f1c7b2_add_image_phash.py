@@ -0,0 +1,26 @@
+"""add image.phash for near-duplicate photo detection
+
+Revision ID: a6d3e9f1c7b2
+Revises: f2b7d4e8a1c3
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d3e9f1c7b2'
+down_revision = 'f2b7d4e8a1c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('phash', sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.drop_column('phash')
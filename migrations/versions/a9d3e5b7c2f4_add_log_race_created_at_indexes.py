@@ -0,0 +1,35 @@
+"""add (race_id, created_at) indexes to checkpoint_log and task_log
+
+Revision ID: a9d3e5b7c2f4
+Revises: f4a7c1e9b3d2
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3e5b7c2f4'
+down_revision = 'f4a7c1e9b3d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_checkpoint_log_race_created_at',
+        'checkpoint_log',
+        ['race_id', 'created_at'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_task_log_race_created_at',
+        'task_log',
+        ['race_id', 'created_at'],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index('ix_task_log_race_created_at', table_name='task_log')
+    op.drop_index('ix_checkpoint_log_race_created_at', table_name='checkpoint_log')
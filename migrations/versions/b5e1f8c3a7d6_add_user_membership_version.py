@@ -0,0 +1,26 @@
+"""add membership_version to user for access token membership claims
+
+Revision ID: b5e1f8c3a7d6
+Revises: a9d3e5b7c2f4
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e1f8c3a7d6'
+down_revision = 'a9d3e5b7c2f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('membership_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('membership_version')
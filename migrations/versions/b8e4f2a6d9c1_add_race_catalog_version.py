@@ -0,0 +1,26 @@
+"""add catalog_version to race for cached checkpoint and task lists
+
+Revision ID: b8e4f2a6d9c1
+Revises: a6d3e9f1c7b2
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4f2a6d9c1'
+down_revision = 'a6d3e9f1c7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('race', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('catalog_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('race', schema=None) as batch_op:
+        batch_op.drop_column('catalog_version')
@@ -0,0 +1,60 @@
+"""add race_score table with precomputed team points
+
+Revision ID: c3f8e2a6b4d1
+Revises: d2a8c9f4e7b1
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8e2a6b4d1'
+down_revision = 'd2a8c9f4e7b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'race_score',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('race_id', sa.Integer(), nullable=False),
+        sa.Column('team_id', sa.Integer(), nullable=False),
+        sa.Column('points_for_checkpoints', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('points_for_tasks', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.ForeignKeyConstraint(['race_id'], ['race.id'], ),
+        sa.ForeignKeyConstraint(['team_id'], ['team.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('race_id', 'team_id', name='uq_race_score_race_team')
+    )
+
+    # Backfill from existing logs so results stay correct right after upgrade.
+    op.execute(
+        """
+        INSERT INTO race_score (race_id, team_id, points_for_checkpoints, points_for_tasks, updated_at)
+        SELECT race_id, team_id, SUM(checkpoint_points), SUM(task_points), CURRENT_TIMESTAMP
+        FROM (
+            SELECT checkpoint_log.race_id AS race_id,
+                   checkpoint_log.team_id AS team_id,
+                   COALESCE(checkpoint."numOfPoints", 0) AS checkpoint_points,
+                   0 AS task_points
+            FROM checkpoint_log
+            JOIN checkpoint ON checkpoint.id = checkpoint_log.checkpoint_id
+            UNION ALL
+            SELECT task_log.race_id,
+                   task_log.team_id,
+                   0,
+                   COALESCE(task."numOfPoints", 0)
+            FROM task_log
+            JOIN task ON task.id = task_log.task_id
+        ) AS points
+        GROUP BY race_id, team_id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table('race_score')
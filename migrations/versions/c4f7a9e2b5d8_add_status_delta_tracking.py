@@ -0,0 +1,77 @@
+"""add updated_at tracking and sync tombstones for status delta polls
+
+Revision ID: c4f7a9e2b5d8
+Revises: b8e4f2a6d9c1
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f7a9e2b5d8'
+down_revision = 'b8e4f2a6d9c1'
+branch_labels = None
+depends_on = None
+
+
+# table -> (backfill expression, index name, indexed columns)
+TRACKED_TABLES = {
+    'checkpoint': ('CURRENT_TIMESTAMP', 'ix_checkpoint_race_updated_at', ['race_id', 'updated_at']),
+    'task': ('CURRENT_TIMESTAMP', 'ix_task_race_updated_at', ['race_id', 'updated_at']),
+    'checkpoint_translation': (
+        'CURRENT_TIMESTAMP', 'ix_checkpoint_translation_language_updated_at', ['language', 'updated_at'],
+    ),
+    'task_translation': ('CURRENT_TIMESTAMP', 'ix_task_translation_language_updated_at', ['language', 'updated_at']),
+    'checkpoint_log': (
+        'COALESCE(created_at, CURRENT_TIMESTAMP)', 'ix_checkpoint_log_race_team_updated_at',
+        ['race_id', 'team_id', 'updated_at'],
+    ),
+    'task_log': (
+        'COALESCE(created_at, CURRENT_TIMESTAMP)', 'ix_task_log_race_team_updated_at',
+        ['race_id', 'team_id', 'updated_at'],
+    ),
+}
+
+
+def upgrade():
+    for table, (backfill, index_name, columns) in TRACKED_TABLES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = {backfill}")
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(
+                'updated_at',
+                existing_type=sa.DateTime(),
+                nullable=False,
+                server_default=sa.text('CURRENT_TIMESTAMP'),
+            )
+            batch_op.create_index(index_name, columns, unique=False)
+
+    op.create_table(
+        'sync_tombstone',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('race_id', sa.Integer(), nullable=False),
+        sa.Column('entity_type', sa.String(length=16), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('team_id', sa.Integer(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.ForeignKeyConstraint(['race_id'], ['race.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('sync_tombstone', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_sync_tombstone_race_type_deleted_at', ['race_id', 'entity_type', 'deleted_at'], unique=False,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('sync_tombstone', schema=None) as batch_op:
+        batch_op.drop_index('ix_sync_tombstone_race_type_deleted_at')
+    op.drop_table('sync_tombstone')
+
+    for table, (_backfill, index_name, _columns) in TRACKED_TABLES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(index_name)
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,39 @@
+"""add idempotency_key table for replaying retried log POSTs
+
+Revision ID: c7e4a2f9d1b8
+Revises: b5e1f8c3a7d6
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e4a2f9d1b8'
+down_revision = 'b5e1f8c3a7d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'idempotency_key',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('scope', sa.String(length=255), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('response_body', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'scope', 'key', name='uq_idempotency_key_user_scope_key')
+    )
+    op.create_index('ix_idempotency_key_expires_at', 'idempotency_key', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_idempotency_key_expires_at', table_name='idempotency_key')
+    op.drop_table('idempotency_key')
@@ -0,0 +1,26 @@
+"""add status_version to race for team status list ETags
+
+Revision ID: d2b6e8c4a1f7
+Revises: c4f7a9e2b5d8
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b6e8c4a1f7'
+down_revision = 'c4f7a9e2b5d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('race', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('race', schema=None) as batch_op:
+        batch_op.drop_column('status_version')
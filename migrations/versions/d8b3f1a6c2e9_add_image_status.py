@@ -0,0 +1,26 @@
+"""add status to image for background EXIF/GPS processing
+
+Revision ID: d8b3f1a6c2e9
+Revises: c7e4a2f9d1b8
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8b3f1a6c2e9'
+down_revision = 'c7e4a2f9d1b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=16), nullable=False, server_default='ready'))
+
+
+def downgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.drop_column('status')
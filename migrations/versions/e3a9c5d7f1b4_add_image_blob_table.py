@@ -0,0 +1,43 @@
+"""add image_blob table for content-addressed photo storage
+
+Revision ID: e3a9c5d7f1b4
+Revises: d8b3f1a6c2e9
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a9c5d7f1b4'
+down_revision = 'd8b3f1a6c2e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'image_blob',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('path', sa.String(length=256), nullable=False),
+        sa.Column('size_bytes', sa.Integer(), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('released_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sha256')
+    )
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('blob_id', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_image_blob_id', ['blob_id'], unique=False)
+        batch_op.create_foreign_key('fk_image_blob_id_image_blob', 'image_blob', ['blob_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_image_blob_id_image_blob', type_='foreignkey')
+        batch_op.drop_index('ix_image_blob_id')
+        batch_op.drop_column('blob_id')
+    op.drop_table('image_blob')
@@ -0,0 +1,26 @@
+"""add score_version to race for results ETags
+
+Revision ID: e8b2d4f6a1c9
+Revises: c3f8e2a6b4d1
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b2d4f6a1c9'
+down_revision = 'c3f8e2a6b4d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('race', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('score_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('race', schema=None) as batch_op:
+        batch_op.drop_column('score_version')
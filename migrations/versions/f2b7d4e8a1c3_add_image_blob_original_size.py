@@ -0,0 +1,26 @@
+"""add image_blob.original_size_bytes for the photo ingest policy
+
+Revision ID: f2b7d4e8a1c3
+Revises: e3a9c5d7f1b4
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b7d4e8a1c3'
+down_revision = 'e3a9c5d7f1b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('image_blob', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('original_size_bytes', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('image_blob', schema=None) as batch_op:
+        batch_op.drop_column('original_size_bytes')
@@ -0,0 +1,42 @@
+"""add last_log_at to race_score for leaderboard tie-breaks
+
+Revision ID: f4a7c1e9b3d2
+Revises: e8b2d4f6a1c9
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a7c1e9b3d2'
+down_revision = 'e8b2d4f6a1c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('race_score', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_log_at', sa.DateTime(), nullable=True))
+
+    op.execute(
+        """
+        UPDATE race_score
+        SET last_log_at = (
+            SELECT MAX(logs.created_at)
+            FROM (
+                SELECT race_id, team_id, created_at FROM checkpoint_log
+                UNION ALL
+                SELECT race_id, team_id, created_at FROM task_log
+            ) AS logs
+            WHERE logs.race_id = race_score.race_id
+              AND logs.team_id = race_score.team_id
+        )
+        """
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('race_score', schema=None) as batch_op:
+        batch_op.drop_column('last_log_at')
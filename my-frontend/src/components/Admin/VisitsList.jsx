@@ -273,7 +273,8 @@ export default function VisitsList({ teamId, raceId, onDataChanged }) {
                     })}
                   >
                     <img
-                      src={imageUrl}
+                      src={`${imageUrl}?size=medium`}
+                      loading="lazy"
                       alt={t('admin.visits.imageAltCheckpointVisit')}
                       style={{
                         width: '100%',
@@ -187,6 +187,15 @@ export async function apiFetch(path, opts = {}) {
     // Log the response
     logger.apiResponse(method, path, res.status, res.ok ? 'Success' : 'Failed');
 
+    if (res.status === 401 && !noAuth && !opts.isMembershipRetry) {
+      const payload = await res.clone().json().catch(() => null);
+      if (payload?.code === 'membership_stale') {
+        // team membership changed since the token was issued: refresh its claims and retry once
+        await refreshAccessToken();
+        return apiFetch(path, { ...opts, isMembershipRetry: true });
+      }
+    }
+
     const result = await handleResponse(res, { noRedirectOnAuthFailure });
     return result;
   } catch (err) {
@@ -0,0 +1,73 @@
+"""
+Micro-benchmark: single-pass upload inspection vs. the previous two-pass path.
+
+The old log handlers called ``validate_uploaded_image`` (Pillow ``verify()``
+on the upload stream), saved the file and then reopened it from disk in
+``extract_image_coordinates``. ``inspect_uploaded_image`` reads the header and
+EXIF of the in-memory stream once. Writing the upload to disk, which both
+paths do, is timed separately.
+
+Run from the repository root:
+
+    python -m scripts.benchmark_image_inspect [--size 4000x3000] [--repeat 200]
+"""
+import argparse
+import io
+import os
+import tempfile
+import timeit
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.utils import extract_image_coordinates, inspect_uploaded_image, validate_uploaded_image
+
+
+def _photo_bytes(width, height):
+    exif = Image.Exif()
+    exif[0x8825] = {1: 'N', 2: (50.0, 5.0, 0.0), 3: 'E', 4: (14.0, 25.0, 0.0)}
+    buffer = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert("RGB").save(buffer, "JPEG", quality=90, exif=exif)
+    return buffer.getvalue()
+
+
+def _upload(data):
+    return FileStorage(stream=io.BytesIO(data), filename="photo.jpg", content_type="image/jpeg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", default="4000x3000", help="photo size WIDTHxHEIGHT")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    width, height = (int(value) for value in args.size.lower().split("x"))
+
+    data = _photo_bytes(width, height)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "photo.jpg")
+        _upload(data).save(path)
+
+        def two_pass():
+            validate_uploaded_image(_upload(data))
+            return extract_image_coordinates(path)
+
+        def single_pass():
+            info = inspect_uploaded_image(_upload(data))
+            return info.latitude, info.longitude
+
+        def save():
+            _upload(data).save(path)
+
+        assert two_pass() == single_pass()
+        print(f"{width}x{height} JPEG, {len(data) / 1024:.0f} KiB, {args.repeat} runs")
+        variants = (
+            ("two-pass (verify, reopen from disk)", two_pass),
+            ("single-pass inspect", single_pass),
+            ("file save (both paths)", save),
+        )
+        for name, func in variants:
+            seconds = min(timeit.repeat(func, number=args.repeat, repeat=3)) / args.repeat
+            print(f"  {name:36s} {seconds * 1e6:9.1f} us/upload")
+
+if __name__ == "__main__":
+    main()
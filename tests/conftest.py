@@ -4,7 +4,11 @@ Shared pytest fixtures for all tests.
 This module contains fixtures that are automatically available to all test files
 without needing to import them explicitly.
 """
+from contextlib import contextmanager
+
 import pytest
+from sqlalchemy import event
+
 from app import create_app, db
 
 
@@ -41,6 +45,35 @@ def test_client(test_app):
     return test_app.test_client()
 
 
+@pytest.fixture
+def count_statements(test_app):
+    """
+    Record the SQL statements executed inside a ``with`` block.
+
+    Usage::
+
+        with count_statements() as statements:
+            test_client.get(url)
+        assert len(statements) == 2
+
+    Returns:
+        Context manager factory yielding the list of executed statements
+    """
+    engine = db.engine
+
+    @contextmanager
+    def recorder():
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+    return recorder
+
+
 # Common test utilities
 @pytest.fixture
 def admin_auth_headers(test_client, test_app):
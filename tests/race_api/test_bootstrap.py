@@ -0,0 +1,156 @@
+import pytest
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Checkpoint, CheckpointTranslation, Race, RaceCategory, RaceTranslation, Registration, Task, Team, User
+
+
+@pytest.fixture
+def add_test_data(test_app):
+    with test_app.app_context():
+        now = datetime.now()
+        race = Race(
+            name="Spring Race",
+            description="Race with a bootstrap",
+            start_showing_checkpoints_at=now - timedelta(minutes=10),
+            end_showing_checkpoints_at=now + timedelta(minutes=10),
+            start_logging_at=now - timedelta(minutes=10),
+            end_logging_at=now + timedelta(minutes=10),
+        )
+        category = RaceCategory(name="Standard", description="Standard category")
+        admin = User(name="Admin", email="admin@example.com", is_administrator=True)
+        admin.set_password("password")
+        db.session.add_all([race, category, admin])
+        db.session.commit()
+
+        for index in (1, 2):
+            member = User(name=f"Member{index}", email=f"member{index}@example.com")
+            member.set_password("password")
+            team = Team(name=f"Team{index}")
+            team.members.append(member)
+            db.session.add(team)
+            db.session.commit()
+            db.session.add(Registration(race_id=race.id, team_id=team.id, race_category_id=category.id, payment_confirmed=True))
+        db.session.add_all([
+            Checkpoint(title="CP1", description="First", latitude=50.0, longitude=14.0, numOfPoints=2, race_id=race.id),
+            Checkpoint(title="CP2", description="Second", latitude=50.1, longitude=14.1, numOfPoints=3, race_id=race.id),
+            Task(title="T1", description="Task", numOfPoints=5, race_id=race.id),
+            RaceTranslation(race_id=race.id, language="cs", name="Jarni zavod"),
+        ])
+        db.session.flush()
+        db.session.add(CheckpointTranslation(checkpoint_id=1, language="cs", title="Kontrola"))
+        db.session.commit()
+        return {"race_id": race.id}
+
+
+def _headers(test_client, email):
+    response = test_client.post("/auth/login/", json={"email": email, "password": "password"})
+    return {"Authorization": f"Bearer {response.json['access_token']}"}
+
+
+def test_bootstrap_matches_individual_endpoints(test_client, add_test_data):
+    race_id = add_test_data["race_id"]
+    member = _headers(test_client, "member1@example.com")
+    test_client.post(f"/api/race/{race_id}/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=member)
+
+    response = test_client.get(f"/api/race/{race_id}/team/1/bootstrap/?lang=cs", headers=member)
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+    body = response.json
+    assert body["language"] == "cs"
+    assert body["race"] == test_client.get(f"/api/race/{race_id}/?lang=cs").json
+    assert body["race"]["name"] == "Jarni zavod"
+    assert body["checkpoints"] == test_client.get(f"/api/race/{race_id}/checkpoints/1/status/?lang=cs", headers=member).json
+    assert [(item["title"], item["visited"]) for item in body["checkpoints"]] == [("Kontrola", True), ("CP2", False)]
+    assert body["tasks"] == test_client.get(f"/api/race/{race_id}/tasks/1/status/?lang=cs", headers=member).json
+    results = test_client.get(f"/api/race/{race_id}/results/", headers=member).json
+    assert body["score"] == next(row for row in results if row["team_id"] == 1)
+    assert body["score"]["total_points"] == 2
+    assert set(body["etags"]) == {"race", "checkpoints", "tasks", "score"}
+
+    assert test_client.get(f"/api/race/{race_id}/team/2/bootstrap/", headers=member).status_code == 403
+    admin = _headers(test_client, "admin@example.com")
+    assert test_client.get(f"/api/race/{race_id}/team/2/bootstrap/", headers=admin).json["score"]["total_points"] == 0
+    assert test_client.get("/api/race/999/team/1/bootstrap/", headers=admin).status_code == 404
+
+
+def test_bootstrap_uses_fixed_number_of_queries(test_client, test_app, add_test_data, count_statements):
+    race_id = add_test_data["race_id"]
+    url = f"/api/race/{race_id}/team/1/bootstrap/?lang=cs"
+    member = _headers(test_client, "member1@example.com")
+    with count_statements() as few:
+        first = test_client.get(url, headers=member)
+
+    with count_statements() as statements:
+        not_modified = test_client.get(url, headers={**member, "If-None-Match": first.headers["ETag"]})
+    assert not_modified.status_code == 304
+    assert len(statements) <= 2
+
+    with test_app.app_context():
+        for index in range(10):
+            db.session.add_all([
+                Checkpoint(title=f"CP{index + 3}", latitude=50.0, longitude=14.0, numOfPoints=1, race_id=race_id),
+                Task(title=f"T{index + 2}", description="Task", numOfPoints=1, race_id=race_id),
+            ])
+        db.session.commit()
+    with count_statements() as many:
+        response = test_client.get(url, headers=member)
+    assert len(response.json["checkpoints"]) == 12
+    assert len(many) == len(few)
+
+
+def test_bootstrap_section_etags_follow_changes(test_client, add_test_data):
+    race_id = add_test_data["race_id"]
+    url = f"/api/race/{race_id}/team/1/bootstrap/"
+    member = _headers(test_client, "member1@example.com")
+    admin = _headers(test_client, "admin@example.com")
+    first = test_client.get(url, headers=member)
+
+    # another team's log changes the ranking, so only score-versioned sections change
+    other = _headers(test_client, "member2@example.com")
+    test_client.post(f"/api/race/{race_id}/tasks/log/", json={"task_id": 1, "team_id": 2}, headers=other)
+    second = test_client.get(url, headers={**member, "If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.json["etags"]["race"] == first.json["etags"]["race"]
+    assert second.json["etags"]["score"] != first.json["etags"]["score"]
+    assert second.json["score"]["rank"] == 2
+
+    assert test_client.put("/api/checkpoint/2/", json={"title": "Lake"}, headers=admin).status_code == 200
+    third = test_client.get(url, headers=member)
+    assert third.json["etags"]["checkpoints"] != second.json["etags"]["checkpoints"]
+    assert third.json["etags"]["score"] == second.json["etags"]["score"]
+    assert third.json["checkpoints"][1]["title"] == "Lake"
+
+    response = test_client.put(f"/api/race/{race_id}/", json={"description": "Renamed"}, headers=admin)
+    assert response.status_code == 200
+    fourth = test_client.get(url, headers={**member, "If-None-Match": third.headers["ETag"]})
+    assert fourth.status_code == 200
+    assert fourth.json["etags"]["race"] != third.json["etags"]["race"]
+    assert fourth.json["etags"]["checkpoints"] == third.json["etags"]["checkpoints"]
+    assert fourth.json["race"]["description"] == "Renamed"
+
+
+def test_bootstrap_score_rank_matches_results(test_client, test_app, add_test_data):
+    """The team's rank is computed on its own but agrees with the full results, ties included."""
+    race_id = add_test_data["race_id"]
+    admin = _headers(test_client, "admin@example.com")
+
+    def scores():
+        results = {row["team_id"]: row for row in test_client.get(f"/api/race/{race_id}/results/", headers=admin).json}
+        for team_id in (1, 2):
+            score = test_client.get(f"/api/race/{race_id}/team/{team_id}/bootstrap/", headers=admin).json["score"]
+            assert score == results[team_id]
+        return [results[team_id]["rank"] for team_id in (1, 2)]
+
+    assert scores() == [1, 1]
+    sync = {"team_id": 2, "items": [{"type": "checkpoint", "id": 1, "logged_at": (datetime.utcnow() - timedelta(minutes=5)).isoformat()}]}
+    assert test_client.post(f"/api/race/{race_id}/sync/", json=sync, headers=admin).status_code == 200
+    assert scores() == [2, 1]
+    test_client.post(f"/api/race/{race_id}/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=admin)
+    # equal points: the team that logged first stays ahead
+    assert scores() == [2, 1]
+    with test_app.app_context():
+        Registration.query.filter_by(race_id=race_id, team_id=2).update({Registration.disqualified: True})
+        Race.query.filter_by(id=race_id).update({Race.score_version: Race.score_version + 1})
+        db.session.commit()
+    assert scores() == [1, None]
@@ -0,0 +1,146 @@
+import pytest
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Checkpoint, Race, RaceCategory, Registration, Task, Team, User
+from app.services.catalog_service import CatalogCache
+
+
+@pytest.fixture
+def add_test_data(test_app):
+    with test_app.app_context():
+        now = datetime.now()
+        races = [
+            Race(
+                name=name,
+                description="Race with a catalog",
+                start_showing_checkpoints_at=now - timedelta(minutes=10),
+                end_showing_checkpoints_at=now + timedelta(minutes=10),
+                start_logging_at=now - timedelta(minutes=10),
+                end_logging_at=now + timedelta(minutes=10),
+            )
+            for name in ("Spring Race", "Autumn Race")
+        ]
+        category = RaceCategory(name="Standard", description="Standard category")
+        admin = User(name="Admin", email="admin@example.com", is_administrator=True)
+        admin.set_password("password")
+        member = User(name="Member", email="member@example.com")
+        member.set_password("password")
+        db.session.add_all(races + [category, admin, member])
+        db.session.commit()
+
+        team = Team(name="Team Alpha")
+        team.members.append(member)
+        db.session.add(team)
+        db.session.commit()
+        db.session.add(Registration(race_id=races[0].id, team_id=team.id, race_category_id=category.id, payment_confirmed=True))
+        for race in races:
+            db.session.add_all([
+                Checkpoint(title="CP1", description="First", latitude=50.0, longitude=14.0, numOfPoints=1, race_id=race.id),
+                Task(title="T1", description="Task", numOfPoints=5, race_id=race.id),
+            ])
+        db.session.commit()
+        return {"race_ids": [race.id for race in races]}
+
+
+def _headers(test_client, email):
+    response = test_client.post("/auth/login/", json={"email": email, "password": "password"})
+    return {"Authorization": f"Bearer {response.json['access_token']}"}
+
+
+def _catalog_statements(statements):
+    return [statement for statement in statements if "FROM checkpoint" in statement or "FROM task" in statement]
+
+
+@pytest.mark.parametrize("kind", ["checkpoints", "tasks"])
+def test_catalog_is_served_from_cache_with_etag(test_client, test_app, add_test_data, count_statements, kind):
+    race_id = add_test_data["race_ids"][0]
+    url = f"/api/race/{race_id}/{kind}/"
+    member = _headers(test_client, "member@example.com")
+
+    with count_statements() as statements:
+        first = test_client.get(url, headers=member)
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "no-cache"
+    assert _catalog_statements(statements)
+    etag = first.headers["ETag"]
+
+    with count_statements() as statements:
+        cached = test_client.get(url, headers=member)
+    assert cached.data == first.data
+    assert cached.headers["ETag"] == etag
+    assert _catalog_statements(statements) == []
+
+    response = test_client.get(url, headers={**member, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    # the resolved language is part of the key
+    czech = test_client.get(f"{url}?lang=cs", headers=member)
+    assert czech.headers["ETag"] != etag
+    assert len(test_app.extensions["catalog_cache"]) == 2
+
+
+def test_catalog_changes_invalidate_cached_lists(test_client, add_test_data):
+    race_id, other_race_id = add_test_data["race_ids"]
+    member = _headers(test_client, "member@example.com")
+    admin = _headers(test_client, "admin@example.com")
+    checkpoints_url = f"/api/race/{race_id}/checkpoints/"
+    tasks_url = f"/api/race/{race_id}/tasks/"
+
+    def etags():
+        return (
+            test_client.get(checkpoints_url, headers=member).headers["ETag"],
+            test_client.get(f"{checkpoints_url}?lang=cs", headers=member).headers["ETag"],
+            test_client.get(tasks_url, headers=member).headers["ETag"],
+        )
+
+    seen = {etags()}
+    assert test_client.put("/api/checkpoint/1/", json={"title": "Castle"}, headers=admin).status_code == 200
+    assert test_client.get(checkpoints_url, headers=member).json[0]["title"] == "Castle"
+    seen.add(etags())
+
+    response = test_client.post(
+        "/api/checkpoint/1/translations/", json={"language": "cs", "title": "Hrad"}, headers=admin,
+    )
+    assert response.status_code == 201
+    assert test_client.get(f"{checkpoints_url}?lang=cs", headers=member).json[0]["title"] == "Hrad"
+    seen.add(etags())
+
+    assert test_client.put("/api/checkpoint/1/translations/cs/", json={"title": "Zamek"}, headers=admin).status_code == 200
+    assert test_client.get(f"{checkpoints_url}?lang=cs", headers=member).json[0]["title"] == "Zamek"
+    seen.add(etags())
+
+    assert test_client.delete("/api/checkpoint/1/translations/cs/", headers=admin).status_code == 200
+    assert test_client.get(f"{checkpoints_url}?lang=cs", headers=member).json[0]["title"] == "Castle"
+    seen.add(etags())
+
+    response = test_client.post(tasks_url, json={"title": "T2", "description": "Second", "numOfPoints": 2}, headers=admin)
+    assert response.status_code == 201
+    assert [task["title"] for task in test_client.get(tasks_url, headers=member).json] == ["T1", "T2"]
+    seen.add(etags())
+
+    assert test_client.delete("/api/task/1/", headers=admin).status_code == 200
+    assert [task["title"] for task in test_client.get(tasks_url, headers=member).json] == ["T2"]
+    seen.add(etags())
+    assert len(seen) == 7
+
+    # changes to another race keep this race's lists cached
+    last = test_client.get(checkpoints_url, headers=member).headers["ETag"]
+    assert test_client.put("/api/checkpoint/2/", json={"title": "Lake"}, headers=admin).status_code == 200
+    response = test_client.get(checkpoints_url, headers={**member, "If-None-Match": last})
+    assert response.status_code == 304
+
+
+def test_catalog_cache_evicts_least_recently_used():
+    cache = CatalogCache(2)
+    cache.put((1, "tasks", "en", 0), b"[1]")
+    cache.put((2, "tasks", "en", 0), b"[2]")
+    assert cache.get((1, "tasks", "en", 0)) == b"[1]"
+    cache.put((3, "tasks", "en", 0), b"[3]")
+    assert cache.get((2, "tasks", "en", 0)) is None
+    assert len(cache) == 2
+
+    disabled = CatalogCache(0)
+    disabled.put((1, "tasks", "en", 0), b"[1]")
+    assert disabled.get((1, "tasks", "en", 0)) is None
@@ -0,0 +1,126 @@
+import pytest
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token, decode_token, verify_jwt_in_request
+from werkzeug.exceptions import NotFound
+
+from app import db
+from app.models import Race, RaceCategory, Registration, Team, User
+from app.routes.race_api.context import get_race_context
+
+
+@pytest.fixture
+def add_test_data(test_app):
+    with test_app.app_context():
+        now = datetime.now()
+        race = Race(
+            name="Context Race",
+            description="Race for context loading",
+            start_showing_checkpoints_at=now - timedelta(minutes=10),
+            end_showing_checkpoints_at=now + timedelta(minutes=10),
+            start_logging_at=now - timedelta(minutes=10),
+            end_logging_at=now + timedelta(minutes=10),
+        )
+        category = RaceCategory(name="Standard", description="Standard category")
+        user = User(name="Member", email="member@example.com", is_administrator=False)
+        user.set_password("password")
+        db.session.add_all([race, category, user])
+        db.session.commit()
+
+        team1 = Team(name="Team One")
+        team2 = Team(name="Team Two")
+        team1.members.append(user)
+        team2.members.append(user)
+        other_team = Team(name="Other Team")
+        db.session.add_all([team1, team2, other_team])
+        db.session.commit()
+
+        db.session.add_all([
+            Registration(race_id=race.id, team_id=team1.id, race_category_id=category.id, payment_confirmed=True),
+            Registration(race_id=race.id, team_id=team2.id, race_category_id=category.id, payment_confirmed=False),
+        ])
+        db.session.commit()
+        return {"race_id": race.id, "user_id": user.id, "team_ids": (team1.id, team2.id, other_team.id)}
+
+
+def _request_as(test_app, user_id):
+    with test_app.app_context():
+        token = create_access_token(identity=str(user_id), additional_claims={"is_administrator": False})
+    return test_app.test_request_context(headers={"Authorization": f"Bearer {token}"})
+
+
+def test_race_context_loads_everything_in_one_query(test_app, add_test_data, count_statements):
+    """User, race, memberships and registration come from a single memoized query."""
+    team1, team2, other_team = add_test_data["team_ids"]
+
+    with _request_as(test_app, add_test_data["user_id"]):
+        verify_jwt_in_request()
+        with count_statements() as statements:
+            context = get_race_context(add_test_data["race_id"], team1)
+            assert get_race_context(add_test_data["race_id"], team1) is context
+            assert context.race.name == "Context Race"
+            assert context.registration.team_id == team1
+            assert context.team_ids == {team1, team2}
+
+        assert len(statements) == 1
+        assert context.is_team_member(team2)
+        assert not context.can_access_team(other_team)
+        assert context.logging_open()
+
+
+def test_race_context_missing_rows(test_app, add_test_data):
+    """Unconfirmed registrations and unknown races are left to the caller to reject."""
+    _, team2, _ = add_test_data["team_ids"]
+
+    with _request_as(test_app, add_test_data["user_id"]):
+        verify_jwt_in_request()
+        context = get_race_context(add_test_data["race_id"], team2)
+        assert context.registration is None
+        with pytest.raises(NotFound):
+            context.registration_or_404()
+
+        with pytest.raises(NotFound):
+            get_race_context(999).race_or_404()
+
+    with _request_as(test_app, 999):
+        verify_jwt_in_request()
+        with pytest.raises(NotFound):
+            get_race_context(add_test_data["race_id"])
+
+
+def _login(test_client, email):
+    response = test_client.post("/auth/login/", json={"email": email, "password": "password"})
+    return response.json
+
+
+def test_access_token_carries_membership_claims(test_app, test_client, add_test_data):
+    """Login embeds team ids, confirmed (race, team) pairs and the membership version."""
+    team1, team2, _ = add_test_data["team_ids"]
+    login = _login(test_client, "member@example.com")
+
+    with test_app.app_context():
+        claims = decode_token(login["access_token"])
+    assert claims["teams"] == [team1, team2]
+    assert claims["race_teams"] == [[add_test_data["race_id"], team1]]
+    assert claims["membership_version"] == 0
+
+
+def test_stale_membership_claims_require_refresh(test_client, add_test_data, admin_auth_headers):
+    """A token issued before a team change gets 401 until it is refreshed."""
+    race_id = add_test_data["race_id"]
+    team1 = add_test_data["team_ids"][0]
+    login = _login(test_client, "member@example.com")
+    headers = {"Authorization": f"Bearer {login['access_token']}"}
+    status_url = f"/api/race/{race_id}/checkpoints/{team1}/status/"
+
+    assert test_client.get(status_url, headers=headers).status_code == 200
+
+    resp = test_client.delete(f"/api/team/{team1}/members/", headers=admin_auth_headers)
+    assert resp.status_code == 200
+
+    stale = test_client.get(status_url, headers=headers)
+    assert stale.status_code == 401
+    assert stale.json["code"] == "membership_stale"
+
+    refreshed = test_client.post("/auth/refresh/", headers={"Authorization": f"Bearer {login['refresh_token']}"})
+    headers = {"Authorization": f"Bearer {refreshed.json['access_token']}"}
+    assert test_client.get(status_url, headers=headers).status_code == 403
@@ -0,0 +1,166 @@
+import io
+import pytest
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Checkpoint, CheckpointLog, IdempotencyKey, Image, Race, RaceCategory, Registration, Task, TaskLog, Team, User
+from app.services.idempotency_service import ReplayCache, _claim, _request_fingerprint, purge_expired_idempotency_keys
+
+
+@pytest.fixture
+def add_test_data(test_app, tmp_path):
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    with test_app.app_context():
+        now = datetime.now()
+        race = Race(
+            name="Retry Race",
+            description="Race with flaky network",
+            start_showing_checkpoints_at=now - timedelta(minutes=30),
+            end_showing_checkpoints_at=now + timedelta(minutes=30),
+            start_logging_at=now - timedelta(minutes=30),
+            end_logging_at=now + timedelta(minutes=30),
+        )
+        category = RaceCategory(name="Standard", description="Standard category")
+        member = User(name="Member", email="member@example.com")
+        member.set_password("password")
+        db.session.add_all([race, category, member])
+        db.session.commit()
+
+        team = Team(name="Team Retry")
+        team.members.append(member)
+        db.session.add(team)
+        db.session.commit()
+
+        db.session.add_all([
+            Registration(race_id=race.id, team_id=team.id, race_category_id=category.id, payment_confirmed=True),
+            Checkpoint(title="CP1", latitude=50.0, longitude=14.0, numOfPoints=1, race_id=race.id),
+            Checkpoint(title="CP2", latitude=50.1, longitude=14.1, numOfPoints=2, race_id=race.id),
+            Task(title="T1", description="Task", numOfPoints=5, race_id=race.id),
+        ])
+        db.session.commit()
+        return {"race_id": race.id, "team_id": team.id}
+
+
+def _headers(test_client, key=None):
+    response = test_client.post("/auth/login/", json={"email": "member@example.com", "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+    if key:
+        headers["Idempotency-Key"] = key
+    return headers
+
+
+def _post_with_image(test_client, url, headers, fields):
+    with open("tests/test_image.jpg", "rb") as img:
+        data = dict(fields, image=(io.BytesIO(img.read()), "photo.jpg"))
+    return test_client.post(url, headers=headers, data=data, content_type="multipart/form-data")
+
+
+def test_retried_log_with_image_replays_original_response(test_client, test_app, add_test_data, tmp_path):
+    """A retry returns the first response without saving the image or logging again."""
+    race_id = add_test_data["race_id"]
+    url = f"/api/race/{race_id}/checkpoints/log/"
+    headers = _headers(test_client, "visit-1")
+    fields = {"checkpoint_id": 1, "team_id": add_test_data["team_id"]}
+
+    first = _post_with_image(test_client, url, headers, fields)
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+
+    retry = _post_with_image(test_client, url, headers, fields)
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json == first.json
+
+    # another worker without the in-memory entry replays from the database
+    test_app.extensions['idempotency_cache']._entries.clear()
+    retry = _post_with_image(test_client, url, headers, fields)
+    assert retry.status_code == 201
+    assert retry.json == first.json
+
+    with test_app.app_context():
+        assert Image.query.count() == 1
+        assert CheckpointLog.query.count() == 1
+        assert IdempotencyKey.query.one().status_code == 201
+    assert len([path for path in tmp_path.rglob("*") if path.is_file() and ".derived" not in path.parts]) == 1
+
+
+def test_idempotency_key_reuse_and_failed_requests(test_client, test_app, add_test_data):
+    """A different payload under a used key is rejected; failed requests release the key."""
+    race_id = add_test_data["race_id"]
+    team_id = add_test_data["team_id"]
+    url = f"/api/race/{race_id}/tasks/log/"
+    headers = _headers(test_client, "task-1")
+
+    assert test_client.post(url, headers=headers, json={"task_id": 1, "team_id": team_id}).status_code == 201
+    reused = test_client.post(url, headers=headers, json={"task_id": 1, "team_id": team_id, "note": "x"})
+    assert reused.status_code == 422
+
+    # the same key on another endpoint is a different request
+    cp_url = f"/api/race/{race_id}/checkpoints/log/"
+    missing = test_client.post(cp_url, headers=headers, json={"checkpoint_id": 99, "team_id": team_id})
+    assert missing.status_code == 404
+    with test_app.app_context():
+        assert IdempotencyKey.query.count() == 1
+
+    # the released key runs the handler again instead of reporting "in progress"
+    retried = test_client.post(cp_url, headers=headers, json={"checkpoint_id": 99, "team_id": team_id})
+    assert retried.status_code == 404
+
+    with test_app.app_context():
+        assert TaskLog.query.count() == 1
+        assert CheckpointLog.query.count() == 0
+
+
+def test_replay_cache_eviction_and_purge(test_app, add_test_data):
+    """The memory tier is bounded and drops expired entries; purge removes expired rows."""
+    now = datetime.utcnow()
+    cache = ReplayCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, {"expires_at": now + timedelta(minutes=1)})
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    cache.put("d", {"expires_at": now - timedelta(seconds=1)})
+    assert cache.get("d") is None
+
+    with test_app.app_context():
+        db.session.add_all([
+            IdempotencyKey(user_id=1, scope="POST /x", key="old", fingerprint="f", expires_at=now - timedelta(hours=1)),
+            IdempotencyKey(user_id=1, scope="POST /x", key="new", fingerprint="f", expires_at=now + timedelta(hours=1)),
+        ])
+        db.session.commit()
+        assert purge_expired_idempotency_keys() == 1
+        db.session.commit()
+        assert [row.key for row in IdempotencyKey.query] == ["new"]
+
+
+def test_abandoned_claim_is_taken_over_after_lease(test_client, test_app, add_test_data):
+    """A claim left behind by a killed worker blocks retries only until its lease ends."""
+    race_id = add_test_data["race_id"]
+    team_id = add_test_data["team_id"]
+    url = f"/api/race/{race_id}/tasks/log/"
+    headers = _headers(test_client, "task-abandoned")
+    payload = {"task_id": 1, "team_id": team_id}
+    lease = timedelta(seconds=test_app.config["IDEMPOTENCY_CLAIM_LEASE_SECONDS"])
+    # the worker claims the key and is killed before it stores or releases it
+    with test_app.test_request_context(url, method="POST", json=payload):
+        user_id = User.query.filter_by(email="member@example.com").one().id
+        claim_id, _ = _claim(user_id, f"POST {url}", "task-abandoned", _request_fingerprint())
+        assert claim_id is not None
+
+    in_progress = test_client.post(url, headers=headers, json=payload)
+    assert in_progress.status_code == 409
+
+    # the lease runs out
+    with test_app.app_context():
+        claim = db.session.get(IdempotencyKey, claim_id)
+        claim.expires_at -= lease
+        db.session.commit()
+    taken_over = test_client.post(url, headers=headers, json=payload)
+    assert taken_over.status_code == 201
+
+    with test_app.app_context():
+        row = IdempotencyKey.query.one()
+        assert row.status_code == 201
+        # the stored response is kept for the full TTL, not the lease
+        assert row.expires_at > datetime.utcnow() + timedelta(hours=1)
+        assert TaskLog.query.count() == 1
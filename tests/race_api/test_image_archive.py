@@ -0,0 +1,198 @@
+import io
+import zipfile
+import pytest
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Checkpoint, CheckpointLog, Image, ImageBlob, Race, RaceCategory, Registration, Task, TaskLog, Team, User
+
+
+@pytest.fixture
+def add_test_data(test_app, tmp_path):
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    with test_app.app_context():
+        now = datetime.now()
+        races = [
+            Race(
+                name=name,
+                description="Race with photos",
+                start_showing_checkpoints_at=now - timedelta(minutes=30),
+                end_showing_checkpoints_at=now + timedelta(minutes=30),
+                start_logging_at=now - timedelta(minutes=30),
+                end_logging_at=now + timedelta(minutes=30),
+            )
+            for name in ("Spring Race", "Autumn Race")
+        ]
+        category = RaceCategory(name="Standard", description="Standard category")
+        admin = User(name="Admin", email="admin@example.com", is_administrator=True)
+        admin.set_password("password")
+        db.session.add_all(races + [category, admin])
+        db.session.commit()
+
+        for index in (1, 2):
+            member = User(name=f"Member{index}", email=f"member{index}@example.com")
+            member.set_password("password")
+            team = Team(name=f"Team{index}")
+            team.members.append(member)
+            db.session.add(team)
+            db.session.commit()
+            for race in races:
+                db.session.add(Registration(race_id=race.id, team_id=team.id, race_category_id=category.id, payment_confirmed=True))
+        for race in races:
+            db.session.add_all([
+                Checkpoint(title="CP1", latitude=50.0, longitude=14.0, numOfPoints=1, race_id=race.id),
+                Checkpoint(title="CP2", latitude=50.1, longitude=14.1, numOfPoints=1, race_id=race.id),
+                Task(title="T1", description="Task", numOfPoints=5, race_id=race.id),
+            ])
+        db.session.commit()
+        return {"race_ids": [race.id for race in races]}
+
+
+def _photo(color):
+    from PIL import Image as PILImage
+
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (64, 48), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def _log(test_client, race_id, team_index, kind, item_id, photo):
+    response = test_client.post("/auth/login/", json={"email": f"member{team_index}@example.com", "password": "password"})
+    field = "checkpoint_id" if kind == "checkpoints" else "task_id"
+    response = test_client.post(
+        f"/api/race/{race_id}/{kind}/log/",
+        headers={"Authorization": f"Bearer {response.json['access_token']}"},
+        data={"image": (io.BytesIO(photo), "photo.jpg"), field: item_id, "team_id": team_index},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 201
+
+
+def _admin(test_client):
+    response = test_client.post("/auth/login/", json={"email": "admin@example.com", "password": "password"})
+    return {"Authorization": f"Bearer {response.json['access_token']}"}
+
+
+def test_race_photo_archive_and_purge(test_client, test_app, add_test_data, count_statements, tmp_path):
+    race_id, other_race_id = add_test_data["race_ids"]
+    shared, own = _photo("red"), _photo("blue")
+    _log(test_client, race_id, 1, "checkpoints", 1, shared)
+    _log(test_client, race_id, 2, "checkpoints", 1, shared)
+    _log(test_client, race_id, 1, "tasks", 1, own)
+    # the same photo is also used by another race (checkpoint 4 belongs to it)
+    _log(test_client, other_race_id, 1, "checkpoints", 4, shared)
+    (tmp_path / "legacy.jpg").write_bytes(b"old upload")
+    with test_app.app_context():
+        image = Image(filename="legacy.jpg")
+        db.session.add(image)
+        db.session.flush()
+        db.session.add(CheckpointLog(checkpoint_id=2, team_id=2, race_id=race_id, image_id=image.id))
+        db.session.commit()
+
+    admin = _admin(test_client)
+    response = test_client.get(f"/api/race/{race_id}/images/archive/", headers=admin)
+    assert response.status_code == 200
+    assert response.mimetype == "application/zip"
+    assert response.headers["Content-Disposition"] == f'attachment; filename="race-{race_id}-photos.zip"'
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.testzip() is None
+        assert sorted(archive.namelist()) == [
+            "checkpoints/1/team-1.jpg", "checkpoints/1/team-2.jpg", "checkpoints/2/team-2.jpg", "tasks/1/team-1.jpg",
+        ]
+        assert archive.read("checkpoints/1/team-2.jpg") == shared
+        assert archive.read("tasks/1/team-1.jpg") == own
+        assert archive.read("checkpoints/2/team-2.jpg") == b"old upload"
+
+    url = f"/api/race/{race_id}/images/"
+    assert test_client.delete(url, headers=admin).status_code == 409
+    with test_app.app_context():
+        db.session.get(Race, race_id).end_logging_at = datetime.now() - timedelta(minutes=1)
+        db.session.commit()
+    member = test_client.post("/auth/login/", json={"email": "member1@example.com", "password": "password"})
+    assert test_client.delete(url, headers={"Authorization": f"Bearer {member.json['access_token']}"}).status_code == 403
+
+    member_headers = {"Authorization": f"Bearer {member.json['access_token']}"}
+    results_etag = test_client.get(f"/api/race/{race_id}/results/", headers=admin).headers["ETag"]
+    status_url = f"/api/race/{race_id}/checkpoints/1/status/"
+    status_etag = test_client.get(status_url, headers=member_headers).headers["ETag"]
+    bootstrap_etag = test_client.get(f"/api/race/{race_id}/team/1/bootstrap/", headers=member_headers).headers["ETag"]
+
+    with count_statements() as statements:
+        response = test_client.delete(url, headers=admin)
+    assert response.status_code == 200
+    assert response.json == {"images_removed": 4, "blobs_removed": 1, "bytes_freed": len(own)}
+    # unreferenced blobs go in one statement per chunk
+    assert len([statement for statement in statements if statement.startswith("DELETE FROM image_blob")]) == 1
+
+    # scores did not change, but what the team's logs show did
+    results = test_client.get(f"/api/race/{race_id}/results/", headers={**admin, "If-None-Match": results_etag})
+    assert results.status_code == 304
+    status = test_client.get(status_url, headers={**member_headers, "If-None-Match": status_etag})
+    assert status.status_code == 200
+    assert all("image_filename" not in item for item in status.json)
+    bootstrap = test_client.get(f"/api/race/{race_id}/team/1/bootstrap/", headers={**member_headers, "If-None-Match": bootstrap_etag})
+    assert bootstrap.status_code == 200
+    assert not (tmp_path / "legacy.jpg").exists()
+    with test_app.app_context():
+        assert CheckpointLog.query.filter_by(race_id=race_id).count() == 3
+        assert CheckpointLog.query.filter(CheckpointLog.race_id == race_id, CheckpointLog.image_id.isnot(None)).count() == 0
+        assert TaskLog.query.one().image_id is None
+        blob = ImageBlob.query.one()
+        assert blob.ref_count == 1
+        assert (tmp_path / blob.path).read_bytes() == shared
+        assert [image.filename for image in Image.query] == [blob.path]
+
+    archive = test_client.get(f"/api/race/{race_id}/images/archive/", headers=admin)
+    assert zipfile.ZipFile(io.BytesIO(archive.data)).namelist() == []
+
+
+def test_images_migrate_legacy_command_moves_flat_files(test_app, add_test_data, tmp_path):
+    photo = _photo("green")
+    (tmp_path / "20240101_abc.JPEG").write_bytes(photo)
+    with test_app.app_context():
+        db.session.add_all([Image(filename="20240101_abc.JPEG"), Image(filename="gone.jpg")])
+        db.session.commit()
+
+    result = test_app.test_cli_runner().invoke(args=["images", "migrate-legacy"])
+    assert result.exit_code == 0, result.output
+    assert "Moved 1 images into blob storage (1 missing, 0 failed)" in result.output
+    with test_app.app_context():
+        image = Image.query.filter(Image.blob_id.isnot(None)).one()
+        assert image.filename.endswith(".jpg")
+        assert ImageBlob.query.one().ref_count == 1
+    assert not (tmp_path / "20240101_abc.JPEG").exists()
+    assert (tmp_path / image.filename).read_bytes() == photo
+    assert (tmp_path / ".derived" / "thumb" / f"{image.filename[:-4]}.webp").is_file()
+
+
+def test_images_migrate_legacy_refreshes_team_status_lists(test_client, test_app, add_test_data, tmp_path):
+    """Cached status lists and delta polls see the adopted image's new filename."""
+    race_id = add_test_data["race_ids"][0]
+    (tmp_path / "legacy.jpg").write_bytes(_photo("blue"))
+    hour_ago = datetime.utcnow() - timedelta(hours=1)
+    with test_app.app_context():
+        image = Image(filename="legacy.jpg")
+        db.session.add(image)
+        db.session.flush()
+        db.session.add(CheckpointLog(checkpoint_id=1, team_id=1, race_id=race_id, image_id=image.id, updated_at=hour_ago))
+        Checkpoint.query.update({Checkpoint.updated_at: hour_ago}, synchronize_session=False)
+        db.session.commit()
+    response = test_client.post("/auth/login/", json={"email": "member1@example.com", "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+    url = f"/api/race/{race_id}/checkpoints/1/status/"
+    before = test_client.get(url, headers=headers)
+    assert before.json[0]["image_filename"] == "legacy.jpg"
+    results_etag = test_client.get(f"/api/race/{race_id}/results/", headers=headers).headers["ETag"]
+    assert test_client.get(url, headers={**headers, "If-None-Match": before.headers["ETag"]}).status_code == 304
+
+    result = test_app.test_cli_runner().invoke(args=["images", "migrate-legacy"])
+    assert result.exit_code == 0, result.output
+
+    after = test_client.get(url, headers={**headers, "If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.json[0]["image_filename"] != "legacy.jpg"
+    # moving a file changes no score
+    assert test_client.get(f"/api/race/{race_id}/results/", headers={**headers, "If-None-Match": results_etag}).status_code == 304
+    delta = test_client.get(url, headers=headers, query_string={"since": before.headers["Sync-Cursor"]}).json
+    assert [item["id"] for item in delta["items"]] == [1]
+    assert delta["items"][0]["image_filename"] == after.json[0]["image_filename"]
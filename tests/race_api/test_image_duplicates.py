@@ -0,0 +1,140 @@
+import io
+import random
+import pytest
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Checkpoint, Image, Race, RaceCategory, Registration, Team, User
+from app.services.image_similarity import BKTree, hamming_distance
+
+
+@pytest.fixture
+def add_test_data(test_app, tmp_path):
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    with test_app.app_context():
+        now = datetime.now()
+        race = Race(
+            name="Photo Race",
+            description="Race with shared photos",
+            start_showing_checkpoints_at=now - timedelta(minutes=30),
+            end_showing_checkpoints_at=now + timedelta(minutes=30),
+            start_logging_at=now - timedelta(minutes=30),
+            end_logging_at=now + timedelta(minutes=30),
+        )
+        category = RaceCategory(name="Standard", description="Standard category")
+        admin = User(name="Admin", email="admin@example.com", is_administrator=True)
+        admin.set_password("password")
+        db.session.add_all([race, category, admin])
+        db.session.commit()
+
+        for index in range(1, 4):
+            member = User(name=f"Member{index}", email=f"member{index}@example.com")
+            member.set_password("password")
+            team = Team(name=f"Team{index}")
+            team.members.append(member)
+            db.session.add(team)
+            db.session.commit()
+            db.session.add(Registration(race_id=race.id, team_id=team.id, race_category_id=category.id, payment_confirmed=True))
+        db.session.add_all([
+            Checkpoint(title="CP1", latitude=50.0, longitude=14.0, numOfPoints=1, race_id=race.id),
+            Checkpoint(title="CP2", latitude=50.1, longitude=14.1, numOfPoints=1, race_id=race.id),
+        ])
+        db.session.commit()
+        return {"race_id": race.id}
+
+
+def _headers(test_client, email):
+    response = test_client.post("/auth/login/", json={"email": email, "password": "password"})
+    return {"Authorization": f"Bearer {response.json['access_token']}"}
+
+
+def _photo(variant, size=(640, 480), quality=90):
+    from PIL import Image as PILImage
+    from PIL import ImageDraw
+
+    picture = PILImage.new("RGB", (640, 480), "white")
+    draw = ImageDraw.Draw(picture)
+    if variant == "castle":
+        draw.rectangle((100, 150, 540, 460), fill="gray")
+        draw.polygon([(80, 150), (320, 20), (560, 150)], fill="darkred")
+    else:
+        draw.ellipse((40, 40, 300, 300), fill="navy")
+        draw.rectangle((380, 260, 620, 470), fill="orange")
+    buffer = io.BytesIO()
+    picture.resize(size).save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def _log(test_client, race_id, team_index, checkpoint_id, photo):
+    response = test_client.post(
+        f"/api/race/{race_id}/checkpoints/log/",
+        headers=_headers(test_client, f"member{team_index}@example.com"),
+        data={"image": (io.BytesIO(photo), "photo.jpg"), "checkpoint_id": checkpoint_id, "team_id": team_index},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 201
+    return response
+
+
+def test_duplicate_photos_across_teams_are_reported(test_client, test_app, add_test_data):
+    race_id = add_test_data["race_id"]
+    castle = _photo("castle")
+    _log(test_client, race_id, 1, 1, castle)
+    # the same shot, shared and re-saved smaller by another team
+    _log(test_client, race_id, 2, 1, _photo("castle", size=(480, 360), quality=60))
+    _log(test_client, race_id, 3, 1, _photo("lake"))
+    # same photo at another checkpoint: compared per checkpoint only
+    _log(test_client, race_id, 3, 2, castle)
+
+    with test_app.app_context():
+        assert Image.query.filter(Image.phash.is_(None)).count() == 0
+
+    url = f"/api/race/{race_id}/images/duplicates/"
+    admin = _headers(test_client, "admin@example.com")
+    response = test_client.get(url, headers=admin)
+    assert response.status_code == 200
+    pairs = response.json["pairs"]
+    assert response.json["max_distance"] == test_app.config['IMAGE_DUPLICATE_MAX_DISTANCE']
+    assert len(pairs) == 1
+    assert pairs[0]["checkpoint_id"] == 1
+    assert pairs[0]["distance"] <= test_app.config['IMAGE_DUPLICATE_MAX_DISTANCE']
+    assert [photo["team_id"] for photo in pairs[0]["photos"]] == [1, 2]
+
+    loose = test_client.get(f"{url}?max_distance=64", headers=admin).json["pairs"]
+    assert [pair["checkpoint_id"] for pair in loose] == [1, 1, 1]
+    assert test_client.get(f"{url}?max_distance=65", headers=admin).status_code == 400
+    assert test_client.get(f"{url}?max_distance=x", headers=admin).status_code == 400
+    assert test_client.get(url, headers=_headers(test_client, "member1@example.com")).status_code == 403
+    assert test_client.get("/api/race/999/images/duplicates/", headers=admin).status_code == 404
+
+
+def test_images_phash_command_backfills_missing_hashes(test_client, test_app, add_test_data):
+    _log(test_client, add_test_data["race_id"], 1, 1, _photo("castle"))
+    with test_app.app_context():
+        image = Image.query.one()
+        expected = image.phash
+        image.phash = None
+        db.session.commit()
+
+    result = test_app.test_cli_runner().invoke(args=["images", "phash"])
+    assert result.exit_code == 0, result.output
+    assert "Hashed 1 images (0 failed)" in result.output
+    with test_app.app_context():
+        assert Image.query.one().phash == expected
+
+
+def test_bk_tree_search_matches_brute_force():
+    rng = random.Random(7)
+    hashes = [rng.getrandbits(64) - (1 << 63) for _ in range(500)]
+    # near copies of some hashes
+    hashes += [value ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)) for value in hashes[:50]]
+    tree = BKTree()
+    for index, value in enumerate(hashes):
+        tree.add(value, index)
+
+    for query in hashes[:20] + [rng.getrandbits(64) for _ in range(5)]:
+        expected = sorted(
+            (hamming_distance(query, value), index) for index, value in enumerate(hashes)
+            if hamming_distance(query, value) <= 12
+        )
+        assert sorted(tree.search(query, 12)) == expected
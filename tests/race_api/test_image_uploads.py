@@ -0,0 +1,199 @@
+import hashlib
+import io
+import boto3
+import moto
+import pytest
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Checkpoint, CheckpointLog, Image, ImageBlob, Race, RaceCategory, Registration, Task, Team, User
+from app.services.image_storage import LocalImageStorage, S3ImageStorage
+from app.services.image_store import sweep_unreferenced_blobs
+
+
+@pytest.fixture
+def add_test_data(test_app, tmp_path):
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    with test_app.app_context():
+        now = datetime.now()
+        race = Race(
+            name="Upload Race",
+            description="Race with direct uploads",
+            start_showing_checkpoints_at=now - timedelta(minutes=30),
+            end_showing_checkpoints_at=now + timedelta(minutes=30),
+            start_logging_at=now - timedelta(minutes=30),
+            end_logging_at=now + timedelta(minutes=30),
+        )
+        category = RaceCategory(name="Standard", description="Standard category")
+        member = User(name="Member", email="member@example.com")
+        member.set_password("password")
+        outsider = User(name="Outsider", email="outsider@example.com")
+        outsider.set_password("password")
+        db.session.add_all([race, category, member, outsider])
+        db.session.commit()
+
+        team = Team(name="Team Upload")
+        team.members.append(member)
+        db.session.add(team)
+        db.session.commit()
+
+        db.session.add_all([
+            Registration(race_id=race.id, team_id=team.id, race_category_id=category.id, payment_confirmed=True),
+            Checkpoint(title="CP1", latitude=50.0, longitude=14.0, numOfPoints=1, race_id=race.id),
+            Task(title="T1", description="Task", numOfPoints=5, race_id=race.id),
+        ])
+        db.session.commit()
+        return {"race_id": race.id, "team_id": team.id}
+
+
+def _headers(test_client, email="member@example.com"):
+    response = test_client.post("/auth/login/", json={"email": email, "password": "password"})
+    return {"Authorization": f"Bearer {response.json['access_token']}"}
+
+
+def _gps_photo():
+    from PIL import Image as PILImage
+
+    exif = PILImage.Exif()
+    exif[0x8825] = {1: 'N', 2: (50.0, 0.0, 0.0), 3: 'E', 4: (14.0, 0.0, 0.0)}
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (64, 48), "green").save(buffer, "JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+def _upload_url(test_client, race_id, team_id, photo, headers):
+    return test_client.post(
+        f"/api/race/{race_id}/images/upload-url/",
+        headers=headers,
+        json={"team_id": team_id, "sha256": hashlib.sha256(photo).hexdigest(), "content_type": "image/jpeg"},
+    )
+
+
+def test_presigned_upload_to_local_storage_then_log_by_key(test_client, test_app, add_test_data, tmp_path):
+    """The photo is PUT to the signed URL; the log request only carries its key."""
+    race_id = add_test_data["race_id"]
+    team_id = add_test_data["team_id"]
+    headers = _headers(test_client)
+    photo = _gps_photo()
+
+    issued = _upload_url(test_client, race_id, team_id, photo, headers)
+    assert issued.status_code == 200
+    key = issued.json["key"]
+    upload = issued.json["upload"]
+    assert upload["method"] == "PUT"
+    assert upload["expires_in"] == test_app.config['IMAGE_UPLOAD_URL_EXPIRES_SECONDS']
+
+    upload_path = upload["url"].replace("http://localhost", "")
+    tampered = test_client.put(upload_path, data=photo + b"x", headers=upload["headers"])
+    assert tampered.status_code == 400
+    assert test_client.put(upload_path + "x", data=photo, headers=upload["headers"]).status_code == 403
+    assert test_client.put(upload_path, data=photo, headers=upload["headers"]).status_code == 200
+    assert (tmp_path / key).read_bytes() == photo
+
+    logged = test_client.post(
+        f"/api/race/{race_id}/checkpoints/log/", headers=headers, json={"checkpoint_id": 1, "team_id": team_id, "image_key": key}
+    )
+    assert logged.status_code == 201
+    # TestConfig processes images inline: the ingest fills the GPS position
+    assert logged.json["image_status"] == "ready"
+    with test_app.app_context():
+        log = CheckpointLog.query.one()
+        assert (log.image_latitude, log.image_longitude) == (50.0, 14.0)
+        assert log.image_distance_km == pytest.approx(0.0, abs=0.001)
+        assert ImageBlob.query.one().ref_count == 1
+
+    # stored content needs no second upload
+    again = _upload_url(test_client, race_id, team_id, photo, headers)
+    assert again.json == {"key": key, "upload": None}
+    logged = test_client.post(
+        f"/api/race/{race_id}/tasks/log/", headers=headers, json={"task_id": 1, "team_id": team_id, "image_key": key}
+    )
+    assert logged.status_code == 201
+    with test_app.app_context():
+        assert ImageBlob.query.one().ref_count == 2
+
+
+def test_log_by_key_rejects_unknown_and_mismatched_uploads(test_client, test_app, add_test_data, tmp_path):
+    race_id = add_test_data["race_id"]
+    team_id = add_test_data["team_id"]
+    headers = _headers(test_client)
+    url = f"/api/race/{race_id}/checkpoints/log/"
+
+    missing_key = "ab/cd/abcd" + "0" * 60 + ".jpg"
+    assert test_client.post(url, headers=headers, json={"checkpoint_id": 1, "team_id": team_id, "image_key": missing_key}).status_code == 400
+    assert test_client.post(url, headers=headers, json={"checkpoint_id": 1, "team_id": team_id, "image_key": "../app.db"}).status_code == 400
+
+    # bytes that do not hash to the key are caught by the ingest
+    (tmp_path / "ab" / "cd").mkdir(parents=True)
+    (tmp_path / missing_key).write_bytes(_gps_photo())
+    logged = test_client.post(url, headers=headers, json={"checkpoint_id": 1, "team_id": team_id, "image_key": missing_key})
+    assert logged.status_code == 201
+    assert logged.json["image_status"] == "failed"
+    with test_app.app_context():
+        assert CheckpointLog.query.one().image_latitude is None
+
+    denied = _upload_url(test_client, race_id, team_id, b"photo", _headers(test_client, "outsider@example.com"))
+    assert denied.status_code == 403
+    invalid = test_client.post(
+        f"/api/race/{race_id}/images/upload-url/", headers=headers, json={"team_id": team_id, "sha256": "xyz", "content_type": "text/html"}
+    )
+    assert invalid.status_code == 400
+    assert set(invalid.json["errors"]) == {"sha256", "content_type"}
+
+
+def test_s3_storage_backend_with_fake_bucket(test_client, test_app, add_test_data, monkeypatch):
+    """Uploads, derivatives, serving and the sweep go through the bucket."""
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    race_id = add_test_data["race_id"]
+    team_id = add_test_data["team_id"]
+    headers = _headers(test_client)
+
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="photos")
+        test_app.extensions['image_storage'] = S3ImageStorage("photos", prefix="race", client=client)
+        try:
+            with open("tests/test_image.jpg", "rb") as img:
+                photo = img.read()
+            logged = test_client.post(
+                f"/api/race/{race_id}/checkpoints/log/",
+                headers=headers,
+                data={"image": (io.BytesIO(photo), "photo.jpg"), "checkpoint_id": 1, "team_id": team_id},
+                content_type="multipart/form-data",
+            )
+            assert logged.status_code == 201
+            assert logged.json["image_status"] == "ready"
+
+            with test_app.app_context():
+                key = Image.query.one().filename
+            stored = client.get_object(Bucket="photos", Key=f"race/{key}")
+            assert stored["Body"].read() == photo
+            assert stored["ContentType"] == "image/jpeg"
+            objects = {item["Key"] for item in client.list_objects_v2(Bucket="photos")["Contents"]}
+            assert f"race/.derived/thumb/{key.rsplit('.', 1)[0]}.webp" in objects
+
+            served = test_client.get(f"/static/images/{key}")
+            assert served.status_code == 302
+            assert f"/race/{key}?" in served.headers["Location"]
+            thumb = test_client.get(f"/static/images/{key}?size=thumb")
+            assert thumb.status_code == 302
+
+            issued = _upload_url(test_client, race_id, team_id, photo, headers)
+            assert issued.json == {"key": key, "upload": None}
+            other = _gps_photo()
+            issued = _upload_url(test_client, race_id, team_id, other, headers)
+            assert issued.json["upload"]["headers"]["x-amz-checksum-sha256"]
+            assert "Signature=" in issued.json["upload"]["url"]
+
+            unlogged = test_client.delete(
+                f"/api/race/{race_id}/checkpoints/log/", headers=headers, json={"checkpoint_id": 1, "team_id": team_id}
+            )
+            assert unlogged.status_code == 200
+            with test_app.app_context():
+                assert sweep_unreferenced_blobs(grace_seconds=0, now=datetime.utcnow() + timedelta(seconds=1)) == (1, len(photo))
+            assert client.list_objects_v2(Bucket="photos").get("KeyCount") == 0
+        finally:
+            test_app.extensions['image_storage'] = LocalImageStorage()
@@ -0,0 +1,192 @@
+import pytest
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import (
+    Checkpoint,
+    CheckpointLog,
+    CheckpointTranslation,
+    Race,
+    RaceCategory,
+    Registration,
+    SyncTombstone,
+    Task,
+    TaskLog,
+    TaskTranslation,
+    Team,
+    User,
+)
+
+
+@pytest.fixture
+def add_test_data(test_app):
+    with test_app.app_context():
+        now = datetime.now()
+        race = Race(
+            name="Long Race",
+            description="Race polled for changes",
+            start_showing_checkpoints_at=now - timedelta(minutes=10),
+            end_showing_checkpoints_at=now + timedelta(minutes=10),
+            start_logging_at=now - timedelta(minutes=10),
+            end_logging_at=now + timedelta(minutes=10),
+        )
+        category = RaceCategory(name="Standard", description="Standard category")
+        admin = User(name="Admin", email="admin@example.com", is_administrator=True)
+        admin.set_password("password")
+        db.session.add_all([race, category, admin])
+        db.session.commit()
+
+        for index in (1, 2):
+            member = User(name=f"Member{index}", email=f"member{index}@example.com")
+            member.set_password("password")
+            team = Team(name=f"Team{index}")
+            team.members.append(member)
+            db.session.add(team)
+            db.session.commit()
+            db.session.add(Registration(race_id=race.id, team_id=team.id, race_category_id=category.id, payment_confirmed=True))
+        db.session.add_all([
+            Checkpoint(title=f"CP{index}", latitude=50.0, longitude=14.0, numOfPoints=1, race_id=race.id)
+            for index in range(1, 4)
+        ] + [
+            Task(title=f"T{index}", description="Task", numOfPoints=2, race_id=race.id)
+            for index in range(1, 3)
+        ])
+        db.session.flush()
+        db.session.add_all([
+            CheckpointTranslation(checkpoint_id=3, language="cs", title="Kontrola 3"),
+            CheckpointTranslation(checkpoint_id=3, language="de", title="Posten 3"),
+            TaskTranslation(task_id=1, language="cs", title="Ukol 1"),
+        ])
+        db.session.commit()
+        return {"race_id": race.id}
+
+
+def _age_rows(test_app):
+    """Move every change an hour into the past, as if the last poll happened long ago."""
+    hour_ago = datetime.utcnow() - timedelta(hours=1)
+    with test_app.app_context():
+        for model in (Checkpoint, Task, CheckpointTranslation, TaskTranslation, CheckpointLog, TaskLog):
+            model.query.update({model.updated_at: hour_ago}, synchronize_session=False)
+        SyncTombstone.query.update({SyncTombstone.deleted_at: hour_ago}, synchronize_session=False)
+        db.session.commit()
+
+
+def _headers(test_client, email):
+    response = test_client.post("/auth/login/", json={"email": email, "password": "password"})
+    return {"Authorization": f"Bearer {response.json['access_token']}"}
+
+
+def _poll(test_client, url, headers, since):
+    response = test_client.get(url, headers=headers, query_string={"lang": "cs", "since": since})
+    assert response.status_code == 200
+    assert response.headers["Sync-Cursor"] == response.json["cursor"]
+    return response.json
+
+
+def test_checkpoint_status_delta(test_client, test_app, add_test_data):
+    race_id = add_test_data["race_id"]
+    url = f"/api/race/{race_id}/checkpoints/1/status/"
+    member = _headers(test_client, "member1@example.com")
+    admin = _headers(test_client, "admin@example.com")
+    _age_rows(test_app)
+
+    full = test_client.get(url, headers=member, query_string={"lang": "cs"})
+    assert len(full.json) == 3
+    cursor = full.headers["Sync-Cursor"]
+    assert _poll(test_client, url, member, cursor)["items"] == []
+
+    test_client.post(f"/api/race/{race_id}/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=member)
+    # another team's visit and a translation in another language are not this poll's changes
+    other = _headers(test_client, "member2@example.com")
+    test_client.post(f"/api/race/{race_id}/checkpoints/log/", json={"checkpoint_id": 2, "team_id": 2}, headers=other)
+    test_client.put("/api/checkpoint/3/translations/de/", json={"title": "Station 3"}, headers=admin)
+    delta = _poll(test_client, url, member, cursor)
+    assert [(item["id"], item["visited"]) for item in delta["items"]] == [(1, True)]
+    assert delta["deleted"] == []
+
+    _age_rows(test_app)
+    cursor = delta["cursor"]
+    test_client.delete(f"/api/race/{race_id}/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=member)
+    test_client.delete("/api/checkpoint/3/translations/cs/", headers=admin)
+    assert test_client.delete("/api/checkpoint/2/", headers=admin).status_code == 200
+    delta = _poll(test_client, url, member, cursor)
+    assert [(item["id"], item["title"], item["visited"]) for item in delta["items"]] == [(1, "CP1", False), (3, "CP3", False)]
+    assert delta["deleted"] == [2]
+
+    _age_rows(test_app)
+    cursor = delta["cursor"]
+    test_client.put("/api/checkpoint/3/", json={"numOfPoints": 4}, headers=admin)
+    delta = _poll(test_client, url, member, cursor)
+    assert [(item["id"], item["numOfPoints"]) for item in delta["items"]] == [(3, 4)]
+
+    response = test_client.get(url, headers=member, query_string={"since": "yesterday"})
+    assert response.status_code == 400
+
+
+def test_task_status_delta(test_client, test_app, add_test_data):
+    race_id = add_test_data["race_id"]
+    url = f"/api/race/{race_id}/tasks/1/status/"
+    member = _headers(test_client, "member1@example.com")
+    admin = _headers(test_client, "admin@example.com")
+    _age_rows(test_app)
+
+    cursor = test_client.get(url, headers=member).headers["Sync-Cursor"]
+    test_client.post(f"/api/race/{race_id}/tasks/log/", json={"task_id": 2, "team_id": 1}, headers=member)
+    test_client.put("/api/task/1/translations/cs/", json={"title": "Prvni ukol"}, headers=admin)
+    delta = _poll(test_client, url, member, cursor)
+    assert [(item["id"], item["title"], item["completed"]) for item in delta["items"]] == [
+        (1, "Prvni ukol", False), (2, "T2", True),
+    ]
+
+    _age_rows(test_app)
+    cursor = delta["cursor"]
+    test_client.delete(f"/api/race/{race_id}/tasks/log/", json={"task_id": 2, "team_id": 1}, headers=member)
+    assert test_client.delete("/api/task/1/", headers=admin).status_code == 200
+    delta = _poll(test_client, url, member, cursor)
+    assert [(item["id"], item["completed"]) for item in delta["items"]] == [(2, False)]
+    assert delta["deleted"] == [1]
+
+
+@pytest.mark.parametrize("kind, log_field", [("checkpoints", "checkpoint_id"), ("tasks", "task_id")])
+def test_status_list_conditional_get(test_client, add_test_data, count_statements, kind, log_field):
+    race_id = add_test_data["race_id"]
+    url = f"/api/race/{race_id}/{kind}/1/status/"
+    member = _headers(test_client, "member1@example.com")
+    admin = _headers(test_client, "admin@example.com")
+
+    def revalidate(etag):
+        with count_statements() as statements:
+            response = test_client.get(url, headers={**member, "If-None-Match": etag})
+        return response, statements
+
+    first = test_client.get(url, headers=member)
+    etag = first.headers["ETag"]
+    response, statements = revalidate(etag)
+    assert response.status_code == 304
+    # the user/race context and the log watermark only
+    assert len(statements) == 2
+    assert test_client.get(url, headers=member, query_string={"lang": "cs"}).headers["ETag"] != etag
+    assert "ETag" not in test_client.get(url, headers=member, query_string={"since": first.headers["Sync-Cursor"]}).headers
+
+    log_url = f"/api/race/{race_id}/{kind}/log/"
+    test_client.post(log_url, json={log_field: 1, "team_id": 1}, headers=member)
+    response, _ = revalidate(etag)
+    assert response.status_code == 200
+    logged = response.headers["ETag"]
+
+    # unlogging and logging the same item again is a change even when the log id is reused
+    test_client.delete(log_url, json={log_field: 1, "team_id": 1}, headers=member)
+    test_client.post(log_url, json={log_field: 1, "team_id": 1}, headers=member)
+    response, _ = revalidate(logged)
+    assert response.status_code == 200
+    relogged = response.headers["ETag"]
+
+    # other teams' logs keep the list cached, catalog changes do not
+    other = _headers(test_client, "member2@example.com")
+    test_client.post(log_url, json={log_field: 2, "team_id": 2}, headers=other)
+    assert revalidate(relogged)[0].status_code == 304
+    admin_url = "/api/checkpoint/2/" if kind == "checkpoints" else "/api/task/2/"
+    assert test_client.put(admin_url, json={"numOfPoints": 7}, headers=admin).status_code == 200
+    response, _ = revalidate(relogged)
+    assert response.status_code == 200
+    assert next(item for item in response.json if item["id"] == 2)["numOfPoints"] == 7
@@ -0,0 +1,245 @@
+import pytest
+import time
+from datetime import datetime, timedelta, timezone
+
+from app import db
+from app.models import Checkpoint, CheckpointLog, Race, RaceCategory, RaceScore, Registration, Task, TaskLog, Team, User
+
+
+@pytest.fixture
+def add_test_data(test_app):
+    with test_app.app_context():
+        now = datetime.now()
+        race = Race(
+            name="Offline Race",
+            description="Race without signal",
+            start_showing_checkpoints_at=now - timedelta(minutes=30),
+            end_showing_checkpoints_at=now + timedelta(minutes=30),
+            start_logging_at=now - timedelta(minutes=30),
+            end_logging_at=now + timedelta(minutes=30),
+        )
+        category = RaceCategory(name="Standard", description="Standard category")
+        member = User(name="Member", email="member@example.com")
+        member.set_password("password")
+        outsider = User(name="Outsider", email="outsider@example.com")
+        outsider.set_password("password")
+        db.session.add_all([race, category, member, outsider])
+        db.session.commit()
+
+        team = Team(name="Team Offline")
+        team.members.append(member)
+        other_team = Team(name="Other Team")
+        other_team.members.append(outsider)
+        db.session.add_all([team, other_team])
+        db.session.commit()
+
+        db.session.add_all([
+            Registration(race_id=race.id, team_id=team.id, race_category_id=category.id, payment_confirmed=True),
+            Registration(race_id=race.id, team_id=other_team.id, race_category_id=category.id, payment_confirmed=True),
+            Checkpoint(title="CP1", latitude=50.0, longitude=14.0, numOfPoints=1, race_id=race.id),
+            Checkpoint(title="CP2", latitude=50.1, longitude=14.1, numOfPoints=2, race_id=race.id),
+            Task(title="T1", description="Task", numOfPoints=5, race_id=race.id),
+        ])
+        db.session.commit()
+        return {"race_id": race.id, "team_id": team.id, "start_logging_at": race.start_logging_at}
+
+
+def _headers(test_client, email):
+    response = test_client.post("/auth/login/", json={"email": email, "password": "password"})
+    return {"Authorization": f"Bearer {response.json['access_token']}"}
+
+
+def test_sync_batch_logs_items_and_reports_duplicates(test_client, test_app, add_test_data):
+    """A batch writes all new logs, reports retried and unknown items, and updates scores."""
+    race_id = add_test_data["race_id"]
+    team_id = add_test_data["team_id"]
+    headers = _headers(test_client, "member@example.com")
+    logged_at = datetime.utcnow() - timedelta(minutes=5)
+    payload = {
+        "team_id": team_id,
+        "items": [
+            {"type": "checkpoint", "id": 1, "key": "a", "logged_at": logged_at.isoformat(), "user_latitude": 50.0, "user_longitude": 14.0},
+            {"type": "task", "id": 1, "key": "b"},
+            {"type": "checkpoint", "id": 1, "key": "a-again"},
+            {"type": "checkpoint", "id": 99, "key": "c"},
+        ],
+    }
+
+    resp = test_client.post(f"/api/race/{race_id}/sync/", json=payload, headers=headers)
+    assert resp.status_code == 200
+    assert resp.json["logged"] == 2
+    assert [(r["key"], r["status"]) for r in resp.json["results"]] == [
+        ("a", "logged"),
+        ("b", "logged"),
+        ("a-again", "already_logged"),
+        ("c", "invalid"),
+    ]
+
+    # retrying the same batch is safe
+    resp = test_client.post(f"/api/race/{race_id}/sync/", json=payload, headers=headers)
+    assert [r["status"] for r in resp.json["results"]] == ["already_logged", "already_logged", "already_logged", "invalid"]
+    assert resp.json["logged"] == 0
+
+    with test_app.app_context():
+        log = CheckpointLog.query.filter_by(race_id=race_id, team_id=team_id).one()
+        assert abs(log.created_at - logged_at) < timedelta(seconds=1)
+        assert log.user_distance_km == 0
+        assert TaskLog.query.filter_by(race_id=race_id, team_id=team_id).count() == 1
+        score = RaceScore.query.filter_by(race_id=race_id, team_id=team_id).one()
+        assert (score.points_for_checkpoints, score.points_for_tasks) == (1, 5)
+
+
+def test_sync_batch_clamps_client_timestamps(test_client, test_app, add_test_data):
+    """Client times before the logging window or in the future are clamped."""
+    race_id = add_test_data["race_id"]
+    headers = _headers(test_client, "member@example.com")
+    payload = {
+        "team_id": add_test_data["team_id"],
+        "items": [
+            {"type": "checkpoint", "id": 1, "logged_at": "2000-01-01T00:00:00"},
+            {"type": "checkpoint", "id": 2, "logged_at": (datetime.utcnow() + timedelta(days=1)).isoformat()},
+        ],
+    }
+    resp = test_client.post(f"/api/race/{race_id}/sync/", json=payload, headers=headers)
+    assert resp.status_code == 200
+
+    with test_app.app_context():
+        logs = {log.checkpoint_id: log for log in CheckpointLog.query.filter_by(race_id=race_id)}
+        assert logs[1].created_at == add_test_data["start_logging_at"]
+        assert logs[2].created_at <= datetime.utcnow()
+
+
+
+def test_sync_batch_clamps_against_local_logging_window(test_client, test_app, add_test_data, monkeypatch):
+    """Outside UTC the local race window is converted before clamping the UTC log times."""
+    monkeypatch.setenv("TZ", "EST5")
+    time.tzset()
+    try:
+        local_now = datetime.now()
+        with test_app.app_context():
+            race = db.session.get(Race, add_test_data["race_id"])
+            race.start_logging_at = local_now - timedelta(minutes=30)
+            race.end_logging_at = local_now + timedelta(minutes=30)
+            db.session.commit()
+        visited_at = datetime.now(timezone(timedelta(hours=2))) - timedelta(minutes=10)
+        payload = {
+            "team_id": add_test_data["team_id"],
+            "items": [
+                {"type": "checkpoint", "id": 1, "logged_at": "2000-01-01T00:00:00Z"},
+                {"type": "checkpoint", "id": 2, "logged_at": visited_at.isoformat()},
+                {"type": "task", "id": 1},
+            ],
+        }
+        headers = _headers(test_client, "member@example.com")
+        resp = test_client.post(f"/api/race/{add_test_data['race_id']}/sync/", json=payload, headers=headers)
+        assert resp.status_code == 200
+        assert resp.json["logged"] == 3
+
+        with test_app.app_context():
+            logs = {log.checkpoint_id: log for log in CheckpointLog.query.filter_by(race_id=add_test_data["race_id"])}
+            assert logs[1].created_at == local_now - timedelta(minutes=30) + timedelta(hours=5)
+            assert logs[2].created_at == visited_at.astimezone(timezone.utc).replace(tzinfo=None)
+            task_logged_at = TaskLog.query.one().created_at
+            assert abs(task_logged_at - datetime.utcnow()) < timedelta(minutes=1)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+
+def test_sync_batch_limits_backdating(test_client, test_app, add_test_data):
+    """Client times cannot go back past the offline window or before the team's accepted logs."""
+    race_id = add_test_data["race_id"]
+    team_id = add_test_data["team_id"]
+    headers = _headers(test_client, "member@example.com")
+    test_app.config["SYNC_MAX_BACKDATE_SECONDS"] = 600
+    long_ago = (datetime.utcnow() - timedelta(minutes=25)).isoformat()
+
+    payload = {"team_id": team_id, "items": [{"type": "checkpoint", "id": 1, "logged_at": long_ago}]}
+    assert test_client.post(f"/api/race/{race_id}/sync/", json=payload, headers=headers).status_code == 200
+    with test_app.app_context():
+        first = CheckpointLog.query.one().created_at
+    assert abs(first - (datetime.utcnow() - timedelta(minutes=10))) < timedelta(minutes=1)
+
+    test_app.config["SYNC_MAX_BACKDATE_SECONDS"] = 3600
+    payload = {"team_id": team_id, "items": [{"type": "task", "id": 1, "logged_at": long_ago}]}
+    assert test_client.post(f"/api/race/{race_id}/sync/", json=payload, headers=headers).status_code == 200
+    with test_app.app_context():
+        # not before the checkpoint the server already accepted
+        assert TaskLog.query.one().created_at == first
+
+
+def test_sync_batch_keys_are_not_applied_twice(test_client, test_app, add_test_data):
+    """A stale batch replayed after an unlog does not log the item again."""
+    race_id = add_test_data["race_id"]
+    team_id = add_test_data["team_id"]
+    headers = _headers(test_client, "member@example.com")
+    url = f"/api/race/{race_id}/sync/"
+    payload = {"team_id": team_id, "items": [{"type": "checkpoint", "id": 1, "key": "visit-1"}]}
+
+    assert test_client.post(url, json=payload, headers=headers).json["results"][0]["status"] == "logged"
+    unlog = test_client.delete(f"/api/race/{race_id}/checkpoints/log/", json={"checkpoint_id": 1, "team_id": team_id}, headers=headers)
+    assert unlog.status_code == 200
+
+    replayed = test_client.post(url, json=payload, headers=headers)
+    assert replayed.json["results"][0]["status"] == "already_logged"
+    assert replayed.json["logged"] == 0
+    reused = test_client.post(url, json={"team_id": team_id, "items": [{"type": "checkpoint", "id": 2, "key": "visit-1"}]}, headers=headers)
+    assert reused.json["results"][0]["status"] == "invalid"
+    with test_app.app_context():
+        assert CheckpointLog.query.count() == 0
+
+
+def test_sync_batch_authorization_and_validation(test_client, add_test_data):
+    """Other teams' members are rejected once for the batch; bad payloads get 400."""
+    race_id = add_test_data["race_id"]
+    payload = {"team_id": add_test_data["team_id"], "items": [{"type": "checkpoint", "id": 1}]}
+
+    resp = test_client.post(f"/api/race/{race_id}/sync/", json=payload, headers=_headers(test_client, "outsider@example.com"))
+    assert resp.status_code == 403
+
+    headers = _headers(test_client, "member@example.com")
+    resp = test_client.post(f"/api/race/{race_id}/sync/", json={"team_id": add_test_data["team_id"], "items": []}, headers=headers)
+    assert resp.status_code == 400
+    resp = test_client.post(
+        f"/api/race/{race_id}/sync/",
+        json={"team_id": add_test_data["team_id"], "items": [{"type": "photo", "id": 1}]},
+        headers=headers,
+    )
+    assert resp.status_code == 400
+
+
+def test_synced_log_tie_break_survives_recompute(test_client, test_app, add_test_data):
+    """The earlier (backdated) log wins a tie the same way live, rebuilt and replayed."""
+    from app.services.scoring_service import recompute_team_scores, record_team_log
+
+    race_id = add_test_data["race_id"]
+    team_id = add_test_data["team_id"]
+    payload = {
+        "team_id": team_id,
+        "items": [{"type": "checkpoint", "id": 2, "logged_at": (datetime.utcnow() - timedelta(minutes=10)).isoformat()}],
+    }
+    assert test_client.post(f"/api/race/{race_id}/sync/", json=payload, headers=_headers(test_client, "member@example.com")).status_code == 200
+    outsider = _headers(test_client, "outsider@example.com")
+    response = test_client.post(f"/api/race/{race_id}/checkpoints/log/", json={"checkpoint_id": 2, "team_id": 2}, headers=outsider)
+    assert response.status_code == 201
+
+    def standings(as_of=None):
+        query = {"as_of": as_of} if as_of else {}
+        rows = test_client.get(f"/api/race/{race_id}/results/", headers=outsider, query_string=query).json
+        return [(row["team_id"], row["rank"], row["total_points"]) for row in rows]
+
+    live = standings()
+    assert live == [(team_id, 1, 2), (2, 2, 2)]
+    with test_app.app_context():
+        live_log = CheckpointLog.query.filter_by(race_id=race_id, team_id=2).one()
+        assert RaceScore.query.filter_by(race_id=race_id, team_id=2).one().last_log_at == live_log.created_at
+        # a log stamped before the team's latest one does not move the tie-break back
+        record_team_log(race_id, 2, live_log.created_at - timedelta(hours=1))
+        db.session.commit()
+        assert RaceScore.query.filter_by(race_id=race_id, team_id=2).one().last_log_at == live_log.created_at
+
+        recompute_team_scores(race_id)
+        db.session.commit()
+    assert standings() == live
+    assert standings((datetime.utcnow() + timedelta(minutes=1)).isoformat()) == live
@@ -0,0 +1,136 @@
+import pytest
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import (
+    Checkpoint,
+    CheckpointTranslation,
+    Race,
+    RaceCategory,
+    RaceCategoryTranslation,
+    RaceTranslation,
+    Registration,
+    Task,
+    TaskTranslation,
+    Team,
+    User,
+)
+from app.services.catalog_service import bump_catalog_version
+from app.services.translation_service import translate_entities
+
+
+@pytest.fixture
+def add_test_data(test_app):
+    with test_app.app_context():
+        now = datetime.now()
+        race = Race(
+            name="Spring Race",
+            description="24 hours of exploration",
+            race_greeting="Welcome",
+            start_showing_checkpoints_at=now - timedelta(minutes=10),
+            end_showing_checkpoints_at=now + timedelta(minutes=10),
+            start_logging_at=now - timedelta(minutes=10),
+            end_logging_at=now + timedelta(minutes=10),
+        )
+        category = RaceCategory(name="Standard", description="Standard category")
+        race.categories.append(category)
+        admin = User(name="Admin", email="admin@example.com", is_administrator=True)
+        admin.set_password("password")
+        member = User(name="Member", email="member@example.com")
+        member.set_password("password")
+        db.session.add_all([race, category, admin, member])
+        db.session.commit()
+
+        team = Team(name="Team Alpha")
+        team.members.append(member)
+        db.session.add(team)
+        db.session.commit()
+        db.session.add(Registration(race_id=race.id, team_id=team.id, race_category_id=category.id, payment_confirmed=True))
+        db.session.add_all([
+            RaceTranslation(race_id=race.id, language="cs", name="Jarni zavod", description=None, race_greeting="Vitejte"),
+            RaceCategoryTranslation(race_category_id=category.id, language="cs", name="Standardni", description="Bezna"),
+        ])
+        db.session.commit()
+        return {"race_id": race.id, "team_id": team.id}
+
+
+def _add_items(race_id, count):
+    """Add ``count`` more races, categories, checkpoints and tasks, each with a Czech translation."""
+    race = db.session.get(Race, race_id)
+    offset = Task.query.count()
+    for index in range(offset, offset + count):
+        other_race = Race(
+            name=f"Race {index}",
+            description="Another race",
+            start_showing_checkpoints_at=datetime.now(),
+            end_showing_checkpoints_at=datetime.now(),
+            start_logging_at=datetime.now(),
+            end_logging_at=datetime.now(),
+        )
+        category = RaceCategory(name=f"Category {index}", description="Category")
+        race.categories.append(category)
+        checkpoint = Checkpoint(title=f"CP {index}", description="Checkpoint", latitude=50.0, longitude=14.0, numOfPoints=1, race_id=race_id)
+        task = Task(title=f"Task {index}", description="Task", numOfPoints=1, race_id=race_id)
+        db.session.add_all([other_race, category, checkpoint, task])
+        db.session.flush()
+        db.session.add_all([
+            RaceTranslation(race_id=other_race.id, language="cs", name=f"Zavod {index}", description="Jiny zavod"),
+            RaceCategoryTranslation(race_category_id=category.id, language="cs", name=f"Kategorie {index}", description=None),
+            CheckpointTranslation(checkpoint_id=checkpoint.id, language="cs", title=f"Kontrola {index}", description=None),
+            TaskTranslation(task_id=task.id, language="cs", title="", description="Ukol"),
+        ])
+    bump_catalog_version(race_id)
+    db.session.commit()
+
+
+def test_translate_entities_fallback_rules(test_app, add_test_data):
+    with test_app.app_context():
+        _add_items(add_test_data["race_id"], 1)
+        race = db.session.get(Race, add_test_data["race_id"])
+        # missing translated description and greeting keep the base text
+        assert translate_entities([race], "cs")[race.id] == {
+            "name": "Jarni zavod", "description": "24 hours of exploration", "race_greeting": "Vitejte",
+        }
+        assert translate_entities([race], None)[race.id]["name"] == "Spring Race"
+        assert translate_entities([race], "de")[race.id]["name"] == "Spring Race"
+
+        task = Task.query.filter_by(title="Task 0").one()
+        # an empty translated title falls back, a translated description is used
+        assert translate_entities([task], "cs")[task.id] == {"title": "Task 0", "description": "Ukol"}
+        checkpoint = Checkpoint.query.one()
+        assert translate_entities([checkpoint], "cs")[checkpoint.id] == {"title": "Kontrola 0", "description": "Checkpoint"}
+        assert translate_entities([], "cs") == {}
+
+
+@pytest.mark.parametrize("path, email, translated", [
+    ("/api/race/?lang=cs", "member@example.com", "Zavod 0"),
+    ("/api/race-category/?lang=cs", "member@example.com", "Kategorie 0"),
+    ("/api/race/{race_id}/categories/?lang=cs", "admin@example.com", "Kategorie 0"),
+    ("/api/race/{race_id}/checkpoints/?lang=cs", "member@example.com", "Kontrola 0"),
+    ("/api/race/{race_id}/checkpoints/{team_id}/status/?lang=cs", "member@example.com", "Kontrola 0"),
+    ("/api/race/{race_id}/tasks/?lang=cs", "member@example.com", "Task 0"),
+    ("/api/race/{race_id}/tasks/{team_id}/status/?lang=cs", "member@example.com", "Task 0"),
+])
+def test_list_endpoints_resolve_translations_in_constant_queries(
+    test_client, test_app, add_test_data, count_statements, path, email, translated
+):
+    """Adding entities with translations must not add queries."""
+    url = path.format(**add_test_data)
+    response = test_client.post("/auth/login/", json={"email": email, "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    with test_app.app_context():
+        _add_items(add_test_data["race_id"], 1)
+    with count_statements() as few:
+        response = test_client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert translated in [item.get("title", item.get("name")) for item in response.json]
+
+    with test_app.app_context():
+        _add_items(add_test_data["race_id"], 5)
+    with count_statements() as many:
+        response = test_client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json) > 5
+    assert len(many) == len(few)
+    assert sum("translation" in statement for statement in many) <= 1
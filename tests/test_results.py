@@ -1,7 +1,8 @@
+import json
 import pytest
 from datetime import datetime, timedelta
 from app import db
-from app.models import Race, Checkpoint, Team, Registration, RaceCategory, User, Task
+from app.models import Race, Checkpoint, CheckpointLog, Team, Registration, RaceCategory, RaceScore, User, Task, TaskLog
 
 
 @pytest.fixture
@@ -234,3 +235,336 @@ def test_get_race_results_excludes_unpaid_registrations(test_client, add_test_da
 
     team_ids = {row["team_id"] for row in resp.json}
     assert unpaid_team_id not in team_ids
+
+
+def test_get_race_results_reflects_unlog(test_client, add_test_data, admin_auth_headers):
+    """Unlogging a checkpoint or task removes its points from the results."""
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    test_client.post("/api/race/1/tasks/log/", json={"task_id": 2, "team_id": 1}, headers=admin_auth_headers)
+
+    resp = test_client.delete("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    assert resp.status_code == 200
+    resp = test_client.delete("/api/race/1/tasks/log/", json={"task_id": 2, "team_id": 1}, headers=admin_auth_headers)
+    assert resp.status_code == 200
+
+    resp = test_client.get("/api/race/1/results/", headers=admin_auth_headers)
+    team1 = next(r for r in resp.json if r["team_id"] == 1)
+    assert team1["points_for_checkpoints"] == 0
+    assert team1["points_for_tasks"] == 0
+    assert team1["total_points"] == 0
+
+
+def test_get_race_results_duplicate_log_does_not_double_count(test_client, add_test_data, admin_auth_headers):
+    """A rejected duplicate log must not add points a second time."""
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    resp = test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    assert resp.status_code == 409
+
+    resp = test_client.get("/api/race/1/results/", headers=admin_auth_headers)
+    team1 = next(r for r in resp.json if r["team_id"] == 1)
+    assert team1["points_for_checkpoints"] == 1
+
+
+def test_get_race_results_follow_point_changes(test_client, add_test_data, admin_auth_headers):
+    """Changing numOfPoints of a logged checkpoint/task recomputes team scores."""
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    test_client.post("/api/race/1/tasks/log/", json={"task_id": 1, "team_id": 1}, headers=admin_auth_headers)
+
+    resp = test_client.put("/api/checkpoint/1/", json={"numOfPoints": 5}, headers=admin_auth_headers)
+    assert resp.status_code == 200
+    resp = test_client.put("/api/task/1/", json={"numOfPoints": 7}, headers=admin_auth_headers)
+    assert resp.status_code == 200
+
+    resp = test_client.get("/api/race/1/results/", headers=admin_auth_headers)
+    team1 = next(r for r in resp.json if r["team_id"] == 1)
+    assert team1["points_for_checkpoints"] == 5
+    assert team1["points_for_tasks"] == 7
+    assert team1["total_points"] == 12
+
+
+def test_get_race_results_after_checkpoint_delete(test_client, add_test_data, admin_auth_headers):
+    """Deleting a checkpoint drops the points of the removed visits."""
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 2, "team_id": 1}, headers=admin_auth_headers)
+
+    resp = test_client.delete("/api/checkpoint/1/", headers=admin_auth_headers)
+    assert resp.status_code == 200
+
+    resp = test_client.get("/api/race/1/results/", headers=admin_auth_headers)
+    team1 = next(r for r in resp.json if r["team_id"] == 1)
+    assert team1["points_for_checkpoints"] == 1
+
+
+def test_scores_rebuild_command_repairs_drift(test_client, add_test_data, admin_auth_headers, test_app):
+    """`flask scores rebuild` recomputes the score table from the logs."""
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 2, "team_id": 2}, headers=admin_auth_headers)
+    test_client.post("/api/race/1/tasks/log/", json={"task_id": 2, "team_id": 2}, headers=admin_auth_headers)
+
+    with test_app.app_context():
+        score = RaceScore.query.filter_by(race_id=1, team_id=2).first()
+        score.points_for_checkpoints = 100
+        score.points_for_tasks = 100
+        db.session.commit()
+
+    result = test_app.test_cli_runner().invoke(args=["scores", "rebuild", "--race-id", "1"])
+    assert result.exit_code == 0
+    assert "Race 1" in result.output
+
+    resp = test_client.get("/api/race/1/results/", headers=admin_auth_headers)
+    team2 = next(r for r in resp.json if r["team_id"] == 2)
+    assert team2["points_for_checkpoints"] == 1
+    assert team2["points_for_tasks"] == 3
+
+
+def test_get_race_results_ranked_by_total_points(test_client, add_test_data, admin_auth_headers):
+    """Results are ordered by total points with a rank; disqualified teams come last unranked."""
+    test_client.post("/api/race/1/tasks/log/", json={"task_id": 2, "team_id": 2}, headers=admin_auth_headers)
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 3}, headers=admin_auth_headers)
+    test_client.post("/api/race/1/tasks/log/", json={"task_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    test_client.patch("/api/team/race/1/team/2/disqualify/", json={"disqualified": True}, headers=admin_auth_headers)
+
+    resp = test_client.get("/api/race/1/results/", headers=admin_auth_headers)
+    assert resp.status_code == 200
+    assert [(r["team_id"], r["rank"]) for r in resp.json] == [(1, 1), (3, 2), (2, None)]
+    assert resp.json[0]["last_log_at"] is not None
+
+
+def test_get_race_results_tie_broken_by_earliest_last_log(test_client, add_test_data, admin_auth_headers, test_app):
+    """Teams with equal points are ordered by who logged their last points first."""
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 2}, headers=admin_auth_headers)
+
+    with test_app.app_context():
+        now = datetime.utcnow()
+        RaceScore.query.filter_by(race_id=1, team_id=1).first().last_log_at = now
+        RaceScore.query.filter_by(race_id=1, team_id=2).first().last_log_at = now - timedelta(minutes=5)
+        db.session.commit()
+
+    resp = test_client.get("/api/race/1/results/", headers=admin_auth_headers)
+    assert [(r["team_id"], r["rank"]) for r in resp.json] == [(2, 1), (1, 2), (3, 3)]
+
+
+def test_get_race_results_unlog_restores_last_log_time(test_client, add_test_data, admin_auth_headers, test_app):
+    """Unlogging moves the team's last log time back to its latest remaining log."""
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    test_client.delete("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=admin_auth_headers)
+
+    with test_app.app_context():
+        assert RaceScore.query.filter_by(race_id=1, team_id=1).first().last_log_at is None
+
+
+def test_get_race_results_category_and_top(test_client, add_test_data, admin_auth_headers, test_app):
+    """`category` ranks within one category and `top` truncates the leaderboard."""
+    with test_app.app_context():
+        walkers = RaceCategory(name="Pěšky", description="Bez kola.")
+        db.session.add(walkers)
+        db.session.commit()
+        Registration.query.filter_by(race_id=1, team_id=3).first().race_category_id = walkers.id
+        db.session.commit()
+        walkers_id = walkers.id
+
+    test_client.post("/api/race/1/tasks/log/", json={"task_id": 2, "team_id": 3}, headers=admin_auth_headers)
+    test_client.post("/api/race/1/tasks/log/", json={"task_id": 1, "team_id": 2}, headers=admin_auth_headers)
+
+    resp = test_client.get("/api/race/1/results/?top=2", headers=admin_auth_headers)
+    assert [(r["team_id"], r["rank"]) for r in resp.json] == [(3, 1), (2, 2)]
+
+    resp = test_client.get("/api/race/1/results/?category=1", headers=admin_auth_headers)
+    assert [(r["team_id"], r["rank"]) for r in resp.json] == [(2, 1), (1, 2)]
+
+    resp = test_client.get(f"/api/race/1/results/?category={walkers_id}&top=1", headers=admin_auth_headers)
+    assert [(r["team_id"], r["rank"]) for r in resp.json] == [(3, 1)]
+
+    resp = test_client.get("/api/race/1/results/?top=0", headers=admin_auth_headers)
+    assert resp.status_code == 400
+    assert "top" in resp.json["errors"]
+
+
+def _backdate_logs(test_app, checkpoint_minutes_ago, task_minutes_ago):
+    """Move the race 1 checkpoint and task logs into the past; returns the reference time."""
+    with test_app.app_context():
+        now = datetime.utcnow().replace(microsecond=0)
+        for log in CheckpointLog.query.filter_by(race_id=1):
+            log.created_at = now - timedelta(minutes=checkpoint_minutes_ago)
+        for log in TaskLog.query.filter_by(race_id=1):
+            log.created_at = now - timedelta(minutes=task_minutes_ago)
+        db.session.commit()
+    return now
+
+
+def test_get_race_results_as_of(test_client, add_test_data, admin_auth_headers, test_app):
+    """`as_of` replays the standings from the logs created up to that time."""
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    test_client.post("/api/race/1/tasks/log/", json={"task_id": 2, "team_id": 2}, headers=admin_auth_headers)
+    now = _backdate_logs(test_app, checkpoint_minutes_ago=10, task_minutes_ago=2)
+
+    as_of = (now - timedelta(minutes=5)).isoformat()
+    resp = test_client.get(f"/api/race/1/results/?as_of={as_of}", headers=admin_auth_headers)
+    assert resp.status_code == 200
+    assert [(r["team_id"], r["rank"], r["total_points"]) for r in resp.json] == [(1, 1, 1), (2, 2, 0), (3, 2, 0)]
+
+    current = test_client.get("/api/race/1/results/", headers=admin_auth_headers)
+    assert [r["team_id"] for r in current.json][:2] == [2, 1]
+    assert current.headers["ETag"] != resp.headers["ETag"]
+
+    resp = test_client.get("/api/race/1/results/?as_of=yesterday", headers=admin_auth_headers)
+    assert resp.status_code == 400
+
+
+def test_get_race_results_timeline(test_client, add_test_data, admin_auth_headers, test_app):
+    """The timeline returns ranked standings at evenly spaced times."""
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    test_client.post("/api/race/1/tasks/log/", json={"task_id": 2, "team_id": 2}, headers=admin_auth_headers)
+    now = _backdate_logs(test_app, checkpoint_minutes_ago=12, task_minutes_ago=2)
+
+    start = (now - timedelta(minutes=20)).isoformat()
+    resp = test_client.get(
+        f"/api/race/1/results/timeline/?buckets=4&from={start}&to={now.isoformat()}",
+        headers=admin_auth_headers,
+    )
+    assert resp.status_code == 200
+    assert [entry["as_of"] for entry in resp.json] == [
+        (now - timedelta(minutes=minutes)).isoformat() for minutes in (15, 10, 5, 0)
+    ]
+    totals = [{r["team_id"]: r["total_points"] for r in entry["teams"]} for entry in resp.json]
+    assert totals == [
+        {1: 0, 2: 0, 3: 0},
+        {1: 1, 2: 0, 3: 0},
+        {1: 1, 2: 0, 3: 0},
+        {1: 1, 2: 3, 3: 0},
+    ]
+    assert [r["team_id"] for r in resp.json[-1]["teams"]] == [2, 1, 3]
+
+
+def test_get_race_results_timeline_validation(test_client, add_test_data, admin_auth_headers, regular_user_auth_headers):
+    """The timeline is admin-only and validates its parameters."""
+    resp = test_client.get("/api/race/1/results/timeline/", headers=regular_user_auth_headers)
+    assert resp.status_code == 403
+
+    resp = test_client.get("/api/race/1/results/timeline/?buckets=0", headers=admin_auth_headers)
+    assert resp.status_code == 400
+    assert "buckets" in resp.json["errors"]
+
+    resp = test_client.get(
+        "/api/race/1/results/timeline/?from=2026-01-02T00:00:00&to=2026-01-01T00:00:00",
+        headers=admin_auth_headers,
+    )
+    assert resp.status_code == 400
+
+    resp = test_client.get("/api/race/1/results/timeline/?buckets=3", headers=admin_auth_headers)
+    assert resp.status_code == 200
+    assert len(resp.json) == 3
+
+
+def test_get_race_results_etag_not_modified(test_client, add_test_data, admin_auth_headers):
+    """Results carry an ETag and answer 304 while the race score version is unchanged."""
+    resp = test_client.get("/api/race/1/results/", headers=admin_auth_headers)
+    assert resp.status_code == 200
+    etag = resp.headers.get("ETag")
+    assert etag
+
+    resp = test_client.get("/api/race/1/results/", headers={**admin_auth_headers, "If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers.get("ETag") == etag
+    assert resp.data == b""
+
+
+def test_get_race_results_etag_changes_on_writes(test_client, add_test_data, admin_auth_headers):
+    """Logging, unlogging and disqualification each produce a new results ETag."""
+    seen = {test_client.get("/api/race/1/results/", headers=admin_auth_headers).headers["ETag"]}
+
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    seen.add(test_client.get("/api/race/1/results/", headers=admin_auth_headers).headers["ETag"])
+
+    test_client.post("/api/race/1/tasks/log/", json={"task_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    seen.add(test_client.get("/api/race/1/results/", headers=admin_auth_headers).headers["ETag"])
+
+    test_client.delete("/api/race/1/tasks/log/", json={"task_id": 1, "team_id": 1}, headers=admin_auth_headers)
+    seen.add(test_client.get("/api/race/1/results/", headers=admin_auth_headers).headers["ETag"])
+
+    test_client.patch("/api/team/race/1/team/2/disqualify/", json={"disqualified": True}, headers=admin_auth_headers)
+    last = test_client.get("/api/race/1/results/", headers=admin_auth_headers)
+    seen.add(last.headers["ETag"])
+    assert len(seen) == 5
+    assert next(r for r in last.json if r["team_id"] == 2)["disqualified"] is True
+
+    # writes to another race must not invalidate this race's results
+    test_client.post("/api/race/2/checkpoints/log/", json={"checkpoint_id": 4, "team_id": 4}, headers=admin_auth_headers)
+    resp = test_client.get("/api/race/1/results/", headers={**admin_auth_headers, "If-None-Match": last.headers["ETag"]})
+    assert resp.status_code == 304
+
+
+def _open_stream(test_client, headers):
+    """Open a results stream as a threaded worker would; the test client reports a single-threaded server."""
+    return test_client.get(
+        "/api/race/1/results/stream/",
+        headers=headers,
+        buffered=False,
+        environ_overrides={"wsgi.multithread": True},
+    )
+
+
+def _read_sse_event(chunks, event_name):
+    """Read the stream until the named event arrives and return its JSON payload."""
+    for chunk in chunks:
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if text.startswith("id: ") and f"event: {event_name}\n" in text:
+            return json.loads(text.split("data: ", 1)[1])
+    raise AssertionError(f"stream ended before {event_name} event")
+
+
+def test_stream_race_results_snapshot_then_changed_rows(test_client, add_test_data, admin_auth_headers, test_app):
+    """The results stream sends a full snapshot, then only the rows that changed."""
+    test_app.config["LEADERBOARD_STREAM_HEARTBEAT_SECONDS"] = 0.1
+    test_app.config["LEADERBOARD_STREAM_MAX_SECONDS"] = 5
+    test_client.post("/api/race/1/checkpoints/log/", json={"checkpoint_id": 1, "team_id": 2}, headers=admin_auth_headers)
+
+    resp = _open_stream(test_client, admin_auth_headers)
+    assert resp.status_code == 200
+    assert resp.mimetype == "text/event-stream"
+    chunks = iter(resp.response)
+
+    snapshot = _read_sse_event(chunks, "snapshot")
+    assert {row["team_id"] for row in snapshot["teams"]} == {1, 2, 3}
+
+    # team 2 stays first, so no other team's row (or rank) changes
+    test_client.post("/api/race/1/tasks/log/", json={"task_id": 1, "team_id": 2}, headers=admin_auth_headers)
+
+    update = _read_sse_event(chunks, "update")
+    assert update["version"] > snapshot["version"]
+    assert [row["team_id"] for row in update["teams"]] == [2]
+    assert update["teams"][0]["total_points"] == 3
+    resp.close()
+
+
+def test_stream_race_results_connection_cap(test_client, add_test_data, admin_auth_headers, test_app):
+    """Streams beyond the per-worker cap are rejected with 503."""
+    test_app.extensions["leaderboard_hub"].max_streams = 1
+
+    first = _open_stream(test_client, admin_auth_headers)
+    assert first.status_code == 200
+
+    second = _open_stream(test_client, admin_auth_headers)
+    assert second.status_code == 503
+    assert second.headers.get("Retry-After")
+
+    first.close()
+    third = _open_stream(test_client, admin_auth_headers)
+    assert third.status_code == 200
+    third.close()
+
+
+def test_stream_race_results_requires_header_token(test_client, add_test_data, admin_auth_headers):
+    """The stream only accepts the token in the Authorization header, never in the query string."""
+    token = admin_auth_headers["Authorization"].split(" ", 1)[1]
+    assert _open_stream(test_client, {}).status_code == 401
+    assert test_client.get(
+        f"/api/race/1/results/stream/?jwt={token}", environ_overrides={"wsgi.multithread": True}
+    ).status_code == 401
+
+
+def test_stream_race_results_refused_on_sync_worker(test_client, add_test_data, admin_auth_headers):
+    """A worker that serves one request at a time refuses streams instead of blocking on them."""
+    resp = test_client.get("/api/race/1/results/stream/", headers=admin_auth_headers)
+    assert resp.status_code == 503
+    assert "poll" in resp.get_json()["message"]
@@ -223,6 +223,43 @@ def test_log_visit_duplicate_with_image_does_not_orphan_image_row(test_client, t
         assert Image.query.count() == 0
 
 
+def test_log_visit_duplicate_is_rejected_before_saving_image(test_client, test_app, add_test_data, tmp_path):
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    response = test_client.post("/auth/login/", json={"email": "example2@example.com", "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    first = test_client.post("/api/race/1/checkpoints/log/", headers=headers, json={"checkpoint_id": 1, "team_id": 1})
+    assert first.status_code == 201
+
+    with open("tests/test_image.jpg", "rb") as img:
+        duplicate = test_client.post(
+            "/api/race/1/checkpoints/log/",
+            headers=headers,
+            data={"image": img, "checkpoint_id": 1, "team_id": 1},
+            content_type="multipart/form-data",
+        )
+    assert duplicate.status_code == 409
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_insert_team_log_skips_duplicates_without_rollback(test_app, add_test_data):
+    from app.services.scoring_service import insert_team_log
+
+    with test_app.app_context():
+        first_id = insert_team_log(CheckpointLog, checkpoint_id=1, team_id=1, race_id=1).id
+        pending = Team(name="Pending")
+        db.session.add(pending)
+        db.session.flush()
+
+        assert first_id is not None
+        assert insert_team_log(CheckpointLog, checkpoint_id=1, team_id=1, race_id=1) is None
+        assert insert_team_log(TaskLog, task_id=1, team_id=1, race_id=1) is not None
+        db.session.commit()
+
+        assert Team.query.filter_by(name="Pending").count() == 1
+        assert CheckpointLog.query.filter_by(checkpoint_id=1, team_id=1, race_id=1).one().id == first_id
+
+
 def test_log_visit_rejects_non_image_payload_with_image_extension(test_client, add_test_data):
     response = test_client.post("/auth/login/", json={"email": "example2@example.com", "password": "password"})
     headers = {"Authorization": f"Bearer {response.json['access_token']}"}
@@ -526,6 +563,30 @@ def test_log_task_completion_duplicate(test_client, add_test_data):
     assert "already logged" in response.json["message"]
 
 
+
+def test_log_task_completion_rejects_task_of_another_race(test_client, test_app, add_test_data):
+    """Unknown tasks and tasks of other races are rejected before anything is stored or scored."""
+    with test_app.app_context():
+        other_race = Race(name="Other Race", description="Elsewhere", start_showing_checkpoints_at=datetime.now(),
+                          end_showing_checkpoints_at=datetime.now(), start_logging_at=datetime.now(), end_logging_at=datetime.now())
+        db.session.add(other_race)
+        db.session.flush()
+        other_task = Task(title="Elsewhere", description="d", numOfPoints=50, race_id=other_race.id)
+        db.session.add(other_task)
+        db.session.commit()
+        other_task_id = other_task.id
+    response = test_client.post("/auth/login/", json={"email": "user@example.com", "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    for task_id in (999, other_task_id):
+        response = test_client.post("/api/race/1/tasks/log/", json={"task_id": task_id, "team_id": 1}, headers=headers)
+        assert response.status_code == 404
+    with test_app.app_context():
+        assert TaskLog.query.count() == 0
+    results = test_client.get("/api/race/1/results/", headers=headers).json
+    assert next(row for row in results if row["team_id"] == 1)["total_points"] == 0
+
+
 def test_log_task_completion_duplicate_with_image_does_not_orphan_image_row(test_client, test_app, add_test_data):
     response = test_client.post("/auth/login/", json={"email": "user@example.com", "password": "password"})
     headers = {"Authorization": f"Bearer {response.json['access_token']}"}
@@ -825,3 +886,420 @@ def test_get_tasks_with_status_unauthorized_user_forbidden(test_client, add_test
     headers_other = {"Authorization": f"Bearer {response.json['access_token']}"}
     denied = test_client.get("/api/race/1/tasks/1/status/", headers=headers_other)
     assert denied.status_code == 403
+
+
+def test_log_visit_with_image_reports_processing_state(test_client, test_app, add_test_data, tmp_path):
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    response = test_client.post("/auth/login/", json={"email": "example2@example.com", "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    with open("tests/test_image.jpg", "rb") as img:
+        response = test_client.post(
+            "/api/race/1/checkpoints/log/",
+            headers=headers,
+            data={"image": img, "checkpoint_id": 1, "team_id": 1},
+            content_type="multipart/form-data",
+        )
+    # TestConfig processes images inline after the commit
+    assert response.status_code == 201
+    assert response.json["image_status"] == "ready"
+
+    visits = test_client.get("/api/race/1/visits/1/", headers=headers)
+    assert [visit["image_status"] for visit in visits.json] == ["ready"]
+
+
+
+def test_log_visit_marks_image_failed_on_unexpected_ingest_error(test_client, test_app, add_test_data, tmp_path, monkeypatch):
+    """An ingest error after the log is committed fails the image, not the request."""
+    from PIL import Image as PILImage
+
+    def bomb(image, source):
+        raise PILImage.DecompressionBombError("too many pixels")
+
+    monkeypatch.setattr("app.services.image_ingest.image_phash", bomb)
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    response = test_client.post("/auth/login/", json={"email": "example2@example.com", "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    with open("tests/test_image.jpg", "rb") as img:
+        response = test_client.post(
+            "/api/race/1/checkpoints/log/",
+            headers=headers,
+            data={"image": img, "checkpoint_id": 1, "team_id": 1},
+            content_type="multipart/form-data",
+        )
+    assert response.status_code == 201
+    assert response.json["image_status"] == "failed"
+    with test_app.app_context():
+        assert Image.query.one().status == "failed"
+
+
+def test_image_ingest_pool_processes_in_background(test_app, add_test_data, tmp_path):
+    from app.services.image_ingest import ImageIngestPool
+
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    test_app.config['IMAGE_INGEST_WORKERS'] = 1
+    with open("tests/test_image.jpg", "rb") as src:
+        (tmp_path / "queued.jpg").write_bytes(src.read())
+
+    with test_app.app_context():
+        image = Image(filename="queued.jpg", status="pending")
+        missing = Image(filename="missing.jpg", status="pending")
+        db.session.add_all([image, missing])
+        db.session.commit()
+        image_id, missing_id = image.id, missing.id
+
+        pool = ImageIngestPool(test_app)
+        assert pool.submit(image_id) == "pending"
+        pool._executor.shutdown(wait=True)
+        db.session.expire_all()
+        assert db.session.get(Image, image_id).status == "ready"
+
+    result = test_app.test_cli_runner().invoke(args=["images", "ingest-pending"])
+    assert result.exit_code == 0
+    assert f"Image {missing_id}: failed" in result.output
+
+
+def _jpeg_with_gps(latitude, longitude):
+    from PIL import Image as PILImage
+
+    exif = PILImage.Exif()
+    exif[0x8825] = {1: 'N', 2: (latitude, 0.0, 0.0), 3: 'E', 4: (longitude, 0.0, 0.0)}
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (64, 48), "green").save(buffer, "JPEG", exif=exif)
+    buffer.seek(0)
+    return buffer
+
+
+def test_inspect_uploaded_image_reads_header_and_gps_once():
+    from werkzeug.datastructures import FileStorage
+    from app.utils import inspect_uploaded_image
+
+    upload = FileStorage(stream=_jpeg_with_gps(50.0, 14.0), filename="gps.jpg", content_type="image/jpeg")
+    info = inspect_uploaded_image(upload)
+    assert info.valid and info.error is None
+    assert (info.format, info.width, info.height) == ("JPEG", 64, 48)
+    assert (info.latitude, info.longitude) == (50.0, 14.0)
+    assert upload.stream.tell() == 0
+
+    broken = FileStorage(stream=io.BytesIO(b"not an image"), filename="x.jpg", content_type="image/jpeg")
+    assert inspect_uploaded_image(broken) == (False, "Invalid image file.", None, None, None, None, None)
+
+
+def test_log_visit_with_gps_photo_reports_distance(test_client, test_app, add_test_data, tmp_path):
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    response = test_client.post("/auth/login/", json={"email": "example2@example.com", "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    response = test_client.post(
+        "/api/race/1/checkpoints/log/",
+        headers=headers,
+        data={"image": (_jpeg_with_gps(50.0, 14.0), "gps.jpg"), "checkpoint_id": 2, "team_id": 1},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 201
+    assert (response.json["image_latitude"], response.json["image_longitude"]) == (50.0, 14.0)
+    # checkpoint 2 lies at (50.0, 14.5)
+    assert 35 < response.json["image_distance_km"] < 36
+
+    with test_app.app_context():
+        log = CheckpointLog.query.filter_by(checkpoint_id=2, team_id=1).one()
+        assert log.image_distance_km == pytest.approx(response.json["image_distance_km"], abs=0.001)
+
+
+def test_same_photo_is_stored_once_and_swept_after_release(test_client, test_app, add_test_data, tmp_path):
+    from app.models import ImageBlob
+    from app.services.image_store import sweep_unreferenced_blobs
+
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    response = test_client.post("/auth/login/", json={"email": "example2@example.com", "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+
+    with open("tests/test_image.jpg", "rb") as img:
+        photo = img.read()
+    for checkpoint_id in (1, 2):
+        response = test_client.post(
+            "/api/race/1/checkpoints/log/",
+            headers=headers,
+            data={"image": (io.BytesIO(photo), "photo.jpg"), "checkpoint_id": checkpoint_id, "team_id": 1},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 201
+
+    with test_app.app_context():
+        blob = ImageBlob.query.one()
+        assert blob.ref_count == 2
+        assert [image.filename for image in Image.query] == [blob.path, blob.path]
+    stored = [path for path in tmp_path.rglob("*") if path.is_file() and ".derived" not in path.parts]
+    assert [path.relative_to(tmp_path).as_posix() for path in stored] == [blob.path]
+
+    for checkpoint_id in (1, 2):
+        response = test_client.delete(
+            "/api/race/1/checkpoints/log/", headers=headers, json={"checkpoint_id": checkpoint_id, "team_id": 1}
+        )
+        assert response.status_code == 200
+        with test_app.app_context():
+            assert ImageBlob.query.one().ref_count == 2 - checkpoint_id
+        # the file is kept until the sweep
+        assert stored[0].exists()
+
+    with test_app.app_context():
+        assert ImageBlob.query.one().released_at is not None
+        assert sweep_unreferenced_blobs() == (0, 0)
+        assert sweep_unreferenced_blobs(grace_seconds=0, now=datetime.utcnow() + timedelta(seconds=1)) == (1, len(photo))
+        assert ImageBlob.query.count() == 0
+    assert not stored[0].exists()
+    assert not any(path.is_file() for path in (tmp_path / ".derived").rglob("*"))
+
+
+def test_unlog_visit_removes_pre_blob_image_file(test_client, test_app, add_test_data, tmp_path):
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    (tmp_path / "legacy.jpg").write_bytes(b"old upload")
+    with test_app.app_context():
+        image = Image(filename="legacy.jpg")
+        db.session.add(image)
+        db.session.flush()
+        db.session.add(CheckpointLog(checkpoint_id=1, team_id=1, race_id=1, image_id=image.id))
+        db.session.commit()
+
+    response = test_client.post("/auth/login/", json={"email": "example2@example.com", "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+    response = test_client.delete("/api/race/1/checkpoints/log/", headers=headers, json={"checkpoint_id": 1, "team_id": 1})
+    assert response.status_code == 200
+    assert not (tmp_path / "legacy.jpg").exists()
+    with test_app.app_context():
+        assert Image.query.count() == 0
+
+
+def test_serve_image_derivatives_negotiate_webp(test_client, test_app, add_test_data, tmp_path):
+    from PIL import Image as PILImage
+
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    response = test_client.post("/auth/login/", json={"email": "example2@example.com", "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+    with open("tests/test_image.jpg", "rb") as img:
+        response = test_client.post(
+            "/api/race/1/checkpoints/log/",
+            headers=headers,
+            data={"image": img, "checkpoint_id": 1, "team_id": 1},
+            content_type="multipart/form-data",
+        )
+    assert response.status_code == 201
+    visits = test_client.get("/api/race/1/visits/1/", headers=headers)
+    filename = visits.json[0]["image_filename"]
+    stem = filename.rsplit(".", 1)[0]
+    # rendered by the ingest
+    assert (tmp_path / ".derived" / "thumb" / f"{stem}.webp").is_file()
+
+    thumb = test_client.get(f"/static/images/{filename}?size=thumb", headers={"Accept": "image/webp,image/*"})
+    assert thumb.status_code == 200
+    assert thumb.mimetype == "image/webp"
+    assert "Accept" in thumb.headers["Vary"]
+    assert max(PILImage.open(io.BytesIO(thumb.data)).size) <= 320
+
+    # missing derivatives are rendered on first request
+    (tmp_path / ".derived" / "medium" / f"{stem}.jpg").unlink()
+    medium = test_client.get(f"/static/images/{filename}?size=medium", headers={"Accept": "image/jpeg"})
+    assert medium.status_code == 200
+    assert medium.mimetype == "image/jpeg"
+    assert (tmp_path / ".derived" / "medium" / f"{stem}.jpg").is_file()
+
+    assert test_client.get(f"/static/images/{filename}?size=huge").status_code == 400
+    assert test_client.get("/static/images/missing.jpg?size=thumb").status_code == 404
+    assert test_client.get(f"/static/images/{filename}").status_code == 200
+
+
+def test_images_derivatives_command_backfills_existing_images(test_app, add_test_data, tmp_path):
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    with open("tests/test_image.jpg", "rb") as src:
+        (tmp_path / "legacy.jpg").write_bytes(src.read())
+    (tmp_path / "broken.jpg").write_bytes(b"not an image")
+    with test_app.app_context():
+        db.session.add_all([Image(filename="legacy.jpg"), Image(filename="broken.jpg")])
+        db.session.commit()
+
+    result = test_app.test_cli_runner().invoke(args=["images", "derivatives"])
+    assert result.exit_code == 0
+    assert "Rendered 4 derivatives for 2 images (1 failed)" in result.output
+    assert (tmp_path / ".derived" / "medium" / "legacy.webp").is_file()
+
+    result = test_app.test_cli_runner().invoke(args=["images", "derivatives"])
+    assert "Rendered 0 derivatives" in result.output
+
+
+def _stored_photo(test_app, tmp_path):
+    from werkzeug.datastructures import FileStorage
+    from app.services.image_store import store_image
+
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    with open("tests/test_image.jpg", "rb") as img:
+        upload = FileStorage(stream=io.BytesIO(img.read()), filename="photo.jpg")
+    with test_app.app_context():
+        image = store_image(upload, "JPEG")
+        db.session.commit()
+        return image.filename
+
+
+def test_serve_image_is_cacheable_with_ranges(test_client, test_app, add_test_data, tmp_path):
+    filename = _stored_photo(test_app, tmp_path)
+    digest = filename.rsplit("/", 1)[1].split(".")[0]
+    etag = f"{digest}-{(tmp_path / filename).stat().st_size:x}"
+
+    response = test_client.get(f"/static/images/{filename}")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{etag}"'
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == test_app.config['IMAGE_CACHE_MAX_AGE_SECONDS']
+
+    revalidated = test_client.get(f"/static/images/{filename}", headers={"If-None-Match": f'"{etag}"'})
+    assert revalidated.status_code == 304
+
+    partial = test_client.get(f"/static/images/{filename}", headers={"Range": "bytes=0-9"})
+    assert partial.status_code == 206
+    assert partial.data == response.data[:10]
+    assert test_client.get("/static/images/../config.py").status_code == 404
+
+
+@pytest.mark.parametrize("mode, header", [("x-sendfile", "X-Sendfile"), ("x-accel", "X-Accel-Redirect")])
+def test_serve_image_offload_never_reads_file(test_client, test_app, add_test_data, tmp_path, monkeypatch, mode, header):
+    import builtins
+
+    filename = _stored_photo(test_app, tmp_path)
+    test_app.config['IMAGE_SENDFILE_MODE'] = mode
+    stored_path = str(tmp_path / filename)
+    real_open = builtins.open
+
+    def guarded_open(file, *args, **kwargs):
+        assert str(file) != stored_path, "image body was read by Python"
+        return real_open(file, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", guarded_open)
+    monkeypatch.setattr(io, "open", guarded_open)
+    response = test_client.get(f"/static/images/{filename}")
+    assert response.status_code == 200
+    assert response.data == b""
+    assert response.mimetype == "image/jpeg"
+    assert response.cache_control.immutable
+    expected = stored_path if mode == "x-sendfile" else f"/protected-images/{filename}"
+    assert response.headers[header] == expected
+
+
+def _large_gps_photo(size=(1200, 900)):
+    from PIL import Image as PILImage
+
+    exif = PILImage.Exif()
+    exif[0x8825] = {1: 'N', 2: (50.0, 0.0, 0.0), 3: 'E', 4: (14.0, 0.0, 0.0)}
+    exif[0x010F] = "PhoneMaker"
+    buffer = io.BytesIO()
+    PILImage.effect_noise(size, 40).convert("RGB").save(buffer, "JPEG", quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+def test_ingest_downscales_and_recompresses_photos(test_client, test_app, add_test_data, tmp_path):
+    from PIL import Image as PILImage
+    from app.models import ImageBlob
+
+    test_app.config.update(IMAGE_UPLOAD_FOLDER=str(tmp_path), IMAGE_OPTIMIZE_ON_INGEST=True, IMAGE_MAX_LONG_EDGE=600)
+    response = test_client.post("/auth/login/", json={"email": "example2@example.com", "password": "password"})
+    headers = {"Authorization": f"Bearer {response.json['access_token']}"}
+    photo = _large_gps_photo()
+
+    for checkpoint_id in (1, 2):
+        response = test_client.post(
+            "/api/race/1/checkpoints/log/",
+            headers=headers,
+            data={"image": (io.BytesIO(photo), "photo.jpg"), "checkpoint_id": checkpoint_id, "team_id": 1},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 201
+        assert response.json["image_status"] == "ready"
+
+    with test_app.app_context():
+        blob = ImageBlob.query.one()
+        assert blob.ref_count == 2
+        assert blob.original_size_bytes == len(photo)
+        stored = tmp_path / blob.path
+        assert blob.size_bytes == stored.stat().st_size < len(photo)
+        assert CheckpointLog.query.filter(CheckpointLog.image_latitude.is_(None)).count() == 0
+    with PILImage.open(stored) as picture:
+        assert max(picture.size) == 600
+        exif = picture.getexif()
+        assert exif.get_ifd(0x8825)[2] == (50.0, 0.0, 0.0)
+        assert 0x010F not in exif
+
+    result = test_app.test_cli_runner().invoke(args=["images", "report"])
+    assert result.exit_code == 0
+    assert f"1 {blob.size_bytes:>14} {len(photo) - blob.size_bytes:>14}" in result.output
+
+
+def test_images_reencode_command_shrinks_stored_archive(test_app, add_test_data, tmp_path):
+    from werkzeug.datastructures import FileStorage
+    from app.models import ImageBlob
+    from app.services.image_store import store_image
+
+    test_app.config['IMAGE_UPLOAD_FOLDER'] = str(tmp_path)
+    photo = _large_gps_photo()
+    with test_app.app_context():
+        store_image(FileStorage(stream=io.BytesIO(photo), filename="photo.jpg"), "JPEG")
+        with open("tests/test_image.jpg", "rb") as img:
+            store_image(FileStorage(stream=img, filename="small.jpg"), "JPEG")
+        db.session.commit()
+
+    result = test_app.test_cli_runner().invoke(args=["images", "reencode", "--workers", "1", "--max-long-edge", "400"])
+    assert result.exit_code == 0, result.output
+    assert "Re-encoded 2 image blobs" in result.output
+    assert "(0 failed)" in result.output
+    with test_app.app_context():
+        blobs = ImageBlob.query.order_by(ImageBlob.id).all()
+        assert all(blob.original_size_bytes is not None for blob in blobs)
+        assert blobs[0].size_bytes == (tmp_path / blobs[0].path).stat().st_size < len(photo)
+
+    result = test_app.test_cli_runner().invoke(args=["images", "reencode", "--workers", "1"])
+    assert "Re-encoded 0 image blobs" in result.output
+
+
+def test_images_gc_removes_orphans_in_both_directions(test_app, add_test_data, tmp_path):
+    import os
+    from app.services.image_derivatives import generate_derivatives
+
+    filename = _stored_photo(test_app, tmp_path)
+    with test_app.app_context():
+        generate_derivatives(filename)
+        image = Image(filename="gone.jpg")
+        db.session.add(image)
+        db.session.flush()
+        db.session.add(CheckpointLog(checkpoint_id=1, team_id=1, race_id=1, image_id=image.id,
+                                     updated_at=datetime.utcnow() - timedelta(hours=1)))
+        db.session.commit()
+        status_version = db.session.get(Race, 1).status_version
+
+    orphans = ["stray.jpg", f"aa/bb/{'a' * 64}.jpg", ".derived/thumb/stray.webp", ".incoming/upload.tmp"]
+    for relative_path in orphans + ["fresh.jpg"]:
+        (tmp_path / relative_path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / relative_path).write_bytes(b"orphan")
+    hour_ago = datetime.now().timestamp() - 3600
+    for path in tmp_path.rglob("*"):
+        if path.is_file() and path.name != "fresh.jpg":
+            os.utime(path, (hour_ago, hour_ago))
+    kept = sorted(path for path in tmp_path.rglob("*") if path.is_file() and path.relative_to(tmp_path).as_posix() not in orphans)
+
+    runner = test_app.test_cli_runner()
+    result = runner.invoke(args=["images", "gc", "--dry-run", "--grace-seconds", "60", "--batch-size", "2"])
+    assert result.exit_code == 0, result.output
+    assert "Scanned 10 files" in result.output
+    assert "4 orphaned (24 bytes) would delete" in result.output
+    assert "Image 2 without file gone.jpg: would delete" in result.output
+    assert all((tmp_path / relative_path).exists() for relative_path in orphans)
+
+    result = runner.invoke(args=["images", "gc", "--grace-seconds", "60"])
+    assert result.exit_code == 0, result.output
+    assert "4 orphaned (24 bytes) deleted" in result.output
+    assert "1 without a file deleted" in result.output
+    assert sorted(path for path in tmp_path.rglob("*") if path.is_file()) == kept
+    with test_app.app_context():
+        assert [image.filename for image in Image.query] == [filename]
+        log = CheckpointLog.query.one()
+        assert log.image_id is None
+        # status ETags and delta polls see the detached photo
+        assert log.updated_at > datetime.utcnow() - timedelta(minutes=1)
+        assert db.session.get(Race, 1).status_version == status_version + 1